@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Runs CLI commands end to end against the local Jobmine stand-in (server.py) and reports
+the wall time, round-trips and bytes transferred by each, optionally with injected
+latency and errors.  Every command runs in its own process from a scratch directory,
+so neither the user's session, cache and database nor the real Jobmine are touched.
+
+Usage: python benchmarks/bench_load.py [--postings N] [--latency MS] [--error-rate F] [command ...]
+"""
+import os
+import sys
+import time
+import shlex
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+
+sys.path.insert(0,
+    os.path.join(
+        os.path.dirname(__file__), '..'))
+
+from server import Dataset, JobmineServer
+from jobmine.formatters import format_as_table
+
+
+JOBMINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bin', 'jobmine')
+
+# Commands run by default, in order; later commands reuse the session of earlier ones
+COMMANDS = [
+    'applications',
+    'applications',
+    'interviews',
+    'shortlist',
+    'documents --list',
+    'jobs --view 00000042',
+    'jobs --search --limit 25',
+    'jobs --search --employer "Employer 00"',
+    'sync',
+    'sync',
+    'watch --once'
+]
+
+
+def run(server, command, directory, repeat):
+    """
+    Run a CLI command against the server and measure it.
+
+    :server       JobmineServer
+    :command      String, the arguments to the CLI
+    :directory    Directory to run the command from
+    :repeat       Integer, the number of times to run the command
+    :return       Dictionary
+    """
+    env = dict(os.environ, JOBMINE_HOST=server.url, JOBMINE_USER='student', JOBMINE_PASSWORD='secret',
+               JOBMINE_COOKIES=os.path.join(directory, 'jobmine.cookies'), JOBMINE_SOCKET='',
+               TMPDIR=directory)
+    server.reset()
+    start, failures = time.time(), 0
+    for _ in range(repeat):
+        with open(os.devnull, 'w') as devnull:
+            failures += int(subprocess.call([sys.executable, JOBMINE] + shlex.split(command), cwd=directory,
+                                            env=env, stdout=devnull, stderr=devnull) != 0)
+    elapsed, stats = (time.time() - start) / repeat, server.stats
+    return {
+        'command': command,
+        'ms': '%.0f' % (elapsed * 1000),
+        'round-trips': '%.1f' % (stats['requests'] / float(repeat)),
+        'KB': '%.1f' % (stats['bytes'] / 1024.0 / repeat),
+        'errors': str(stats['errors']),
+        'failed': str(failures),
+        'endpoints': ', '.join('%s=%d' % (name, counters['requests'])
+                               for name, counters in sorted(stats['endpoints'].items()))
+    }
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Load test the Jobmine CLI against a local stand-in server.')
+    parser.add_argument('commands', nargs='*', metavar='command', help='CLI commands to run; defaults to a tour')
+    parser.add_argument('--postings', type=int, default=10000, help='number of job postings')
+    parser.add_argument('--applications', type=int, default=50, help='number of applications')
+    parser.add_argument('--documents', type=int, default=50, help='number of documents')
+    parser.add_argument('--latency', type=float, default=0, help='average delay of a request in milliseconds')
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of requests that fail')
+    parser.add_argument('--repeat', type=int, default=1, help='runs of each command; averages are reported')
+    opts = parser.parse_args(args)
+
+    dataset = Dataset(postings=opts.postings, applications=opts.applications, documents=opts.documents)
+    server = JobmineServer(('localhost', 0), dataset, latency=opts.latency / 1000.0, error_rate=opts.error_rate)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    directory = tempfile.mkdtemp(prefix='jobmine.load.')
+    try:
+        results = [run(server, command, directory, opts.repeat) for command in opts.commands or COMMANDS]
+    finally:
+        server.shutdown()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    keys = ['command', 'ms', 'round-trips', 'KB', 'errors', 'failed', 'endpoints']
+    print format_as_table(results, keys, keys)
+    return int(any(result['failed'] != '0' for result in results))
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
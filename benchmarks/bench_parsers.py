@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+"""
+Benchmarks the parsing paths of the JobmineBrowser (tables, search results and job
+details) with every available parser, and the table formatter, over synthetic pages.
+Reports the time per page, rows per second, peak memory and the memory the parsed rows
+hold on to (per row) of each case.  Times are compared against a stored baseline as
+multiples of a fixed calibration workload timed in the same run, so a baseline saved on
+one machine holds on another; with --check, exits with a non-zero status if any case
+regressed.
+
+Usage: python benchmarks/bench_parsers.py [--parser NAME] [--save] [--check] [--quick]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import gc
+import resource
+import tempfile
+import multiprocessing
+
+sys.path.insert(0,
+    os.path.join(
+        os.path.dirname(__file__), '..'))
+
+import fixtures
+from jobmine import parsers
+from jobmine.formatters import format_as_table
+from jobmine.jobminebrowser import JobmineBrowser
+
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+CALIBRATION_SIZE = 50000
+
+# Patterns used by the list_* methods of the JobmineBrowser for each table
+TABLES = [
+    ('applications', 'tr.*UW_CO_APPS.*'),
+    ('interviews', '.*trUW_CO_STUD_INTV\$.*'),
+    ('shortlist', 'trUW_CO_STUJOBLST.*'),
+    ('documents', 'trUW_CO_STU_DOCS.*')
+]
+GRIDS = [25, 100, 1000, 5000]
+DESCRIPTIONS = [('short', 8), ('long', 80)]
+
+
+def cases(parser, quick=False):
+    """
+    Generate the benchmark cases for a parser as (name, rows, page, function) tuples.
+    """
+    browser = JobmineBrowser(cookiefile=os.path.join(tempfile.gettempdir(), 'jobmine.bench.cookies'),
+                             parser=parser)
+    for table, regex in TABLES:
+        yield ('table', table, 25, fixtures.table_page(table, 25),
+               lambda html, regex=regex: browser._parse_table(html, regex))
+
+    for count in GRIDS[:2] if quick else GRIDS:
+        yield ('results', 'search-%d' % count, count, fixtures.table_page('search', count), browser._parse_results)
+
+    for name, paragraphs in DESCRIPTIONS:
+        yield ('details', 'details-%s' % name, 1, fixtures.details_page(1, paragraphs), browser._parse_job)
+
+
+def format_cases(quick=False):
+    """
+    Generate the benchmark cases for the table formatter.
+    """
+    browser = JobmineBrowser(cookiefile=os.path.join(tempfile.gettempdir(), 'jobmine.bench.cookies'))
+    for count in GRIDS[:2] if quick else GRIDS:
+        jobs = browser._parse_results(fixtures.table_page('search', count))
+        yield ('format', 'search-%d' % count, count, jobs,
+               lambda jobs: format_as_table(jobs, jobs[0].keys(), jobs[0].keys()))
+
+
+def calibrate(count):
+    """
+    A fixed pure Python workload (formatting and sorting strings) the cases are timed
+    against, so the times in the baseline don't depend on the speed of the machine.
+    """
+    return len(sorted('%08d' % (index * 7919 % 100003) for index in xrange(count)))
+
+
+def retained(value):
+    """
+    Count the bytes held by a value and everything it refers to, each object once;
+    classes and modules are shared with the rest of the process and aren't counted.
+    """
+    seen, pending, total = set(), [value], 0
+    while len(pending) > 0:
+        value = pending.pop()
+        if id(value) in seen or isinstance(value, (type, type(sys))):
+            continue
+        seen.add(id(value))
+        total += sys.getsizeof(value)
+        pending.extend(gc.get_referents(value))
+    return total
+
+
+def measure(function, data, repeat, results):
+    """
+    Time the function over the data and record the growth of the peak memory of the
+    process and the size of the result; run in a child process so each case starts from
+    the same peak.  The function is expected to have been run in the parent already, so
+    its imports are shared with the child.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timings = []
+    for _ in range(repeat):
+        start = time.time()
+        result = function(data)
+        timings.append(time.time() - start)
+    results.put((min(timings), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - peak, retained(result)))
+
+
+def timed(function, data, repeat):
+    """
+    Measure the function over the data in a child process; returns the fastest time in
+    seconds, the growth of the peak memory and the size of the result.
+    """
+    queue = multiprocessing.Queue()
+    child = multiprocessing.Process(target=measure, args=(function, data, repeat, queue))
+    child.start()
+    measurement = queue.get()
+    child.join()
+    return measurement
+
+
+def run(parser_names, repeat, quick):
+    """
+    Run every case and return the results as a list of dictionaries, and the time of the
+    calibration workload in milliseconds; it is timed before and after the cases and the
+    fastest is kept.
+    """
+    results = []
+    calibration = timed(calibrate, CALIBRATION_SIZE, max(repeat, 10))[0]
+    groups = [(name, cases(name, quick)) for name in parser_names] + [('-', format_cases(quick))]
+    for parser, group in groups:
+        for path, fixture, rows, data, function in group:
+            # Parsers are imported lazily; run the case once before forking so that neither
+            # the import nor its memory is measured, even with a single repeat
+            function(data)
+            seconds, peak, size = timed(function, data, repeat)
+            results.append({
+                'case': '%s/%s/%s' % (path, parser, fixture),
+                'ms/page': round(seconds * 1000, 2),
+                'rows/s': int(rows / seconds) if seconds > 0 else 0,
+                'peak KB': peak,
+                'B/row': size / rows if path != 'format' else '-'
+            })
+    calibration = min(calibration, timed(calibrate, CALIBRATION_SIZE, max(repeat, 10))[0])
+    return results, round(calibration * 1000, 2)
+
+
+def relative(result, calibration):
+    """
+    Return the time of a result as a multiple of the calibration workload.
+    """
+    return round(result['ms/page'] / calibration, 4) if calibration > 0 else 0
+
+
+def compare(results, calibration, baseline, tolerance):
+    """
+    Mark each result with its change from the baseline, both relative to the calibration
+    workload of their run; returns the regressed cases.
+    """
+    regressions = []
+    for result in results:
+        previous = baseline.get(result['case'])
+        if previous is None:
+            result['vs baseline'] = 'new'
+            continue
+        change = (relative(result, calibration) - previous) / previous if previous > 0 else 0
+        result['vs baseline'] = '%+.0f%%' % (change * 100)
+        if change > tolerance:
+            result['vs baseline'] += ' REGRESSED'
+            regressions.append(result['case'])
+    return regressions
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Benchmark the Jobmine parsers over synthetic pages.')
+    parser.add_argument('--parser', choices=parsers.available(), action='append',
+                        help='parser to benchmark, can be repeated; defaults to all of them')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each case; the fastest is reported')
+    parser.add_argument('--quick', action='store_true', default=False, help='skip the largest pages')
+    parser.add_argument('--baseline', default=BASELINE, help='file the baseline is stored in')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='fraction a case may be slower than the baseline before it counts as regressed')
+    parser.add_argument('--save', action='store_true', default=False, help='store the results as the baseline')
+    parser.add_argument('--check', action='store_true', default=False,
+                        help='exit with an error if any case regressed')
+    opts = parser.parse_args(args)
+
+    results, calibration = run(opts.parser or parsers.available(), opts.repeat, opts.quick)
+    try:
+        with open(opts.baseline, 'r') as handle:
+            baseline = json.load(handle)['cases']
+    except (IOError, ValueError, KeyError, TypeError):
+        baseline = {}
+
+    regressions = compare(results, calibration, baseline, opts.tolerance)
+    keys = ['case', 'ms/page', 'rows/s', 'peak KB', 'B/row', 'vs baseline']
+    print format_as_table(results, keys, keys)
+    print '\nCalibration: %.2f ms' % calibration
+
+    if opts.save:
+        baseline.update((result['case'], relative(result, calibration)) for result in results)
+        with open(opts.baseline, 'w') as output:
+            json.dump({'calibration': calibration, 'cases': baseline}, output, indent=4, sort_keys=True,
+                      separators=(',', ': '))
+        print '\nSaved the baseline to %s' % opts.baseline
+    elif opts.check and regressions:
+        print '\n%d case(s) regressed: %s' % (len(regressions), ', '.join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+Measures how long the CLI takes to start for each subcommand, and which of the slow
+dependencies (mechanize, requests, BeautifulSoup, lxml and the keyring) it imports.
+Each subcommand is run with --help, which exits once the arguments are parsed, so only
+the cost of starting up is measured; nothing is sent to Jobmine.  A bare interpreter is
+timed as the baseline.
+
+Usage: python benchmarks/bench_startup.py [--repeat N] [command ...]
+"""
+import os
+import sys
+import json
+import time
+import shlex
+import argparse
+import subprocess
+
+sys.path.insert(0,
+    os.path.join(
+        os.path.dirname(__file__), '..'))
+
+from jobmine.formatters import format_as_table
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+HEAVY = ('mechanize', 'requests', 'bs4', 'lxml', 'keyring', 'sqlite3', 'difflib')
+
+# Commands timed by default; the arguments after the program name
+COMMANDS = [
+    '--help',
+    'user --help',
+    'documents --help',
+    'shortlist --help',
+    'interviews --help',
+    'applications --help',
+    'sync --help',
+    'watch --help',
+    'serve --help',
+    'jobs --help'
+]
+
+# Runs the CLI, then reports the slow dependencies it imported on stderr
+SCRIPT = '''
+import sys
+sys.path.insert(0, %r)
+import jobmine
+try:
+    jobmine.main(*sys.argv[1:])
+except SystemExit:
+    pass
+sys.stderr.write(__import__('json').dumps(sorted(set(name.split('.')[0] for name, module in sys.modules.items()
+                                                     if module is not None and name.split('.')[0] in %r))))
+''' % (ROOT, HEAVY)
+
+
+def run(command, repeat):
+    """
+    Start the CLI with the arguments and measure it.
+
+    :command    String, the arguments to the CLI, or None for a bare interpreter
+    :repeat     Integer, the number of times to run it; the fastest run is reported
+    :return     Dictionary
+    """
+    timings, imported = [], []
+    for _ in range(repeat):
+        arguments = ['-c', 'pass'] if command is None else ['-c', SCRIPT] + shlex.split(command)
+        start = time.time()
+        with open(os.devnull, 'w') as devnull:
+            process = subprocess.Popen([sys.executable] + arguments, stdout=devnull, stderr=subprocess.PIPE,
+                                       env=dict(os.environ, JOBMINE_SOCKET=''))
+            errors = process.communicate()[1]
+        timings.append(time.time() - start)
+        try:
+            imported = json.loads(errors.strip().splitlines()[-1]) if errors.strip() else []
+        except ValueError:
+            imported = ['error']
+    return {
+        'command': command or '(python)',
+        'ms': '%.0f' % (min(timings) * 1000),
+        'imports': ', '.join(imported) or '-'
+    }
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Measure the start-up time of the Jobmine CLI.')
+    parser.add_argument('commands', nargs='*', metavar='command', help='CLI arguments to time; defaults to every subcommand')
+    parser.add_argument('--repeat', type=int, default=5, help='runs of each command; the fastest is reported')
+    opts = parser.parse_args(args)
+
+    results = [run(None, opts.repeat)] + [run(command, opts.repeat) for command in opts.commands or COMMANDS]
+    keys = ['command', 'ms', 'imports']
+    print format_as_table(results, keys, keys)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
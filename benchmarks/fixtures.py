@@ -0,0 +1,254 @@
+"""
+Synthetic, sanitized Jobmine pages.  The pages follow the markup of the PeopleSoft pages
+the JobmineBrowser parses (row and field ids, grid layout, form tokens and the chrome
+around them) but every value is generated, so they can be shared and regenerated at
+any size.  Generation is seeded, so the same arguments always produce the same page.
+"""
+import cgi
+import random
+
+
+WORDS = ('software developer engineer analyst research assistant quality data web mobile systems '
+         'platform test automation product design embedded firmware network security cloud '
+         'support business finance marketing operations hardware junior intermediate senior').split()
+LOCATIONS = ['Waterloo', 'Toronto', 'Ottawa', 'Kitchener', 'Vancouver', 'Montreal', 'Calgary',
+             'San Francisco', 'Seattle', 'New York', 'Mountain View', 'Boston']
+UNITS = ['Engineering', 'Research', 'IT Services', 'Product', 'Operations', 'Finance', '']
+LEVELS = ['Junior', 'Intermediate', 'Senior']
+DISCIPLINES = ['ENG-Software', 'MATH-Computer Science', 'ENG-Computer', 'ENG-Electrical',
+               'MATH-Statistics', 'ARTS-Economics', 'ENG-Mechanical', 'SCI-Physics']
+MONTHS = ['JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC']
+
+# Prefix of the row ids and the columns of each table
+TABLES = {
+    'applications': ('UW_CO_APPS_VW2', ['Job ID', 'Job Title', 'Employer', 'Unit', 'Term', 'Job Status',
+                                        'App. Status', 'View Details', 'Last Day to Apply', '#  Apps']),
+    'active_applications': ('UW_CO_STU_APPSV', ['Job ID', 'Job Title', 'Employer', 'Unit', 'Term', 'Job Status',
+                                                'App. Status', 'View Details', 'Last Day to Apply', '#  Apps']),
+    'interviews': ('UW_CO_STUD_INTV', ['Job ID', 'Employer Name', 'Job Title', 'Date', 'Type',
+                                       'Selected/Available', 'Start Time', 'Length', 'Room', 'Instructions',
+                                       'Interviewer', 'Job Status']),
+    'shortlist': ('UW_CO_STUJOBLST', ['Job Identifier', 'Job Title', 'Employer', 'Unit Name 1', 'Location',
+                                      'Apply', 'Application Status', 'Last Day to Apply', '#  Apps', '']),
+    'documents': ('UW_CO_STU_DOCS', ['', 'Document Name', 'Last Updated', 'Edit', 'View', 'Package']),
+    'profile': ('UW_CO_STDTERMVW', ['Term', 'Program', 'Level', 'Work Term']),
+    'rankings': ('UW_CO_STU_RNKV2', ['Job ID', 'Employer Name', 'Job Title', 'Rank', 'Employer Rank',
+                                     'Interview Date', 'Job Status']),
+    'search': ('UW_CO_JOBRES_VW', ['Job Identifier', 'Job Title', 'Employer', 'Unit', 'Location', 'Openings',
+                                   'Apply', 'Short List', 'Last Day to Apply', '# Apps'])
+}
+
+# Labels and field ids of the details of a job
+DETAILS = [
+    ('Employer', 'UW_CO_JOBDTL_DW_UW_CO_EMPLYR_NAME'),
+    ('Unit', 'UW_CO_JOBDTL_DW_UW_CO_EMPUNITDIV'),
+    ('Job Title', 'UW_CO_JOBDTL_VW_UW_CO_JOB_TITLE'),
+    ('Work Location', 'UW_CO_JOBDTL_VW_UW_CO_WORK_LOCATN'),
+    ('Available Openings', 'UW_CO_JOBDTL_VW_UW_CO_AVAIL_OPENGS'),
+    ('Work Term', 'UW_CO_JOBDTL_VW_UW_CO_WORK_TERM'),
+    ('Posting Open Date', 'UW_CO_JOBDTL_VW_UW_CO_CHARDATE_STR'),
+    ('Last Day to Apply', 'UW_CO_JOBDTL_VW_UW_CO_CHARDATE_END'),
+    ('Levels', 'UW_CO_JOBDTL_DW_UW_CO_DESCR100'),
+    ('Grades', 'UW_CO_JOBDTL_VW_UW_CO_REQ_GRADES'),
+    ('Disciplines', 'UW_CO_JOBDTL_DW_UW_CO_DESCR'),
+    ('Comments', 'UW_CO_JOBDTL_VW_UW_CO_JOB_COMMENTS')
+]
+DESCRIPTION = 'UW_CO_JOBDTL_VW_UW_CO_JOB_DESCR'
+
+
+def _words(generator, count):
+    return ' '.join(generator.choice(WORDS) for _ in range(count))
+
+
+def _date(generator):
+    return '%02d-%s-%d' % (generator.randint(1, 28), generator.choice(MONTHS), generator.choice([2014, 2015]))
+
+
+def job(job_id, seed=None):
+    """
+    Generate the summary of a job.
+
+    :job_id    Integer, the job identifier
+    :seed      Optional seed, defaults to the job identifier
+    :return    Dictionary
+    """
+    generator = random.Random(job_id if seed is None else seed)
+    return {
+        'id': '%08d' % job_id,
+        'title': _words(generator, 3).title(),
+        'employer': 'Employer %04d Inc.' % generator.randint(0, 2000),
+        'unit': generator.choice(UNITS),
+        'location': generator.choice(LOCATIONS),
+        'openings': str(generator.randint(1, 5)),
+        'deadline': _date(generator),
+        'apps': str(generator.randint(0, 300)),
+        'term': '2014 - Fall',
+        'levels': ', '.join(sorted(generator.sample(LEVELS, generator.randint(1, 3)))),
+        'disciplines': ', '.join(generator.sample(DISCIPLINES, generator.randint(1, 4))),
+        'grades': generator.choice(['Required', 'Not Required']),
+        'comments': _words(generator, 12)
+    }
+
+
+def row(table, index, values):
+    """
+    Render a row of a grid; values may contain markup.
+
+    :table     Name of the table, a key of TABLES
+    :index     Integer, the row's index in the grid
+    :values    List of cell contents, one per column
+    :return    String
+    """
+    prefix = TABLES[table][0]
+    cells = ''.join('<td class="PSLEVEL1GRIDODDROW" height="19"><div id="win0div%s_%d$%d">%s</div></td>\n' %
+                    (prefix, column, index, value) for column, value in enumerate(values))
+    return '<tr id="tr%s$0_row%d" valign="center">\n%s</tr>\n' % (prefix, index + 1, cells)
+
+
+def _span(value):
+    return '<span class="PSEDITBOX_DISPONLY">%s</span>' % cgi.escape(value)
+
+
+def rows(table, count, start=0):
+    """
+    Render generated rows of a table.
+
+    :table     Name of the table, a key of TABLES
+    :count     Integer, the number of rows
+    :start     Integer, index of the first row
+    :return    String
+    """
+    return render(table, [job(index + 1) for index in range(start, start + count)], start)
+
+
+def render(table, jobs, start=0):
+    """
+    Render the rows of a table from jobs generated by job().  Documents are named by their
+    'name' key and search results are on the shortlist if their 'shortlisted' key is set.
+
+    :table     Name of the table, a key of TABLES
+    :jobs      List of dictionaries
+    :start     Integer, index of the first row
+    :return    String
+    """
+    rendered = []
+    for index, info in enumerate(jobs, start):
+        generator, markup = random.Random(index), False
+        if table in ('applications', 'active_applications'):
+            values = [info['id'], info['title'], info['employer'], info['unit'], '1149', 'Posted', 'Applied',
+                      'View Details', info['deadline'], info['apps']]
+        elif table == 'interviews':
+            values = [info['id'], info['employer'], info['title'], info['deadline'], 'Regular', '1/4',
+                      '%02d:%02d' % (generator.randint(8, 16), generator.choice([0, 30])), '30 min',
+                      'TC %d' % generator.randint(1000, 2999), _words(generator, 6), 'Recruiter', 'Scheduled']
+        elif table == 'shortlist':
+            values = [info['id'], info['title'], info['employer'], info['unit'], info['location'], 'Apply',
+                      'Not Applied', info['deadline'], info['apps'], '']
+        elif table == 'documents':
+            name = info.get('name', 'Resume %d' % (index + 1))
+            values = ['', '<input type="text" name="UW_CO_STU_DOCS_UW_CO_DOC_DESC$%d" value="%s" maxlength="30"/>' %
+                      (index, cgi.escape(name, True)), _span(info['deadline']), 'Edit', 'View', 'Package']
+            markup = True
+        elif table == 'rankings':
+            values = [info['id'], info['employer'], info['title'], str(index + 1), 'Offer', info['deadline'],
+                      'Ranked']
+        elif table == 'profile':
+            values = ['1149', 'Computer Science', '2B', str(index + 1)]
+        else:
+            shortlisted = info.get('shortlisted', index % 7 == 0)
+            values = [info['id'], info['title'], info['employer'], info['unit'], info['location'],
+                      info['openings'], 'Apply', 'On Short List' if shortlisted else '',
+                      info['deadline'], info['apps']]
+        rendered.append(row(table, index, values if markup else [_span(value) for value in values]))
+    return ''.join(rendered)
+
+
+def grid(table, body, first=1, last=None, total=None, view_all=True):
+    """
+    Wrap rows in a PeopleSoft grid, with its headers, navigation and row counter.
+
+    :table       Name of the table, a key of TABLES
+    :body        String, the rendered rows
+    :first       Integer, the number of the first row shown
+    :last        Optional integer, the number of the last row shown
+    :total       Optional integer, the number of rows in the grid
+    :view_all    Boolean, whether to offer the View All action
+    :return      String
+    """
+    prefix, headers = TABLES[table]
+    count = body.count('<tr ')
+    last = first + count - 1 if last is None else last
+    total = last if total is None else total
+    navigation = ''
+    if view_all and total > last - first + 1:
+        navigation = ('<a id="%s$hviewall$0" href="javascript:submitAction_win0(document.win0,'
+                      '\'%s$hviewall$0\');" class="PSLEVEL1GRIDNAVIGATIONBAR">View All</a>' % (prefix, prefix))
+    header = ''.join('<th scope="col" class="PSLEVEL1GRIDCOLUMNHDR" align="left">%s</th>\n' % cgi.escape(name)
+                     for name in headers)
+    return ('<table border="0" id="%s$scroll$0" cellpadding="2" cellspacing="0" class="PSLEVEL1GRIDWBO">\n'
+            '<tr><td class="PSLEVEL1GRIDLABEL">%s <span class="PSGRIDCOUNTER">%d-%d of %d</span></td></tr>\n'
+            '<tr><td><table border="1" cellpadding="2" cellspacing="0" class="PSLEVEL1GRID">\n'
+            '<tr>\n%s</tr>\n%s</table></td></tr></table>\n') % (prefix, navigation, first, last, total, header, body)
+
+
+def page(content, icsid='a8ThWq1Hk2Zy3PzJr0Q5', state=1, action='UW_CO_STUDENTS.GBL'):
+    """
+    Wrap content in the chrome of a PeopleSoft page, including the form and its tokens.
+
+    :content    String, the content of the page
+    :icsid      The session token
+    :state      Integer, the state number token
+    :action     The url the form posts to
+    :return     String
+    """
+    scripts = ''.join('<script language="JavaScript">\nfunction psFunction%d(form, name) {\n'
+                      '    var value = form.elements[name].value; return value ? value.length : %d;\n}\n'
+                      '</script>\n' % (index, index) for index in range(40))
+    navigation = ''.join('<li class="pthnavitem"><a href="#nav%d" class="PSHYPERLINK">Navigation %d</a></li>\n' %
+                         (index, index) for index in range(60))
+    return ('<html dir="ltr" lang="en">\n<head>\n<title>Jobmine</title>\n%s</head>\n<body class="PSPAGE">\n'
+            '<ul class="pthnav">\n%s</ul>\n'
+            '<form name="win0" method="post" action="%s" autocomplete="off">\n'
+            '<input type="hidden" name="ICType" value="Panel"/>\n'
+            '<input type="hidden" name="ICElementNum" value="0"/>\n'
+            '<input type="hidden" name="ICStateNum" value="%d"/>\n'
+            '<input type="hidden" name="ICAction" value="None"/>\n'
+            '<input type="hidden" name="ICSID" value="%s"/>\n'
+            '<div id="PAGECONTAINER">\n%s</div>\n</form>\n</body>\n</html>\n') % (scripts, navigation, action, state,
+                                                                             icsid, content)
+
+
+def table_page(table, count, **kwargs):
+    """
+    Generate a page holding a table; e.g. the applications, interviews, shortlist, documents
+    or rankings pages, or a page of search results.
+
+    :table     Name of the table, a key of TABLES
+    :count     Integer, the number of rows
+    :return    String
+    """
+    return page(grid(table, rows(table, count)), **kwargs)
+
+
+def details_page(job_id, paragraphs=8, **kwargs):
+    """
+    Generate the details page of a job.
+
+    :job_id        Integer, the job identifier
+    :paragraphs    Integer, the length of the description in paragraphs
+    :return        String
+    """
+    info, generator = job(job_id), random.Random(-job_id)
+    values = [info['employer'], info['unit'], info['title'], info['location'], info['openings'], info['term'],
+              info['deadline'], info['deadline'], info['levels'], info['grades'], info['disciplines'],
+              info['comments']]
+    fields = ''.join('<tr>\n  <td><label for="%s" class="PSDROPDOWNLABEL">%s:</label></td>\n'
+                     '  <td><span class="PSEDITBOX_DISPONLY" id="%s">%s</span></td>\n</tr>\n' %
+                     (field, label, field, cgi.escape(value)) for (label, field), value in zip(DETAILS, values))
+    description = '\n'.join('<p>%s: %s.</p>' % (_words(generator, 2).title(), _words(generator, 60))
+                            for _ in range(paragraphs))
+    content = ('<table class="PSGROUPBOX">\n%s</table>\n'
+               '<table class="PSGROUPBOX">\n<tr><td class="PAGROUPBOXLABELLEVEL1">Job Description</td></tr>\n'
+               '<tr><td><span class="PSLONGEDITBOX" id="%s">\n%s\n</span></td></tr>\n</table>\n') % (
+                   fields, DESCRIPTION, description)
+    return page(content, **kwargs)
@@ -0,0 +1,511 @@
+#!/usr/bin/env python
+"""
+A local stand-in for Jobmine that serves the synthetic pages of fixtures.py from a
+mutable dataset, so the CLI, the watcher and bulk operations can be run and load
+tested end to end without touching the real site.
+
+The server emulates the PeopleSoft behaviour the JobmineBrowser depends on: the login
+form and its cookie, sessions that expire to the 'cmd=expire' page, the ICSID and
+ICStateNum tokens, '$hdown$'/'$hup$' pagination and 'View All' over search results,
+'#ICSave', the viewattach redirect chain documents are downloaded through and the
+'errorCode=999' page shown while Jobmine is closed.  Latency and errors can be
+injected into every request, and requests and bytes are counted per endpoint.
+
+Point the browser at the server through the JOBMINE_HOST environment variable:
+
+    python benchmarks/server.py --port 8000 --postings 10000 --documents 50
+    JOBMINE_HOST=http://localhost:8000 JOBMINE_USER=student JOBMINE_PASSWORD=secret \\
+        JOBMINE_COOKIES=/tmp/jobmine.local.cookies bin/jobmine applications
+
+The counters are served as JSON from '/stats' and reset with '/stats/reset'.
+"""
+import os
+import re
+import cgi
+import sys
+import json
+import time
+import random
+import urllib
+import hashlib
+import urlparse
+import argparse
+import threading
+import BaseHTTPServer
+import SocketServer
+
+import fixtures
+
+
+FOLDER = re.compile(r'^/psc/SS/EMPLOYEE/WORK/c/UW_CO_STUDENTS\.(\w+)\.GBL')
+DELETE = re.compile(r'^(\w+)\$delete\$([0-9]+)\$\$0$')
+INDEXED = re.compile(r'^(\w+)\$([0-9]+)$')
+ATTACHMENT = re.compile(r'^/psc/SS/files/([0-9]+)/(doc|package)\.pdf$')
+COOKIE = 'PS_TOKEN'
+LOGIN = '/psp/SS/?cmd=login'
+EXPIRE = '/psp/SS/?cmd=expire'
+CLOSED = '/psp/SS/?cmd=login&errorCode=999'
+HOME = '/psp/SS/EMPLOYEE/WORK/h/?tab=DEFAULT'
+COMPONENTS = {
+    'UW_CO_APP_SUMMARY': 'applications',
+    'UW_CO_JOB_SLIST': 'shortlist',
+    'UW_CO_STU_INTVS': 'interviews',
+    'UW_CO_STUDENT': 'profile',
+    'UW_CO_STU_DOCS': 'documents',
+    'UW_CO_STU_RNK2': 'rankings',
+    'UW_CO_JOBSRCH': 'jobs',
+    'UW_CO_JOBDTLS': 'details'
+}
+# Search filters and the job keys they match against
+FILTERS = {
+    'UW_CO_JOBSRCH_UW_CO_EMPLYR_NAME': 'employer',
+    'UW_CO_JOBSRCH_UW_CO_JOB_TITLE': 'title',
+    'UW_CO_JOBSRCH_UW_CO_LOCATION': 'location'
+}
+
+
+def _pdf(name, size):
+    """
+    Generate a PDF-like document of roughly the size in bytes.
+    """
+    header = '%%PDF-1.4\n%% %s\n' % name
+    padding = hashlib.sha1(name).hexdigest()
+    return header + (padding * (max(0, size - len(header)) // len(padding) + 1))[:max(0, size - len(header))]
+
+
+class Dataset(object):
+    """
+    The synthetic state of a student's Jobmine account.  Postings are generated by
+    fixtures.job(); the applications, interviews, shortlist and rankings are the
+    first postings, and documents are generated PDFs.
+    """
+
+    def __init__(self, postings=1000, applications=20, interviews=5, shortlist=10, rankings=5, documents=5,
+                 max_documents=None, document_size=64 * 1024, paragraphs=8):
+        """
+        Generate the dataset.
+
+        :postings         Integer, the number of job postings
+        :applications     Integer, the number of applications
+        :interviews       Integer, the number of interviews
+        :shortlist        Integer, the number of shortlisted jobs
+        :rankings         Integer, the number of rankings
+        :documents        Integer, the number of documents
+        :max_documents    Optional integer, the most documents allowed; defaults to twice the number
+        :document_size    Integer, size of a document in bytes
+        :paragraphs       Integer, length of the job descriptions in paragraphs
+        :return           Dataset
+        """
+        self.jobs = [fixtures.job(job_id) for job_id in range(1, postings + 1)]
+        self.index = dict((info['id'], info) for info in self.jobs)
+        self.applications = self.jobs[:applications]
+        self.interviews = self.jobs[:interviews]
+        self.shortlist = self.jobs[:shortlist]
+        self.rankings = self.jobs[:rankings]
+        self.documents = [self.document('Resume %d' % (number + 1), document_size) for number in range(documents)]
+        self.max_documents = max_documents or max(1, documents * 2)
+        self.document_size = document_size
+        self.paragraphs = paragraphs
+
+    def document(self, name, size=None, data=None):
+        return {
+            'name': name,
+            'deadline': time.strftime('%d-%b-%Y').upper(),
+            'data': data if data is not None else _pdf(name, size or self.document_size)
+        }
+
+    def search(self, filters):
+        """
+        Find the postings matching the filters; values match case-insensitive substrings.
+
+        :filters    Dictionary of query parameters
+        :return     List of jobs
+        """
+        criteria = [(key, filters[name].lower()) for name, key in FILTERS.items() if filters.get(name)]
+        return [info for info in self.jobs if all(value in info[key].lower() for key, value in criteria)]
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Serves a single request against the server's dataset.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def handle_request(self, method):
+        url = urlparse.urlparse(self.path)
+        params = dict(urlparse.parse_qsl(url.query, keep_blank_values=True))
+        if url.path.startswith('/stats'):
+            if url.path == '/stats/reset':
+                self.server.reset()
+            return self.respond(json.dumps(self.server.stats, indent=2), content_type='application/json')
+
+        endpoint = self.endpoint(url.path, params)
+        self.server.count(endpoint)
+        if self.server.latency > 0:
+            time.sleep(random.uniform(0.5, 1.5) * self.server.latency)
+        if random.random() < self.server.error_rate:
+            return self.respond('<html><body>Internal Server Error</body></html>', status=500, endpoint=endpoint)
+
+        with self.server.lock:
+            if url.path == '/psp/SS/' and params.get('cmd') in ('login', 'expire'):
+                return self.login(method, params, endpoint)
+
+            session = self.session()
+            if self.server.closed:
+                return self.redirect(CLOSED, endpoint)
+            elif session is None:
+                return self.redirect(EXPIRE, endpoint)
+            elif url.path == '/psc/SS/' and params.get('cmd') == 'viewattach':
+                # Documents are served through a page whose fourth line is the url of the file
+                location = 'http://%s/psc/SS/files/%s/%s.pdf' % (self.headers.get('Host'), params.get('document'),
+                                                                 params.get('kind'))
+                return self.respond('<html>\n<head>\n<meta http-equiv="refresh" content="0;url=%s">\n%s\n'
+                                    '</head>\n</html>\n' % (location, location), endpoint=endpoint)
+            elif ATTACHMENT.match(url.path):
+                number, kind = ATTACHMENT.match(url.path).groups()
+                documents = self.server.dataset.documents
+                if int(number) >= len(documents) or documents[int(number)]['data'] is None:
+                    return self.respond('Not Found', status=404, endpoint=endpoint)
+                return self.respond(documents[int(number)]['data'], content_type='application/pdf',
+                                    endpoint=endpoint)
+            elif FOLDER.match(url.path) and COMPONENTS.get(FOLDER.match(url.path).group(1)):
+                component = COMPONENTS[FOLDER.match(url.path).group(1)]
+                if method == 'POST':
+                    params.update(self.form())
+                return self.respond(self.component(component, session, params, url.path), endpoint=endpoint)
+            elif url.path.startswith('/psp/SS/EMPLOYEE/WORK/h/'):
+                return self.respond(self.page('<h1>Student Homepage</h1>', session), endpoint=endpoint)
+            return self.respond('Not Found', status=404, endpoint=endpoint)
+
+    def endpoint(self, path, params):
+        match = FOLDER.match(path)
+        if match is not None:
+            return COMPONENTS.get(match.group(1), 'unknown')
+        elif path == '/psp/SS/':
+            return params.get('cmd', 'unknown')
+        elif path == '/psc/SS/':
+            return 'viewattach'
+        elif ATTACHMENT.match(path):
+            return 'attachment'
+        elif path.startswith('/psp/SS/EMPLOYEE/WORK/h/'):
+            return 'home'
+        return 'unknown'
+
+    def form(self):
+        """
+        Parse the body of a POST request, including multipart uploads.
+
+        :return    Dictionary of names to values; files are (filename, data) tuples
+        """
+        storage = cgi.FieldStorage(fp=self.rfile, headers=self.headers, environ={
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_TYPE': self.headers.get('Content-Type', 'application/x-www-form-urlencoded')
+        })
+        data = {}
+        for field in storage.list or []:
+            data[field.name] = (field.filename, field.value) if field.filename else field.value
+        return data
+
+    def session(self):
+        """
+        Get the session of the request's cookie, expiring it if it has been idle too long.
+
+        :return    Dictionary or None
+        """
+        match = re.search(r'%s=([0-9a-f]+)' % COOKIE, self.headers.get('Cookie', ''))
+        session = self.server.sessions.get(match.group(1)) if match else None
+        if session is None:
+            return None
+        elif self.server.timeout and time.time() - session['seen'] > self.server.timeout:
+            del self.server.sessions[match.group(1)]
+            return None
+        session['seen'] = time.time()
+        return session
+
+    def login(self, method, params, endpoint):
+        if method == 'GET':
+            return self.respond('<html><body><form name="login" method="post" action="%s">\n'
+                                '<input type="text" name="userid" value=""/>\n'
+                                '<input type="password" name="pwd" value=""/>\n'
+                                '<input type="submit" name="Submit" value="Sign In"/>\n'
+                                '</form></body></html>\n' % LOGIN, endpoint=endpoint)
+
+        form = self.form()
+        if self.server.closed:
+            return self.redirect(CLOSED, endpoint)
+        elif not form.get('userid') or form.get('pwd') != self.server.users.get(form['userid'], form.get('pwd')):
+            return self.redirect(LOGIN + '&errorCode=105', endpoint)
+
+        token = hashlib.sha1('%s%f%f' % (form['userid'], time.time(), random.random())).hexdigest()
+        self.server.sessions[token] = {
+            'user': form['userid'],
+            'icsid': token[:20],
+            'state': 0,
+            'seen': time.time(),
+            'results': [],
+            'offset': 0,
+            'all': False,
+            'upload': None
+        }
+        return self.redirect(HOME, endpoint, cookie='%s=%s; Path=/' % (COOKIE, token))
+
+    def page(self, content, session):
+        session['state'] += 1
+        return fixtures.page(content, icsid=session['icsid'], state=session['state'],
+                             action=urlparse.urlparse(self.path).path)
+
+    def component(self, component, session, params, path):
+        """
+        Apply the request's action to the dataset and render the component's page.
+
+        :component    Name of the component, a value of COMPONENTS
+        :session      Dictionary, the user's session
+        :params       Dictionary of query and form parameters
+        :path         The path of the component
+        :return       String
+        """
+        dataset, action = self.server.dataset, params.get('ICAction', 'None')
+        delete, indexed = DELETE.match(action), INDEXED.match(action)
+
+        if component == 'details':
+            info = dataset.index.get(params.get('UW_CO_JOB_ID', '').zfill(8))
+            if info is None:
+                return self.page('<div>The job posting is not available.</div>', session)
+            session['state'] += 1
+            return fixtures.details_page(int(info['id']), dataset.paragraphs, icsid=session['icsid'],
+                                         state=session['state'], action=path)
+        elif component == 'jobs':
+            return self.search(session, params, action, indexed)
+
+        if component == 'applications' and delete and delete.group(1) == 'UW_CO_APPSV':
+            del dataset.applications[int(delete.group(2)):int(delete.group(2)) + 1]
+        elif component == 'shortlist' and delete and delete.group(1) == 'UW_CO_STUJOBLST':
+            del dataset.shortlist[int(delete.group(2)):int(delete.group(2)) + 1]
+        elif component == 'documents':
+            content = self.documents(session, params, action, indexed, path)
+            if content is not None:
+                return content
+
+        if component == 'applications':
+            content = (fixtures.grid('active_applications', fixtures.render('active_applications',
+                                                                            dataset.applications)) +
+                       fixtures.grid('applications', fixtures.render('applications', dataset.applications)))
+        elif component == 'documents':
+            content = fixtures.grid('documents', fixtures.render('documents', dataset.documents))
+            if len(dataset.documents) < dataset.max_documents:
+                content += '<a id="UW_CO_PDF_WRK_UW_CO_DOC_CREATE" class="PSPUSHBUTTON">Create New Document</a>\n'
+        elif component == 'profile':
+            content = fixtures.grid('profile', fixtures.rows('profile', 4))
+        else:
+            content = fixtures.grid(component, fixtures.render(component, getattr(dataset, component)))
+        return self.page(content, session)
+
+    def documents(self, session, params, action, indexed, path):
+        """
+        Apply an action on the documents page, returning a page to show in its place if
+        the action has one.
+        """
+        dataset = self.server.dataset
+        for name, value in params.items():
+            match = INDEXED.match(name)
+            if action == '#ICSave' and match and match.group(1) == 'UW_CO_STU_DOCS_UW_CO_DOC_DESC':
+                if int(match.group(2)) < len(dataset.documents):
+                    dataset.documents[int(match.group(2))]['name'] = value
+
+        if action == 'UW_CO_PDF_WRK_UW_CO_DOC_CREATE' and len(dataset.documents) < dataset.max_documents:
+            dataset.documents.append(dataset.document('', data=''))
+        elif indexed and indexed.group(1) == 'UW_CO_PDF_WRK_UW_CO_DOC_DELETE':
+            del dataset.documents[int(indexed.group(2)):int(indexed.group(2)) + 1]
+        elif indexed and indexed.group(1) == 'UW_CO_PDF_WRK_UW_CO_DOC_ADD':
+            session['upload'] = int(indexed.group(2))
+            return self.page('<input type="file" name="UW_CO_ATTACHMENT"/>\n'
+                             '<input type="submit" name="Upload" value="Upload"/>\n', session).replace(
+                                 'method="post"', 'method="post" enctype="multipart/form-data"')
+        elif indexed and indexed.group(1) in ('UW_CO_PDF_LINKS_UW_CO_DOC_VIEW', 'UW_CO_PDF_LINKS_UW_CO_PACKAGE_VIEW'):
+            kind = 'doc' if 'DOC_VIEW' in indexed.group(1) else 'package'
+            query = urllib.urlencode([('cmd', 'viewattach'), ('document', indexed.group(2)), ('kind', kind)])
+            return self.page('<script language="JavaScript">\nwindow.open(\'/psc/SS/?%s\');\n</script>\n' % query,
+                             session)
+        elif isinstance(params.get('UW_CO_ATTACHMENT'), tuple) and session['upload'] is not None:
+            filename, data = params['UW_CO_ATTACHMENT']
+            if session['upload'] < len(dataset.documents):
+                dataset.documents[session['upload']].update(data=data, deadline=time.strftime('%d-%b-%Y').upper())
+                if not dataset.documents[session['upload']]['name']:
+                    dataset.documents[session['upload']]['name'] = os.path.splitext(filename)[0]
+            session['upload'] = None
+
+    def search(self, session, params, action, indexed):
+        """
+        Run a job search, or page through or shortlist from the last one.
+        """
+        dataset, size = self.server.dataset, self.server.page_size
+        if action == 'UW_CO_JOBSRCHDW_UW_CO_DW_SRCHBTN':
+            session.update(results=dataset.search(params), offset=0, all=False)
+        elif action == 'UW_CO_JOBRES_VW$hdown$0':
+            if session['offset'] + size < len(session['results']):
+                session['offset'] += size
+        elif action == 'UW_CO_JOBRES_VW$hup$0':
+            session['offset'] = max(0, session['offset'] - size)
+        elif action == 'UW_CO_JOBRES_VW$hviewall$0':
+            session.update(offset=0, all=True)
+        elif indexed and indexed.group(1) == 'UW_CO_SLIST_HL':
+            position = session['offset'] + int(indexed.group(2))
+            if position < len(session['results']) and session['results'][position] not in dataset.shortlist:
+                dataset.shortlist.append(session['results'][position])
+        elif action == 'None':
+            return self.page('<div id="UW_CO_JOBSRCH_SEARCH">Job Search Criteria</div>\n', session)
+
+        results, offset = session['results'], session['offset']
+        count = min(len(results), self.server.view_all) if session['all'] else size
+        shown = [dict(info, shortlisted=info in dataset.shortlist) for info in results[offset:offset + count]]
+        content = fixtures.grid('search', fixtures.render('search', shown, offset), first=offset + 1,
+                                last=offset + len(shown), total=len(results), view_all=not session['all'])
+        return self.page(content, session)
+
+    def redirect(self, location, endpoint, cookie=None):
+        headers = [('Location', 'http://%s%s' % (self.headers.get('Host'), location))]
+        if cookie is not None:
+            headers.append(('Set-Cookie', cookie))
+        self.respond('', status=302, headers=headers, endpoint=endpoint)
+
+    def respond(self, body, status=200, content_type='text/html', headers=None, endpoint=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers or []:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        if endpoint is not None:
+            self.server.count(endpoint, len(body), status >= 500)
+
+
+class JobmineServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    A threaded HTTP server emulating Jobmine over a Dataset.
+
+    :PAGE_SIZE    Default number of search results per page
+    :VIEW_ALL     Default number of search results shown by 'View All'
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+    PAGE_SIZE = 25
+    VIEW_ALL = 500
+
+    def __init__(self, address, dataset, users=None, latency=0, error_rate=0, timeout=None, closed=False,
+                 page_size=None, view_all=None, verbose=False):
+        """
+        Initialize the server.
+
+        :address       Tuple of (host, port) to listen on
+        :dataset       Dataset to serve
+        :users         Optional dictionary of usernames to passwords; any password is accepted if missing
+        :latency       Average number of seconds to delay each request by
+        :error_rate    Fraction of requests to fail with a server error
+        :timeout       Optional number of idle seconds after which sessions expire
+        :closed        Boolean, emulate Jobmine being closed
+        :page_size     Optional number of search results per page
+        :view_all      Optional number of search results shown by 'View All'
+        :verbose       Boolean, log every request
+        :return        JobmineServer
+        """
+        BaseHTTPServer.HTTPServer.__init__(self, address, Handler)
+        self.dataset = dataset
+        self.users = users or {}
+        self.latency = latency
+        self.error_rate = error_rate
+        self.timeout = timeout
+        self.closed = closed
+        self.page_size = page_size or self.PAGE_SIZE
+        self.view_all = view_all or self.VIEW_ALL
+        self.verbose = verbose
+        self.sessions = {}
+        self.lock = threading.RLock()
+        self.stats_lock = threading.Lock()
+        self.reset()
+
+    @property
+    def url(self):
+        return 'http://%s:%d' % self.server_address
+
+    def reset(self):
+        """
+        Reset the request counters.
+
+        :return    None
+        """
+        with self.stats_lock:
+            self.stats = {'requests': 0, 'bytes': 0, 'errors': 0, 'endpoints': {}}
+
+    def count(self, endpoint, size=None, error=False):
+        """
+        Count a request to the endpoint when it arrives, and the size of its response
+        once it is sent.
+
+        :endpoint    Name of the endpoint
+        :size        Optional size of the response in bytes
+        :error       Boolean, whether the response was a server error
+        :return      None
+        """
+        with self.stats_lock:
+            counters = self.stats['endpoints'].setdefault(endpoint, {'requests': 0, 'bytes': 0})
+            if size is None:
+                self.stats['requests'] += 1
+                counters['requests'] += 1
+            else:
+                self.stats['bytes'] += size
+                self.stats['errors'] += int(error)
+                counters['bytes'] += size
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a synthetic stand-in for Jobmine.')
+    parser.add_argument('--host', default='localhost', help='host to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='port to listen on')
+    parser.add_argument('--postings', type=int, default=1000, help='number of job postings')
+    parser.add_argument('--applications', type=int, default=20, help='number of applications')
+    parser.add_argument('--interviews', type=int, default=5, help='number of interviews')
+    parser.add_argument('--shortlist', type=int, default=10, help='number of shortlisted jobs')
+    parser.add_argument('--rankings', type=int, default=5, help='number of rankings')
+    parser.add_argument('--documents', type=int, default=5, help='number of documents')
+    parser.add_argument('--max-documents', type=int, default=None, help='most documents allowed')
+    parser.add_argument('--document-size', type=int, default=64 * 1024, help='size of a document in bytes')
+    parser.add_argument('--user', action='append', default=[], metavar='USER:PASSWORD',
+                        help='only accept these credentials (repeatable); any are accepted by default')
+    parser.add_argument('--latency', type=float, default=0, help='average delay of a request in milliseconds')
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of requests that fail')
+    parser.add_argument('--session-timeout', type=int, default=None, help='seconds before idle sessions expire')
+    parser.add_argument('--page-size', type=int, default=None, help='search results per page')
+    parser.add_argument('--view-all', type=int, default=None, help="search results shown by 'View All'")
+    parser.add_argument('--closed', action='store_true', default=False, help='emulate Jobmine being closed')
+    parser.add_argument('--verbose', action='store_true', default=False, help='log every request')
+    opts = parser.parse_args()
+
+    dataset = Dataset(postings=opts.postings, applications=opts.applications, interviews=opts.interviews,
+                      shortlist=opts.shortlist, rankings=opts.rankings, documents=opts.documents,
+                      max_documents=opts.max_documents, document_size=opts.document_size)
+    server = JobmineServer((opts.host, opts.port), dataset, users=dict(user.split(':', 1) for user in opts.user),
+                           latency=opts.latency / 1000.0, error_rate=opts.error_rate, timeout=opts.session_timeout,
+                           closed=opts.closed, page_size=opts.page_size, view_all=opts.view_all,
+                           verbose=opts.verbose)
+    sys.stderr.write('Serving %d postings on %s\n' % (len(dataset.jobs), server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sys.stderr.write(json.dumps(server.stats, indent=2) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,44 @@
-from jobminebrowser import (JobmineBrowser, JobmineException, JobSearchQuery,
-                            Jobmine, CoopPrograms as Programs)
-from interface import main
+"""
+The package's names are imported on first use, so that importing the package (as the
+command-line client does before every command) doesn't import the browser and its
+dependencies.
+"""
+import sys
+from types import ModuleType
 
 __author__='Ford Peprah'
+
+# Names exported by the package and the modules they are defined in
+EXPORTS = {
+    'JobmineBrowser': ('jobminebrowser', 'JobmineBrowser'),
+    'JobmineException': ('jobminebrowser', 'JobmineException'),
+    'JobSearchQuery': ('jobminebrowser', 'JobSearchQuery'),
+    'Jobmine': ('jobminebrowser', 'Jobmine'),
+    'Programs': ('jobminebrowser', 'CoopPrograms'),
+    'main': ('interface', 'main')
+}
+
+
+class Package(ModuleType):
+    """
+    Imports the module defining an exported name the first time the name is used.
+    """
+
+    def __getattr__(self, name):
+        if name not in EXPORTS:
+            raise AttributeError("'module' object has no attribute '%s'" % name)
+        module, attribute = EXPORTS[name]
+        value = getattr(__import__('%s.%s' % (__name__, module), None, None, [attribute]), attribute)
+        setattr(self, name, value)
+        return value
+
+    def __dir__(self):
+        return sorted(set(self.__dict__.keys() + EXPORTS.keys()))
+
+
+# Replace this module with the lazy package; the original is kept referenced so that
+# its globals, which the package's methods use, aren't cleared
+_module = sys.modules[__name__]
+package = sys.modules[__name__] = Package(__name__, __doc__)
+package.__dict__.update(dict((key, value) for key, value in _module.__dict__.items() if key != '__doc__'))
+package.__all__ = sorted(EXPORTS.keys())
@@ -2,6 +2,8 @@ import mechanize
 import cookielib
 import random
 import os
+import profiling
+from utils import locked
 
 
 class AnonBrowser(mechanize.Browser):
@@ -36,6 +38,33 @@ class AnonBrowser(mechanize.Browser):
         self.change_user_agent()
         self.change_proxy()
 
+    def _measure(self, method, *args, **kwargs):
+        """
+        Call one of the browser's open methods as a request of the active profiler,
+        recording the url and the size of the response.
+
+        @param self: The current instance.
+        @param method: The unbound method to call.
+        @return: Response
+        """
+        with profiling.measure('request') as info:
+            url = args[0] if len(args) > 0 else kwargs.get('url')
+            if url is not None and 'url' not in info:
+                info['url'] = url.get_full_url() if hasattr(url, 'get_full_url') else url
+            response = method(self, *args, **kwargs)
+            if profiling.current() is not None and 'bytes' not in info and hasattr(response, 'get_data'):
+                info['bytes'] = len(response.get_data())
+            return response
+
+    def open(self, *args, **kwargs):
+        return self._measure(mechanize.Browser.open, *args, **kwargs)
+
+    def open_novisit(self, *args, **kwargs):
+        return self._measure(mechanize.Browser.open_novisit, *args, **kwargs)
+
+    def submit(self, *args, **kwargs):
+        return self._measure(mechanize.Browser.submit, *args, **kwargs)
+
     def clear_cookies(self, cookiefile=None):
         """
         Clear the active cookies in the current session.
@@ -67,24 +96,27 @@ class AnonBrowser(mechanize.Browser):
     def load_cookies(self):
         """
         Load the file in the current cookie jar into the browser
-        session.
+        session.  Other processes may be saving the file, so it is
+        read under a shared lock.
         
         @param self: The current instance
         @return: None
         """
         try:
-            self.cookie_jar.load(ignore_discard=True, ignore_expires=True)
+            with locked(self.cookie_path, exclusive=False):
+                self.cookie_jar.load(ignore_discard=True, ignore_expires=True)
         except IOError:
             pass
 
     def save_cookies(self):
         """
-        Save the cookie jar.
+        Save the cookie jar under an exclusive lock.
 
         @param self: The current instance.
         @return: None
         """
-        self.cookie_jar.save(ignore_discard=True, ignore_expires=True)
+        with locked(self.cookie_path):
+            self.cookie_jar.save(ignore_discard=True, ignore_expires=True)
 
     def change_user_agent(self):
         """
@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import zlib
+import stat
+import getpass
+import hashlib
+import tempfile
+from utils import atomic_write, user_path
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ordereddict import OrderedDict
+
+
+class PageCache(object):
+    """
+    A compressed, on-disk cache of pages and the data parsed from them.  Each entry
+    is stored in its own file; entries expire after their TTL and the least recently
+    used entries are evicted once the cache grows past its byte budget.  The size of
+    the cache is tracked as entries are written, so the directory is only scanned when
+    the budget may have been crossed.
+
+    The directory is only accessible by its owner, as the entries are trusted; if it
+    belongs to someone else, a private directory is used for the life of the process.
+
+    :DIRECTORY      Default directory the cache is stored in, one per local user
+    :DEFAULT_TTL    Default number of seconds an entry is kept for
+    :MAX_BYTES      Default size of the cache on disk
+    """
+    DIRECTORY = user_path(os.path.join(tempfile.gettempdir(), 'jobmine.cache'), getpass.getuser())
+    DEFAULT_TTL = 24 * 60 * 60
+    MAX_BYTES = 32 * 1024 * 1024
+
+    def __init__(self, directory=None, ttl=None, max_bytes=None):
+        """
+        Initialize the cache, creating its directory if needed.
+
+        :directory    Optional directory to store the cache in
+        :ttl          Optional default number of seconds to keep entries for
+        :max_bytes    Optional size of the cache on disk
+        :return       PageCache
+        """
+        self.directory = directory or self.DIRECTORY
+        self.ttl = self.DEFAULT_TTL if ttl is None else ttl
+        self.max_bytes = self.MAX_BYTES if max_bytes is None else max_bytes
+        self.size = None # Unknown until the directory is first scanned
+        try:
+            os.makedirs(self.directory, 0700)
+        except OSError:
+            pass # Created by a concurrent process, or a previous run
+        if not self._private(self.directory):
+            self.directory = tempfile.mkdtemp(prefix='jobmine.cache.')
+
+    @staticmethod
+    def _private(directory):
+        """
+        Determines if the directory is a real directory owned by, and only accessible
+        by, the current user.
+
+        :directory    Path to the directory
+        :return       Boolean
+        """
+        try:
+            info = os.lstat(directory)
+        except OSError:
+            return False
+        if not stat.S_ISDIR(info.st_mode):
+            return False
+        elif not hasattr(os, 'getuid'):
+            return True # Ownership isn't checked on Windows
+        return info.st_uid == os.getuid() and info.st_mode & 0077 == 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(str(key)).hexdigest())
+
+    def get(self, key):
+        """
+        Get the entry stored under the key.  Entries are dictionaries with 'html',
+        'parsed' and 'stored' (timestamp) keys.
+
+        :key       The key of the entry, such as a job identifier
+        :return    Dictionary or None if missing or expired
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as handle:
+                entry = json.loads(zlib.decompress(handle.read()), object_pairs_hook=OrderedDict)
+        except (IOError, ValueError, zlib.error):
+            return None
+
+        if entry['expires'] < time.time():
+            self.delete(key)
+            return None
+
+        # Modification time doubles as the last access time for eviction
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return entry
+
+    def set(self, key, html, parsed, ttl=None):
+        """
+        Store the page and the data parsed from it under the key.
+
+        :key       The key of the entry, such as a job identifier
+        :html      String, the raw page
+        :parsed    The data parsed from the page; must be serializable as JSON
+        :ttl       Optional number of seconds to keep this entry for
+        :return    None
+        """
+        now = time.time()
+        entry = {
+            'html': html.decode('utf-8', 'ignore') if isinstance(html, str) else html,
+            'parsed': parsed,
+            'stored': now,
+            'expires': now + (self.ttl if ttl is None else ttl)
+        }
+
+        # Written atomically so readers never see a partial entry
+        data = zlib.compress(json.dumps(entry))
+        atomic_write(self._path(key), data)
+
+        # Replaced entries and other processes' writes make the size an estimate; eviction
+        # scans the directory and corrects it
+        if self.size is not None:
+            self.size += len(data)
+        if self.size is None or self.size > self.max_bytes:
+            self.evict()
+
+    def delete(self, key):
+        """
+        Remove the entry stored under the key, if any.
+
+        :key       The key of the entry
+        :return    None
+        """
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits in its byte budget,
+        and update the size of the cache.
+
+        :return    None
+        """
+        entries, size = [], 0
+        for name in os.listdir(self.directory):
+            if name.startswith('.'):
+                continue # Entry still being written
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+            size += stat.st_size
+
+        for _, entry_size, name in sorted(entries):
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            size -= entry_size
+        self.size = size
+
+    def clear(self):
+        """
+        Remove every entry in the cache.
+
+        :return    None
+        """
+        for name in os.listdir(self.directory):
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+        self.size = 0
@@ -0,0 +1,128 @@
+"""
+Thin client for the resident Jobmine daemon ('jobmine serve').  Commands are forwarded
+over a Unix socket to a daemon that keeps an authenticated browser warm, so a command
+costs a round-trip to the daemon instead of starting Python, importing the browser and
+logging in.  Only the standard library and the CLI's argument definitions (which don't
+import the browser) are used here, so forwarding stays cheap.
+"""
+import os
+import sys
+import errno
+import json
+import stat
+import socket
+import tempfile
+
+
+# Commands that are interactive or run until interrupted are always run locally
+LOCAL_COMMANDS = ('serve', 'user', 'watch')
+
+# Exit status of a command killed by SIGPIPE, as the shell reports it
+BROKEN_PIPE = 141
+
+
+def socket_path():
+    """
+    Get the path of the daemon's socket; set by the JOBMINE_SOCKET environment
+    variable, which disables the daemon if it is empty.
+
+    :return    String or None
+    """
+    default = os.path.join(tempfile.gettempdir(), 'jobmine-%d.sock' % os.getuid())
+    return os.environ.get('JOBMINE_SOCKET', default) or None
+
+
+def command(args):
+    """
+    Find the command in the command-line arguments: the first argument that isn't a
+    global option or the value of one.  The options taking a value are read from the
+    CLI's parser, so they can't go out of step with it.
+
+    :args      List of command-line arguments
+    :return    String or None if there is no command
+    """
+    from interface import value_options
+
+    options, arguments = value_options(), iter(args)
+    for arg in arguments:
+        if arg.startswith('--') and '=' not in arg and \
+           any(option.startswith(arg) for option in options):
+            next(arguments, None)
+        elif not arg.startswith('-'):
+            return arg
+    return None
+
+
+def owned(path):
+    """
+    Check that the path is a socket owned by the current user.  The default path is in
+    the shared temporary directory, where anyone could have created it first.
+
+    :path      Path of the socket
+    :return    Boolean
+    """
+    try:
+        info = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(info.st_mode) and info.st_uid == os.getuid()
+
+
+def connect(path=None):
+    """
+    Connect to the daemon; a socket that isn't owned by the current user is ignored.
+
+    :path      Optional path of the socket, defaults to socket_path()
+    :return    socket or None if no daemon is listening
+    """
+    path = path or socket_path()
+    if path is None or not owned(path):
+        return None
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(path)
+    except socket.error:
+        connection.close()
+        return None
+    return connection
+
+
+def forward(args, path=None):
+    """
+    Run the command in the daemon if one is listening, printing its output as it
+    arrives.
+
+    :args      List of command-line arguments
+    :path      Optional path of the socket, defaults to socket_path()
+    :return    Integer exit status, or None if the command must be run locally
+    """
+    if command(args) in LOCAL_COMMANDS + (None,):
+        return None
+
+    connection = connect(path)
+    if connection is None:
+        return None
+
+    try:
+        connection.sendall(json.dumps({'args': args, 'cwd': os.getcwd()}) + '\n')
+        for line in connection.makefile('r'):
+            message = json.loads(line)
+            if 'exit' in message:
+                return message['exit']
+            stream = sys.stderr if 'stderr' in message else sys.stdout
+            stream.write((message.get('stdout') or message.get('stderr') or '').encode('utf-8'))
+            stream.flush()
+    except IOError as e:
+        if e.errno != errno.EPIPE:
+            raise
+        # The output was closed early, e.g. piped to 'head'; what's left unwritten is
+        # dropped so it isn't flushed again on exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return BROKEN_PIPE
+    finally:
+        connection.close()
+
+    # The daemon went away mid-command
+    sys.stderr.write('Error: lost the connection to the Jobmine daemon.\n')
+    return 1
@@ -0,0 +1,149 @@
+import os
+import sys
+import json
+import socket
+import threading
+import traceback
+import SocketServer
+import interface
+from client import connect, owned, socket_path
+from jobminebrowser import JobmineBrowser, JobmineException
+from key import get_user_info
+
+
+class SocketStream(object):
+    """
+    File-like object that sends what is written to it to the client, tagged with the
+    name of the stream it stands in for.
+    """
+
+    def __init__(self, output, name):
+        self.output = output
+        self.name = name
+
+    def write(self, text):
+        if isinstance(text, str):
+            text = text.decode('utf-8', 'replace')
+        self.output.write(json.dumps({self.name: text}) + '\n')
+
+    def flush(self):
+        self.output.flush()
+
+
+class CommandHandler(SocketServer.StreamRequestHandler):
+    """
+    Runs a command forwarded by the client (see client.forward) and streams its output
+    back, followed by its exit status.
+    """
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError:
+            return
+        status = self.server.run(request['args'], request.get('cwd'), self.wfile)
+        try:
+            self.wfile.write(json.dumps({'exit': status}) + '\n')
+        except socket.error:
+            pass # The client went away, e.g. its output was piped to 'head'
+
+    def finish(self):
+        try:
+            SocketServer.StreamRequestHandler.finish(self)
+        except socket.error:
+            pass # Output the client didn't read is still buffered
+
+
+class JobmineDaemon(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    """
+    Keeps authenticated browsers, one per user and choice of parser and session TTL,
+    resident and runs the commands forwarded by the client with them; commands that don't
+    choose a parser or session TTL use the daemon's.  A browser holds PeopleSoft's state
+    tokens, which change with every page, so commands are run one at a time; a command
+    that arrives while another is running waits for it.  The socket is only accessible by its owner.
+    """
+    daemon_threads = True
+
+    def __init__(self, path=None, session_ttl=None, parser=None):
+        """
+        Initialize the daemon and listen on the socket.
+
+        :path           Optional path of the socket, defaults to client.socket_path()
+        :session_ttl    Optional number of seconds to trust a saved login session for
+        :parser         Optional name of the HTML parser to use
+        :return         JobmineDaemon
+        """
+        self.path = path or socket_path()
+        if self.path is None:
+            raise JobmineException('No socket to listen on; JOBMINE_SOCKET is empty.')
+
+        connection = connect(self.path)
+        if connection is not None:
+            connection.close()
+            raise JobmineException('A Jobmine daemon is already listening on %s.' % self.path)
+        elif os.path.lexists(self.path) and not owned(self.path):
+            raise JobmineException('%s exists and is not a socket owned by you.' % self.path)
+        elif os.path.lexists(self.path):
+            os.remove(self.path) # Left behind by a daemon that didn't exit cleanly
+
+        self.browsers = {}
+        # Placed before the command's own arguments, which take precedence
+        self.defaults = []
+        if session_ttl is not None:
+            self.defaults += ['--session-ttl', str(session_ttl)]
+        if parser is not None:
+            self.defaults += ['--parser', parser]
+        self.lock = threading.Lock()
+        umask = os.umask(0077)
+        try:
+            SocketServer.UnixStreamServer.__init__(self, self.path, CommandHandler)
+        finally:
+            os.umask(umask)
+
+        # The default user's browser is created up front; it logs in on first use
+        username, _ = get_user_info()
+        if username is not None:
+            self.browsers[(username, parser, session_ttl)] = JobmineBrowser(session_ttl=session_ttl, parser=parser,
+                                                                            username=username)
+
+    def run(self, args, cwd, output):
+        """
+        Run a command as the CLI would, with its output sent to the client.
+
+        :args      List of command-line arguments
+        :cwd       Optional directory to run the command from
+        :output    File to write the output to
+        :return    Integer exit status
+        """
+        with self.lock:
+            stdout, stderr, directory = sys.stdout, sys.stderr, os.getcwd()
+            sys.stdout, sys.stderr = SocketStream(output, 'stdout'), SocketStream(output, 'stderr')
+            try:
+                os.chdir(cwd or directory)
+                interface.main(*(self.defaults + args), browsers=self.browsers)
+                return 0
+            except SystemExit as e:
+                return e.code if isinstance(e.code, int) else int(e.code is not None)
+            except socket.error:
+                return 1 # The client went away
+            except Exception:
+                sys.stderr.write(traceback.format_exc())
+                return 1
+            finally:
+                sys.stdout, sys.stderr = stdout, stderr
+                os.chdir(directory)
+
+    def serve(self):
+        """
+        Serve until interrupted, then remove the socket.
+
+        :return    None
+        """
+        try:
+            self.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.server_close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
@@ -1,8 +1,16 @@
 import os
+import re
+import json
 import sqlite3
+import hashlib
 import datetime
 
-from jobminebrowser import JobmineBrowser
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ordereddict import OrderedDict
+
+from jobminebrowser import JobmineBrowser, CoopPrograms
 from key import get_user_info
 
 
@@ -10,7 +18,83 @@ class ValidationException(Exception):
     pass
 
 
+def _iso_date(end):
+    try:
+        return datetime.datetime.strptime(end, '%d-%b-%Y').strftime('%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+
+def _migrate_v1(c):
+    # Rebuild the jobs table keyed on id with indexes and a full-text index; rows from
+    # the unversioned table are copied over, keeping the latest row for each id
+    tables = [row[0] for row in c.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+    if 'jobs' in tables:
+        c.execute("ALTER TABLE jobs RENAME TO jobs_v0")
+
+    c.execute('''CREATE TABLE jobs
+                 (id integer PRIMARY KEY, name text, employer text, description text, location text,
+                  applied boolean, end text, hash text, closed boolean DEFAULT 0, deadline text, status text,
+                  unit text, term text, openings text, levels text, disciplines text, grades text, comments text)''')
+    for column in ('employer', 'location', 'deadline'):
+        c.execute("CREATE INDEX jobs_%s ON jobs (%s)" % (column, column))
+
+    if 'jobs' in tables:
+        columns = [column[1] for column in c.execute("PRAGMA table_info(jobs_v0)")]
+        digest = 'hash' if 'hash' in columns else 'NULL'
+        closed = 'closed' if 'closed' in columns else '0'
+        # Unversioned databases stored the applied flag inverted
+        c.execute('''INSERT OR REPLACE INTO jobs (id, name, employer, description, location, applied, end, hash, closed, deadline)
+                     SELECT id, name, employer, description, location, NOT applied, end, %s, %s, iso_date(end)
+                     FROM jobs_v0 ORDER BY rowid''' % (digest, closed))
+        c.execute("DROP TABLE jobs_v0")
+
+    try:
+        c.execute('''CREATE VIRTUAL TABLE jobs_fts USING fts5
+                     (name, employer, description, content='jobs', content_rowid='id')''')
+    except sqlite3.OperationalError:
+        return # SQLite was built without FTS5
+
+    c.execute('''CREATE TRIGGER jobs_fts_insert AFTER INSERT ON jobs BEGIN
+                   INSERT INTO jobs_fts (rowid, name, employer, description)
+                   VALUES (new.id, new.name, new.employer, new.description);
+                 END''')
+    c.execute('''CREATE TRIGGER jobs_fts_delete AFTER DELETE ON jobs BEGIN
+                   INSERT INTO jobs_fts (jobs_fts, rowid, name, employer, description)
+                   VALUES ('delete', old.id, old.name, old.employer, old.description);
+                 END''')
+    c.execute('''CREATE TRIGGER jobs_fts_update AFTER UPDATE OF name, employer, description ON jobs BEGIN
+                   INSERT INTO jobs_fts (jobs_fts, rowid, name, employer, description)
+                   VALUES ('delete', old.id, old.name, old.employer, old.description);
+                   INSERT INTO jobs_fts (rowid, name, employer, description)
+                   VALUES (new.id, new.name, new.employer, new.description);
+                 END''')
+    c.execute("INSERT INTO jobs_fts (jobs_fts) VALUES ('rebuild')")
+
+
 class JDatabase():
+    # Each migration upgrades the schema by one version; the version is stored in the
+    # database's user_version
+    MIGRATIONS = [_migrate_v1]
+    SCHEMA_VERSION = len(MIGRATIONS)
+
+    # Number of postings a sync stores per transaction as they arrive
+    BATCH_SIZE = 25
+
+    COLUMNS = ('id', 'name', 'employer', 'description', 'location', 'applied', 'end', 'hash', 'closed',
+               'deadline', 'status', 'unit', 'term', 'openings', 'levels', 'disciplines', 'grades', 'comments')
+
+    # Columns filled from the details of a posting, and the labels view_job gives them
+    DETAIL_COLUMNS = OrderedDict([
+        ('unit', ('Unit', )),
+        ('term', ('Work Term', 'Term')),
+        ('openings', ('Available Openings', 'Openings')),
+        ('levels', ('Levels', 'Level')),
+        ('disciplines', ('Disciplines', 'Discipline')),
+        ('grades', ('Grades', )),
+        ('comments', ('Comments', ))
+    ])
+
     def create_database(self, name=None):
         if name is None:
             name = 'jerbminer.db'
@@ -19,24 +103,49 @@ class JDatabase():
             os.remove(name)
 
         # Populate the initial fields in the database
-        self.name = name
-        self.conn = sqlite3.connect(name)
+        self.connect(name)
+
+    def create_tables(self):
         c = self.conn.cursor()
-        c.execute('''CREATE TABLE jobs
-                     (id integer, name text, employer text, description blob, location text, applied boolean, end integer)''')
-        self.conn.commit()
+        version = c.execute("PRAGMA user_version").fetchone()[0]
+        if version >= self.SCHEMA_VERSION:
+            return
+
+        # Run the migrations in a single transaction; the sqlite3 module would otherwise
+        # commit before every schema change
+        self.conn.isolation_level = None
+        try:
+            c.execute("BEGIN")
+            for migration in self.MIGRATIONS[version:]:
+                migration(c)
+            c.execute("PRAGMA user_version=%d" % self.SCHEMA_VERSION)
+            c.execute("COMMIT")
+        except:
+            c.execute("ROLLBACK")
+            raise
+        finally:
+            self.conn.isolation_level = ''
 
     def connect(self, name=None):
         if name is None:
             name = 'jerbminer.db'
         self.name = name
         self.conn = sqlite3.connect(name)
+        self.conn.create_function('iso_date', 1, _iso_date)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.create_tables()
 
     def exists(self, name=None):
         if name is None:
             name = 'jerbminer.db'
         return os.path.isfile(name)
 
+    def has_fts(self):
+        c = self.conn.cursor()
+        c.execute("SELECT 1 FROM sqlite_master WHERE name='jobs_fts'")
+        return c.fetchone() is not None
+
     def get_cursor(self):
         return self.conn.cursor()
 
@@ -45,7 +154,7 @@ class JDatabase():
         os.remove(self.name)
 
     def close(self):
-        self.quit()
+        self.conn.close()
 
     def fetch(self, _id):
         try:
@@ -68,35 +177,195 @@ class JDatabase():
 
     def add(self, _id, name, employer, description, location, end, applied=False):
         try:
-            _id = int(_id)
+            date = datetime.datetime.strptime(end, '%d-%b-%Y')
         except ValueError:
-            raise ValidationException('id not valid integer or string that can be coerced')
+            raise ValidationException('date not correct format')
+
+        self.upsert(_id, name, employer, description, location, end, applied)
+
+    def upsert(self, _id, name, employer, description, location, end, applied=False, digest=None, details=None):
+        self.upsert_many([self.record(_id, name, employer, description, location, end, applied, digest, details)])
 
+    def record(self, _id, name, employer, description, location, end, applied=False, digest=None, details=None,
+               status=None):
         try:
-            date = datetime.datetime.strptime(end, '%d-%b-%Y')
+            _id = int(_id)
         except ValueError:
-            raise ValidationException('date not correct format')
+            raise ValidationException('id not valid integer or string that can be coerced')
+
+        job = dict.fromkeys(self.COLUMNS)
+        job.update({
+            'id': _id,
+            'name': name,
+            'employer': employer,
+            'description': description,
+            'location': location,
+            'applied': 1 if applied else 0,
+            'end': end,
+            'hash': digest,
+            'closed': 0,
+            'deadline': _iso_date(end),
+            'status': status
+        })
+
+        for column, labels in self.DETAIL_COLUMNS.items():
+            job[column] = next((details[label] for label in labels if label in (details or {})), None)
+        return job
+
+    def upsert_many(self, jobs):
+        # Insert or update the jobs, given as dictionaries built by record(), in a
+        # single transaction
+        columns = [column for column in self.COLUMNS if column != 'id']
+        update = "UPDATE jobs SET %s WHERE id=:id" % ', '.join('%s=:%s' % (column, column) for column in columns)
+        insert = "INSERT OR IGNORE INTO jobs (%s) VALUES (%s)" % (', '.join(self.COLUMNS),
+                                                                 ', '.join(':' + column for column in self.COLUMNS))
+        jobs = list(jobs)
+        with self.conn:
+            c = self.conn.cursor()
+            c.executemany(update, jobs)
+            c.executemany(insert, jobs)
+
+    # Words matched against the stored fields for the levels, statuses and terms
+    # accepted by JobSearchQuery
+    LEVELS = {
+        'jr': 'Junior',
+        'int': 'Intermediate',
+        'sr': 'Senior',
+        'bachelors': 'Bachelor',
+        'masters': 'Master',
+        'phd': 'Ph.D'
+    }
+    STATUSES = {
+        'approved': 'Approved',
+        'available': 'Available',
+        'cancelled': 'Cancelled',
+        'posted': 'Posted'
+    }
+    SEASONS = {
+        '1': 'Winter',
+        '5': 'Spring',
+        '9': 'Fall'
+    }
+
+    def search(self, filters=None, keywords=None, closed=False):
+        # Search the mirrored postings with the filters accepted by JobSearchQuery and
+        # full-text keywords; rows are streamed from the cursor as they are read
+        filters = dict((key, value) for key, value in (filters or {}).items() if value)
+        clauses, params = [], []
+
+        for column, key in (('employer', 'employer'), ('name', 'title'), ('location', 'location')):
+            if key in filters:
+                clauses.append("jobs.%s LIKE ?" % column)
+                params.append('%%%s%%' % filters[key])
+
+        if 'term' in filters:
+            term = str(filters['term'])
+            if re.match(r'^1[0-9]{2}[159]$', term):
+                # Quest term numbers are 1, the last two digits of the year and the month
+                words = [self.SEASONS[term[3]], '20' + term[1:3]]
+            else:
+                words = term.split()
+            clauses.extend("jobs.term LIKE ?" for _ in words)
+            params.extend('%%%s%%' % word for word in words)
+
+        for column, key, words in (('levels', 'levels', self.LEVELS), ('status', 'status', self.STATUSES)):
+            if key in filters:
+                values = filters[key] if isinstance(filters[key], (list, tuple)) else [filters[key]]
+                clauses.append('(%s)' % ' OR '.join("jobs.%s LIKE ?" % column for _ in values))
+                params.extend('%%%s%%' % words.get(value, value) for value in values)
+
+        if 'disciplines' in filters:
+            names = [(CoopPrograms.get(name) or [name])[0] for name in filters['disciplines'][:3]]
+            clauses.append('(%s)' % ' OR '.join("jobs.disciplines LIKE ?" for _ in names))
+            params.extend('%%%s%%' % name.replace('_', ' ') for name in names)
 
+        if not closed:
+            clauses.append("jobs.closed=0")
+
+        query = "SELECT jobs.id, jobs.name, jobs.employer, jobs.location, jobs.end, jobs.status FROM jobs"
+        if keywords and self.has_fts():
+            query += " JOIN jobs_fts ON jobs_fts.rowid = jobs.id"
+            # Each word is quoted so that punctuation isn't read as query syntax
+            clauses.append("jobs_fts MATCH ?")
+            params.append(' '.join('"%s"' % word.replace('"', '""') for word in keywords.split()))
+        elif keywords:
+            clauses.extend("(jobs.name || ' ' || jobs.employer || ' ' || jobs.description) LIKE ?"
+                           for _ in keywords.split())
+            params.extend('%%%s%%' % word for word in keywords.split())
+
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY jobs.deadline, jobs.id"
+
+        # Identifiers are stored as integers, but Jobmine lists them zero-padded
+        headers = ('Job Identifier', 'Job Title', 'Employer', 'Location', 'Last Day to Apply', 'Job Status')
+        for row in self.conn.execute(query, params):
+            yield OrderedDict(zip(headers, ['%08d' % row[0]] + [value if value is not None else ''
+                                                                for value in row[1:]]))
+
+    def hashes(self):
         c = self.conn.cursor()
-        applied = 0 if applied else 1
-        c.execute("INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?)", (_id, name, employer, description, location, applied, end))
-        self.conn.commit()
+        c.execute("SELECT id, hash FROM jobs WHERE closed=0")
+        return dict(c.fetchall())
+
+    def close_missing(self, ids):
+        # Postings that are no longer listed are kept, but marked as closed
+        ids = set(int(_id) for _id in ids)
+        missing = [(_id, ) for _id in self.hashes() if _id not in ids]
+        with self.conn:
+            self.conn.executemany("UPDATE jobs SET closed=1 WHERE id=?", missing)
+        return len(missing)
+
+
+def summary_hash(summary):
+    return hashlib.sha1(json.dumps(summary.items())).hexdigest()
 
 
-def init_db(name=None, password=None):
-    jb = JobmineBrowser()
+def init_db(name=None, password=None, workers=None):
+    return sync_db(name, password, workers=workers, rebuild=True)
+
+
+def sync_db(name=None, password=None, workers=None, rebuild=False, browser=None, database=None):
+    jb = browser if browser is not None else JobmineBrowser()
     db = JDatabase()
 
-    if name is not None and password is not None:
+    if browser is not None:
+        pass # Already authenticated by the caller
+    elif name is not None and password is not None:
         jb.authenticate(name, password)
     else:
         jb.authenticate(*get_user_info())
 
     apps = jb.list_applications()
-    db.create_database()
+    if rebuild or not db.exists(database):
+        db.create_database(database)
+    else:
+        db.connect(database)
 
-    for app in apps:
-        details = jb.view_job(app['Job ID'])
+    # Only postings that are new or whose summary changed since the last sync are fetched;
+    # job details are fetched in parallel and stored in batches as they arrive, so a sync
+    # that fails part way keeps what it fetched
+    apps = dict((app['Job ID'], app) for app in apps)
+    known = db.hashes()
+    changed = [job_id for job_id, app in apps.items() if known.get(int(job_id)) != summary_hash(app)]
+
+    jobs = []
+    for job_id, details in jb.view_jobs(changed, workers=workers, refresh=True):
+        app = apps[job_id]
         end = app['Last Day to Apply'] if len(app['Last Day to Apply']) > 0 else '01-JAN-1970'
-        location = app['Work Location'] if 'Work Location' in app else ""
-        db.add(app['Job ID'], app['Job Title'], app['Employer'], details['Description'], location, end, True)
+        location = app['Work Location'] if 'Work Location' in app else details.get('Work Location', "")
+        jobs.append(db.record(app['Job ID'], app['Job Title'], app['Employer'], details['Description'], location, end,
+                              True, digest=summary_hash(app), details=details, status=app.get('Job Status')))
+        if len(jobs) >= db.BATCH_SIZE:
+            db.upsert_many(jobs)
+            jobs = []
+    db.upsert_many(jobs)
+
+    # Postings are only closed once every changed posting has been stored
+    closed = db.close_missing(apps.keys())
+
+    return OrderedDict([
+        ('Fetched', len(changed)),
+        ('Unchanged', len(apps) - len(changed)),
+        ('Closed', closed)
+    ])
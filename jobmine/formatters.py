@@ -1,3 +1,17 @@
+import csv
+import json
+import tempfile
+import itertools
+from collections import Iterator
+from operator import itemgetter
+from profiling import profiled
+from records import Record, to_json
+
+# Output formats the CLI can print results in
+OUTPUTS = ('table', 'jsonl', 'csv')
+
+
+@profiled('format')
 def format(result):
     """
     Formats the output from the browser call into a string.
@@ -14,7 +28,7 @@ def format(result):
             return format_as_table(result,
                                    result[0].keys(),
                                    result[0].keys())
-    elif isinstance(result, dict):
+    elif isinstance(result, (dict, Record)):
         return format_as(result)
     elif isinstance(result, bool):
         return 'Success' if result else 'Failed'
@@ -31,26 +45,30 @@ def format_as(data, keys=None, sort_by_key=None):
     :keys           Specific keys to show
     :sort_by_key    Boolean indicates whether or not to sort output by keys
     """
-    output = ""
     items = data.items()
 
     if keys:
         items = filter(lambda item: item[0] in keys, items)
 
     if sort_by_key:
-        items = sorted(items, lambda x: x[0])
+        items = sorted(items, key=itemgetter(0))
+
+    return "\n\n".join("%s:\n%s" % (key.title(), value) for key, value in items) + " "
 
-    for index, (key, value) in enumerate(items):
-        output += "%s:\n%s%s" % (key.title(),
-                                 value,
-                                 " " if index == len(data) - 1 else "\n\n")
 
-    return output
+def _text(value):
+    # Cells are converted once; unicode is kept as is rather than encoded by str()
+    return value if isinstance(value, basestring) else str(value)
 
 
+def _row(widths, values):
+    return '   '.join('%-*s' % (width, value) for width, value in zip(widths, values)).rstrip()
+
+
+@profiled('format')
 def format_as_table(data, keys, header=None, sort_by_key=None, sort_order_reverse=False):
     """Takes a list of dictionaries, formats the data, and returns
-    the formatted data as a text table.
+    the formatted data as a text table.  The data is left unchanged.
 
     Source:
         http://www.calazan.com/python-function-for-displaying-a-list-of-dictionaries-in-table-format/
@@ -72,37 +90,149 @@ def format_as_table(data, keys, header=None, sort_by_key=None, sort_order_revers
                       key=itemgetter(sort_by_key),
                       reverse=sort_order_reverse)
 
-    # If header is not empty, add header to data
+    rows = [[_text(element[key]) for key in keys] for element in data]
+
+    # If header is not empty, put the header and a divider based on the
+    # length of each header above the rows
     if header:
-        # Get the length of each header and create a divider based
-        # on that length
-        header_divider = []
-        for name in header:
-            header_divider.append('-' * len(name))
-
-        # Create a list of dictionary from the keys and the header and
-        # insert it at the beginning of the list. Do the same for the
-        # divider and insert below the header.
-        header_divider = dict(zip(keys, header_divider))
-        data.insert(0, header_divider)
-        header = dict(zip(keys, header))
-        data.insert(0, header)
-
-    column_widths = []
-    for key in keys:
-        column_widths.append(max(len(str(column[key])) for column in data))
-
-    # Create a tuple pair of key and the associated column width for it
-    key_width_pair = zip(keys, column_widths)
-
-    format = ('%-*s   ' * len(keys)).strip() + '\n'
-    formatted_data = ''
-    for element in data:
-        data_to_format = []
-        # Create a tuple that will be used for the formatting in
-        # width, value format
-        for pair in key_width_pair:
-            data_to_format.append(pair[1])
-            data_to_format.append(element[pair[0]])
-        formatted_data += (format % tuple(data_to_format))
-    return formatted_data.rstrip()
+        rows[:0] = [list(header), ['-' * len(name) for name in header]]
+
+    widths = [max([0] + [len(row[index]) for row in rows]) for index in range(len(keys))]
+    return '\n'.join(_row(widths, row) for row in rows)
+
+
+def format_stream(rows, sample=25, widths=None):
+    """
+    Formats an iterable of dictionaries as a text table, yielding each line as soon as
+    its row is available.  Column widths are taken from the header and the first sample
+    of rows, so only that many rows are buffered; longer values later on overflow their
+    column.  Fixed widths buffer nothing, and longer values are cut to fit.
+
+    :rows      Iterable of dictionaries
+    :sample    Integer, number of rows used to size the columns
+    :widths    Optional integer or list of integers, fixed widths of the columns
+    :return    Generator
+    """
+    rows = iter(rows)
+    head = list(itertools.islice(rows, 1 if widths is not None else sample))
+    if len(head) == 0:
+        yield "No results found."
+        return
+
+    keys, fixed = head[0].keys(), widths is not None
+    if widths is None:
+        widths = [max([len(key)] + [len(_text(row[key])) for row in head]) for key in keys]
+    elif isinstance(widths, int):
+        widths = [widths] * len(keys)
+
+    @profiled('format')
+    def render(values):
+        if fixed:
+            values = [value[:width] for width, value in zip(widths, values)]
+        return _row(widths, values)
+
+    yield render(keys)
+    yield render('-' * len(key) for key in keys)
+    for row in itertools.chain(head, rows):
+        yield render(_text(row[key]) for key in keys)
+
+
+def format_spooled(rows, spool=1024 * 1024):
+    """
+    Formats an iterable of dictionaries as a text table whose columns fit every row,
+    in two passes: the rows are converted and written to a spool, which stays in memory
+    until it grows past the limit and then moves to a temporary file, while the widths
+    are measured; the table is then rendered from the spool.
+
+    :rows      Iterable of dictionaries
+    :spool     Integer, number of bytes to buffer in memory
+    :return    Generator
+    """
+    with tempfile.SpooledTemporaryFile(max_size=spool) as buffered:
+        keys, widths = None, None
+        for row in rows:
+            if keys is None:
+                keys = row.keys()
+                widths = [len(key) for key in keys]
+            values = [_text(row[key]) for key in keys]
+            widths = [max(width, len(value)) for width, value in zip(widths, values)]
+            buffered.write(json.dumps(values) + '\n')
+
+        if keys is None:
+            yield "No results found."
+            return
+
+        @profiled('format')
+        def render(values):
+            return _row(widths, values)
+
+        buffered.seek(0)
+        yield render(keys)
+        yield render('-' * len(key) for key in keys)
+        for line in buffered:
+            yield render(json.loads(line))
+
+
+def format_jsonl(rows):
+    """
+    Formats an iterable of dictionaries as JSON objects, one per line, yielding each
+    line as soon as its row is available.
+
+    :rows      Iterable of dictionaries
+    :return    Generator
+    """
+    for row in rows:
+        yield json.dumps(row, default=to_json)
+
+
+class _Line(object):
+    # Holds the last line written by csv.writer, so rows can be yielded one at a time
+    def write(self, line):
+        self.line = line
+
+
+def format_csv(rows):
+    """
+    Formats an iterable of dictionaries as CSV with a header row, yielding each line as
+    soon as its row is available.  Text is encoded as UTF-8.
+
+    :rows      Iterable of dictionaries
+    :return    Generator
+    """
+    output = _Line()
+    writer, keys = csv.writer(output, lineterminator=''), None
+    for row in rows:
+        if keys is None:
+            keys = row.keys()
+            writer.writerow([_text(key).encode('utf-8') for key in keys])
+            yield output.line
+        writer.writerow([_text(row[key]).encode('utf-8') for key in keys])
+        yield output.line
+
+
+def render(result, output='table', widths=None):
+    """
+    Render a result in an output format, yielding it line by line so that streamed
+    results are printed as they arrive.  Lists and iterables of dictionaries are rows;
+    a dictionary is a single row, except in a table; anything else is printed as text.
+
+    :result    object
+    :output    Output format, one of OUTPUTS
+    :widths    Column widths of streamed tables; 'sample' to size them from the first
+               rows, 'full' to fit every row (in two passes), or an integer for fixed widths
+    :return    Generator
+    """
+    streamed = isinstance(result, Iterator)
+    if output == 'table' and streamed:
+        if widths == 'full':
+            lines = format_spooled(result)
+        else:
+            lines = format_stream(result, widths=None if widths in (None, 'sample') else int(widths))
+    elif output != 'table' and (streamed or isinstance(result, (list, dict, Record))):
+        rows = [result] if isinstance(result, (dict, Record)) else result
+        lines = format_jsonl(rows) if output == 'jsonl' else format_csv(rows)
+    else:
+        lines = [format(result)]
+
+    for line in lines:
+        yield line
@@ -2,27 +2,104 @@ import sys
 import json
 import getpass
 import argparse
-from utils import open_os
-from formatters import format
+import itertools
+import threading
+from utils import open_os, user_path, lazy_import
+from formatters import format, format_as_table, render, OUTPUTS
 from operator import itemgetter
-from jobminebrowser import JobmineBrowser, JobmineException, JobSearchQuery
-from key import store_user_info, get_user_info, remove_user
+from collections import Iterator
+from pool import BrowserPool
+from session import JobmineSession
+from profiling import Profiler, current as current_profiler
+from records import Record
+from parsers import available as available_parsers
+from watch import Watcher, PrintSink, JsonLinesSink, CommandSink
+from key import store_user_info, get_user_info, remove_user, list_users
 
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ordereddict import OrderedDict
 
-def parse_arguments(args):
+# The browser pulls in mechanize, requests and BeautifulSoup; they are only imported
+# once a command needs Jobmine, so help and user commands start quickly
+jobminebrowser = lazy_import('jobminebrowser', globals())
+database = lazy_import('database', globals())
+daemon = lazy_import('daemon', globals())
+
+
+def column_widths(value):
+    """
+    Parse the --widths argument; 'sample', 'full' or a number of characters.
+
+    :value     String
+    :return    String or Integer
+    """
+    if value in ('sample', 'full') or value.isdigit():
+        return value if not value.isdigit() else int(value)
+    raise argparse.ArgumentTypeError("expected 'sample', 'full' or a number, got '%s'" % value)
+
+
+def add_global_options(parser):
+    """
+    Add the options that come before the command to the parser.
+
+    :parser    ArgumentParser
+    :return    None
+    """
+    parser.add_argument('--session-ttl', type=int, default=None, metavar='seconds',
+                        help='seconds to trust a saved login session for, defaults to %d' % JobmineSession.DEFAULT_TTL)
+    parser.add_argument('--parser', choices=available_parsers(), default=None,
+                        help='HTML parser used on Jobmine pages, defaults to soup')
+    parser.add_argument('--max-workers', type=int, default=None, metavar='N',
+                        help='most concurrent requests made to Jobmine, defaults to %d' % BrowserPool.MAX_WORKERS)
+    parser.add_argument('--verify', action='store_true', default=False,
+                        help='list again after a change to confirm it, rather than trusting Jobmine\'s response')
+    parser.add_argument('--profile', action='store_true', default=False,
+                        help='print the requests made and the time spent on the network, parsing and rendering')
+    parser.add_argument('--output', choices=OUTPUTS, default='table',
+                        help='print results as a table, JSON objects (one per line) or CSV, defaults to table')
+    parser.add_argument('--widths', type=column_widths, default='sample', metavar='{sample,full,N}',
+                        help='column widths of streamed tables; sized from the first rows (sample), '
+                             'fitted to every row (full) or fixed at N characters, defaults to sample')
+    parser.add_argument('--all-users', action='store_true', default=False,
+                        help='run the command for every stored user in parallel; output is tagged by user')
+
+
+def value_options():
+    """
+    Get the option strings of the global options that take a value, so the client can
+    tell the command apart from their values.
+
+    :return    List of Strings
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    add_global_options(parser)
+    return [option for action in parser._actions if action.nargs != 0 for option in action.option_strings]
+
+
+def parse_arguments(args, browsers=None, options=None):
     """
     Creates the subparser for the jobmine-cli application and parses the command-line
     arguments.
+
+    :args        List of command-line arguments
+    :browsers    Optional dictionary of browsers to reuse, such as the daemon's, keyed on
+                 (username, parser, session_ttl); browsers created for a user are added to it
+    :options     Optional dictionary to update with the parsed arguments
+    :return      object
     """
     # Create and add the subparsers for the supported Jobmine methods;
     # parse the arguments based on the subparser
     parser = argparse.ArgumentParser(description='Command-line interface for the Jobmine python application.',
                                      prog='jobmine', epilog='Who would make such a thing?')
+    add_global_options(parser)
     subparsers = parser.add_subparsers(help='Sub-command menu', dest='command')
 
     user = subparsers.add_parser('user', help='jobmine cli user utilities')
     user.add_argument('--delete', action='store_true', default=False, help='delete the stored user')
     user.add_argument('--change', action='store_true', default=False, help='change the default user')
+    user.add_argument('--session', action='store_true', default=False, help='show the saved login session')
 
     documents = subparsers.add_parser('documents', help='view/upload/list resumes')
     documents.add_argument('--list', action='store_true', default=False, help='list documents')
@@ -30,9 +107,13 @@ def parse_arguments(args):
     documents.add_argument('--upload', nargs=2, metavar=('path', 'name'), help='upload a new resume')
     documents.add_argument('--download', nargs=2, metavar=('id', 'document_type'), help='download specified document; types can be doc or package')
     documents.add_argument('--delete', nargs=1, metavar='id', help='delete the specified document')
+    documents.add_argument('--download-all', metavar='dir', help='download every resume and package into the directory, skipping ones not updated since they were last downloaded')
+    documents.add_argument('--sync', metavar='dir', help='upload the PDFs in the directory that changed, each into the document named after it')
+    documents.add_argument('--workers', type=int, default=None, help='number of documents to download in parallel')
 
     shortlist = subparsers.add_parser('shortlist', help='get shortlisted jobs')
-    shortlist.add_argument('--add', nargs=1, metavar='job_id', help='pass job identifier for a job to add to your shortlist')
+    shortlist.add_argument('--add', nargs='+', metavar='job_id',
+                           help='pass job identifiers for jobs to add to your shortlist; several are added in one search')
     shortlist.add_argument('--remove', nargs=1, metavar='job_id', help='pass job identifier for a job to remove from your shortlist')
     shortlist.add_argument('--status', nargs='?', metavar='status', help='status of the job', default='posted',
                            choices=('approved', 'available', 'cancelled', 'posted'))
@@ -51,8 +132,31 @@ def parse_arguments(args):
     applications.add_argument('--remove', nargs=1, metavar='job_id', help='remove the specified application')
     applications.add_argument('--apply', nargs=2, metavar=('job_id', 'doc'), help='apply to the specified job with given document')
 
+    sync = subparsers.add_parser('sync', help='mirror your applications into the local database')
+    sync.add_argument('--rebuild', action='store_true', default=False, help='rebuild the database from scratch')
+    sync.add_argument('--workers', type=int, default=None, help='number of postings to fetch in parallel')
+
+    watch = subparsers.add_parser('watch', help='watch for changes to your interviews, applications, etc.')
+    watch.add_argument('endpoints', nargs='*', metavar='endpoint',
+                       help='endpoints to watch; one or more of %s, defaults to all' % ', '.join(Watcher.ENDPOINTS))
+    watch.add_argument('--interval', type=int, default=None, metavar='seconds',
+                       help='seconds between polls when nothing is happening, defaults to %d' % Watcher.INTERVAL)
+    watch.add_argument('--once', action='store_true', default=False, help='poll once and exit')
+    watch.add_argument('--state', default=None, metavar='path', help='file to keep the watcher\'s state in')
+    watch.add_argument('--log', default=None, metavar='path', help='also append changes to a JSON lines file')
+    watch.add_argument('--exec', default=None, metavar='command', dest='command_sink',
+                       help='run a shell command for every change')
+
+    serve = subparsers.add_parser('serve', help='keep a logged in browser resident and run commands sent to it')
+    serve.add_argument('--socket', default=None, metavar='path',
+                       help='Unix socket to listen on, defaults to JOBMINE_SOCKET or one in the temporary directory')
+
     search = subparsers.add_parser('jobs', help='search for jobs; all options are optional.')
     search.add_argument('--view', nargs='?', help='view the posting specified by the job id', dest='job_id')
+    search.add_argument('--no-cache', action='store_false', default=True, dest='cache',
+                        help='do not read or store the posting in the page cache')
+    search.add_argument('--refresh', action='store_true', default=False,
+                        help='fetch the posting even if it is cached')
     search.add_argument('--search', action='store_true', default=False, help='search for jobs')
     search.add_argument('--employer', help='string to match employer\'s name')
     search.add_argument('--title', help='string to match job title')
@@ -60,12 +164,24 @@ def parse_arguments(args):
     search.add_argument('--term', help='the term to look for; one of (semester YYYY or the term number XXXX)')
     search.add_argument('--levels', help='the seniority of the position, defaults jr, int, sr',
                         choices=('jr', 'int', 'sr', 'bachelors', 'phd', 'masters'))
-    search.add_argument('--status', help='the status of the job', choices=('approved', 'available', 'cancelled', 'posted'),
-                        default='posted')
+    search.add_argument('--status', help='the status of the job, defaults to posted',
+                        choices=('approved', 'available', 'cancelled', 'posted'))
     search.add_argument('--disciplines', help='up to three programs for the jobs', nargs='*')
     search.add_argument('--limit', help='limit the number of results returned', default=None)
+    search.add_argument('--offline', action='store_true', default=False,
+                        help='search the postings mirrored by sync instead of Jobmine')
+    search.add_argument('--keywords', help='full-text keywords to match; requires --offline')
 
     opts = vars(parser.parse_args(args))
+    if opts['command'] == 'jobs' and opts['keywords'] and not opts['offline']:
+        search.error('--keywords requires --offline')
+    if opts['max_workers'] is not None and opts['max_workers'] < 1:
+        parser.error('--max-workers must be at least 1')
+    if options is not None:
+        options.update(opts)
+    if opts['profile']:
+        # Stopped and reported by main once the result is printed
+        Profiler().start()
     if opts['command'] == 'user':
         if opts['delete']:
             username, _ = get_user_info()
@@ -75,104 +191,308 @@ def parse_arguments(args):
             username = raw_input("Username: ")
             store_user_info(username, getpass.getpass("Password: "))
             return 'Default user is now %s' % username
+        elif opts['session'] and opts['all_users']:
+            sessions = []
+            for username in list_users():
+                stats = JobmineSession.for_user(username, ttl=opts['session_ttl']).stats()
+                stats['User'] = username
+                sessions.append(stats)
+            return sessions
+        elif opts['session']:
+            username, _ = get_user_info()
+            return JobmineSession.for_user(username, ttl=opts['session_ttl']).stats()
         else:
             return user.format_help() 
+    elif opts['command'] == 'jobs' and opts['search'] and opts['offline']:
+        # Offline searches only read the local database, so they need neither a user
+        # nor Jobmine to be open; with --all-users, the database each user's sync wrote
+        # is searched and the rows are tagged with the user
+        filters = dict((query, opts[query]) for query in jobminebrowser.JobSearchQuery.filters if \
+                       opts[query] is not None)
+        limit = int(opts['limit']) if opts['limit'] else None
+        if not opts['all_users']:
+            return itertools.islice(search_offline(filters, opts['keywords']), limit)
+
+        names = [(username, user_path('jerbminer.db', username)) for username in list_users()]
+        names = [(username, name) for username, name in names if database.JDatabase().exists(name)]
+        if len(names) == 0:
+            raise jobminebrowser.JobmineException("No local database found.  Have you run '--all-users sync'?")
+        rows = (OrderedDict([('User', username)] + row.items()) for username, name in names \
+                for row in search_offline(filters, opts['keywords'], name))
+        return itertools.islice(rows, limit)
+    elif opts['command'] == 'serve':
+        server = daemon.JobmineDaemon(opts['socket'], session_ttl=opts['session_ttl'], parser=opts['parser'])
+        print 'Listening on %s' % server.path
+        sys.stdout.flush()
+        server.serve()
+        return 'Stopped serving.'
+    elif opts['all_users']:
+        return run_all_users(opts, help=parser.format_help(), browsers=browsers)
     else:
-        browser = JobmineBrowser()
         username, password = get_user_info()
-        ordering = {
-            'apps': "#  Apps",
-            'id': "Job Identifier",
-            'name': "Job Title",
-            'employer': "Employer",
-            'status': "App. Status"
-        }
-
-
-        def sort(item, key):
-            """
-            """
-            try:
-                num = int(item[key])
-                return num
-            except ValueError:
-                return item[key]
-
-
-        if username is None or password is None:
-            raise JobmineException("No user found.  Have you run 'user --add'?")
-
-        browser.authenticate(username, password)
-        if opts['command'] == 'documents':
-            if opts['list']:
-                return browser.list_documents()
-            elif opts['download']:
-                path = browser.download_document(*opts['download'])
-                open_os(path)
-                return path
-            elif opts['delete']:
-                return browser.delete_document(int(opts['delete'][0]))
-            elif opts['upload']:
-                return browser.upload_document(path=opts['upload'][0],
-                                               name=opts['upload'][1])
-            elif opts['edit']:
-                return browser.upload_document(path=opts['edit'][0],
-                                               existing=int(opts['edit'][1]))
-        elif opts['command'] == 'applications':
-            if opts['remove']:
-                _id = int(opts['remove'][0])
-                if _id <= 50:
-                    return browser.remove_application(id=_id)
-                return browser.remove_application(job_id=_id)
-            elif opts['apply']:
-                return browser.make_application(opts['apply'][0], opts['apply'][1])
-            else:
-                order = ordering.get(opts['order'])
-                applications = browser.list_applications(active=opts['inactive'])
-                return applications if applications is None else \
-                    sorted(applications, key=lambda app: sort(app, order))
-
-        elif opts['command'] == 'interviews':
-            return browser.list_interviews(interview=opts['interview'])
-
-        elif opts['command'] == 'shortlist':
-            if opts['add']:
-                return browser.add_to_shortlist(opts['add'][0], filters={
-                    'status': opts['status']
-                })
-            elif opts['remove']:
-                return browser.remove_from_shortlist(opts['remove'][0])
+        return run_command(opts, username, password, help=parser.format_help(), browsers=browsers)
+
+
+def search_offline(filters, keywords=None, name=None):
+    """
+    Search the local database for postings.
+
+    :filters     Dictionary of JobSearchQuery filters
+    :keywords    Optional full-text keywords to match
+    :name        Optional path of the database, defaults to the shared one
+    :return      Generator of OrderedDicts
+    """
+    db = database.JDatabase()
+    if not db.exists(name):
+        raise jobminebrowser.JobmineException("No local database found.  Have you run 'sync'?")
+    db.connect(name)
+    return db.search(filters=filters, keywords=keywords)
+
+
+def run_command(opts, username, password, help=None, browsers=None):
+    """
+    Run a command that uses Jobmine as the specified user.
+
+    :opts        Dictionary of the parsed command-line arguments
+    :username    String, the user's Quest ID
+    :password    String, the user's Quest password
+    :help        Optional usage to return if the command does nothing
+    :browsers    Optional dictionary of browsers to reuse, keyed on (username, parser, session_ttl)
+    :return      object
+    """
+    ordering = {
+        'apps': "#  Apps",
+        'id': "Job Identifier",
+        'name': "Job Title",
+        'employer': "Employer",
+        'status': "App. Status"
+    }
 
+
+    def sort(item, key):
+        """
+        """
+        try:
+            num = int(item[key])
+            return num
+        except ValueError:
+            return item[key]
+
+
+    if username is None or password is None:
+        raise jobminebrowser.JobmineException("No user found.  Have you run 'user --add'?")
+
+    # Each account has its own session, so accounts can be used side by side; a browser
+    # is only reused for commands that ask for the same parser and session TTL
+    key = (username, opts['parser'], opts['session_ttl'])
+    browser = (browsers or {}).get(key)
+    if browser is None:
+        browser = jobminebrowser.JobmineBrowser(session_ttl=opts['session_ttl'], parser=opts['parser'],
+                                                username=username, max_workers=opts['max_workers'])
+        if browsers is not None:
+            browsers[key] = browser
+    else:
+        # Concurrency is chosen per command
+        browser.max_workers = opts['max_workers'] or BrowserPool.MAX_WORKERS
+    tagged = opts['all_users']
+
+    # Logging in is deferred until a command needs Jobmine and skipped entirely
+    # while the saved session is trusted
+    browser.authenticate(username, password, lazy=True)
+    if opts['command'] == 'documents':
+        if opts['list']:
+            return browser.list_documents()
+        elif opts['download']:
+            path = browser.download_document(*opts['download'])
+            open_os(path)
+            return path
+        elif opts['download_all']:
+            return browser.download_documents(opts['download_all'], workers=opts['workers'])
+        elif opts['sync']:
+            return browser.sync_documents(opts['sync'], verify=opts['verify'])
+        elif opts['delete']:
+            return browser.delete_document(int(opts['delete'][0]), verify=opts['verify'])
+        elif opts['upload']:
+            return browser.upload_document(path=opts['upload'][0],
+                                           name=opts['upload'][1], verify=opts['verify'])
+        elif opts['edit']:
+            return browser.upload_document(path=opts['edit'][0],
+                                           existing=int(opts['edit'][1]), verify=opts['verify'])
+    elif opts['command'] == 'applications':
+        if opts['remove']:
+            _id = int(opts['remove'][0])
+            if _id <= 50:
+                return browser.remove_application(_id=_id, verify=opts['verify'])
+            return browser.remove_application(job_id=_id, verify=opts['verify'])
+        elif opts['apply']:
+            return browser.make_application(opts['apply'][0], opts['apply'][1])
+        else:
             order = ordering.get(opts['order'])
-            shortlisted = browser.list_shortlist()
-            return shortlisted if shortlisted is None else \
-                sorted(shortlisted, key=lambda posting: sort(posting, order))
-
-        elif opts['command'] == 'jobs':
-            if opts['job_id']:
-                return browser.view_job(opts['job_id'])
-            elif opts['search']:
-                filters = dict((query, opts[query]) for query in JobSearchQuery.filters if \
-                               opts[query] is not None)
-                limit = int(opts['limit']) if opts['limit'] else None
-                return browser.list_jobs(filters=filters,
-                                          limit=limit)
+            applications = browser.list_applications(active=opts['inactive'])
+            return applications if applications is None else \
+                sorted(applications, key=lambda app: sort(app, order))
+
+    elif opts['command'] == 'interviews':
+        return browser.list_interviews(interview=opts['interview'])
+
+    elif opts['command'] == 'shortlist':
+        if opts['add'] and len(opts['add']) > 1:
+            return browser.add_to_shortlist_many(opts['add'], filters={
+                'status': opts['status']
+            }, verify=opts['verify'])
+        elif opts['add']:
+            return browser.add_to_shortlist(opts['add'][0], filters={
+                'status': opts['status']
+            }, verify=opts['verify'])
+        elif opts['remove']:
+            return browser.remove_from_shortlist(opts['remove'][0], verify=opts['verify'])
+
+        order = ordering.get(opts['order'])
+        shortlisted = browser.list_shortlist()
+        return shortlisted if shortlisted is None else \
+            sorted(shortlisted, key=lambda posting: sort(posting, order))
+
+    elif opts['command'] == 'sync':
+        return database.sync_db(workers=opts['workers'], rebuild=opts['rebuild'], browser=browser,
+                       database=user_path('jerbminer.db', username) if tagged else None)
+
+    elif opts['command'] == 'watch':
+        sinks = [PrintSink(tag=username if tagged else None)]
+        if opts['log']:
+            sinks.append(JsonLinesSink(opts['log']))
+        if opts['command_sink']:
+            sinks.append(CommandSink(opts['command_sink']))
+
+        # Each account's state is kept apart, as its cookies and session are
+        state = opts['state'] or user_path(Watcher.STATE_FILE, username)
+        watcher = Watcher(browser, endpoints=opts['endpoints'], sinks=sinks,
+                          state_file=state, interval=opts['interval'])
+        if opts['once']:
+            return '%d change(s).' % len(watcher.poll_due(force=True))
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            return 'Stopped watching.'
+
+    elif opts['command'] == 'jobs':
+        if opts['job_id']:
+            return browser.view_job(opts['job_id'], cache=opts['cache'],
+                                    refresh=opts['refresh'])
+        elif opts['search']:
+            filters = dict((query, opts[query]) for query in jobminebrowser.JobSearchQuery.filters if \
+                           opts[query] is not None)
+            limit = int(opts['limit']) if opts['limit'] else None
+            return browser.iter_jobs(filters=filters, limit=limit)
+    else:
+        return help 
+
+
+
+def run_all_users(opts, help=None, browsers=None):
+    """
+    Run a command for every stored user in parallel, each with its own browser and
+    session, and merge the results into a single table with a 'User' column.  Lists
+    contribute a row per item, and other results (or the error a user ran into) a
+    single row; the rows are in the order the users are stored in.
+
+    :opts        Dictionary of the parsed command-line arguments
+    :help        Optional usage to return if the command does nothing
+    :browsers    Optional dictionary of browsers to reuse, keyed on (username, parser, session_ttl)
+    :return      List of OrderedDicts
+    """
+    users = list_users()
+    if len(users) == 0:
+        raise jobminebrowser.JobmineException("No user found.  Have you run 'user --add'?")
+
+    results = {}
+
+    def run(username):
+        try:
+            result = run_command(opts, *get_user_info(username), help=help, browsers=browsers)
+            results[username] = list(result) if isinstance(result, Iterator) else result
+        except Exception as e:
+            results[username] = e
+
+    threads = [threading.Thread(target=run, args=(username, )) for username in users]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    try:
+        # Joined with a timeout so the wait can be interrupted, such as while watching
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.5)
+    except KeyboardInterrupt:
+        if opts['command'] != 'watch':
+            raise
+        return 'Stopped watching.'
+
+    rows = []
+    for username in users:
+        result = results.get(username)
+        if isinstance(result, list) and len(result) > 0 and all(isinstance(item, (dict, Record)) for item in result):
+            rows.extend(OrderedDict([('User', username)] + item.items()) for item in result)
+        elif isinstance(result, (dict, Record)):
+            rows.append(OrderedDict([('User', username)] + result.items()))
         else:
-            return parser.format_help() 
+            error = isinstance(result, Exception)
+            rows.append(OrderedDict([('User', username),
+                                     ('Result', 'Error: %s' % result if error else
+                                                format(result if result is not None else 'Success'))]))
+
+    # Users' rows may have different columns; every row gets every column
+    keys = []
+    for row in rows:
+        keys.extend(key for key in row.keys() if key not in keys)
+    return [OrderedDict((key, row.get(key, '')) for key in keys) for row in rows]
 
 
-def main(*args):
+def main(*args, **kwargs):
     """
     Command-line main interface for the Jobmine application.  Runs the application's parser and
     calls the JobmineBrowser accordingly.
 
-    :args      List of command-line arguments, defaults to sys.argv if omitted
-    :return    None
+    :args        List of command-line arguments, defaults to sys.argv if omitted
+    :browsers    Optional dictionary of browsers to reuse, keyed on (username, parser, session_ttl)
+    :return      None
     """
     try:
-        args = sys.argv[1:] if len(args) == 0 else args
-        result = parse_arguments(args)
-        print format(result if result is not None else 'Success')
-    except (NotImplemented, JobmineException) as e:
+        args, options = sys.argv[1:] if len(args) == 0 else args, {}
+        result = parse_arguments(args, browsers=kwargs.get('browsers'), options=options)
+        streamed = isinstance(result, Iterator)
+        # Results are printed line by line, and streamed results as they arrive
+        for line in render(result if result is not None else 'Success', output=options.get('output', 'table'),
+                           widths=options.get('widths')):
+            print line
+            if streamed:
+                sys.stdout.flush()
+    except Exception as e:
+        # Checked here rather than in the except clause, which would import the browser
+        # for every exit, including help and usage errors
+        if not isinstance(e, jobminebrowser.JobmineException):
+            raise
         print 'Error: %s' % e
         exit(1)
+    finally:
+        profiler = current_profiler()
+        if profiler is not None:
+            profiler.stop()
+            report_profile(profiler)
+
+
+def report_profile(profiler, stream=None):
+    """
+    Print the breakdown of a profiled command; requests per endpoint followed by
+    the totals.
+
+    :profiler    Profiler
+    :stream      Optional file to print to, defaults to stderr
+    :return      None
+    """
+    stream = stream or sys.stderr
+    endpoints = profiler.endpoints()
+    if len(endpoints) > 0:
+        keys = endpoints[0].keys()
+        stream.write('\n%s\n' % format_as_table(endpoints, keys, keys))
+    totals = [{'Metric': key, 'Value': str(value)} for key, value in profiler.summary().items()]
+    stream.write('\n%s\n' % format_as_table(totals, ['Metric', 'Value'], ['Metric', 'Value']))
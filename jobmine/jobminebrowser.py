@@ -1,15 +1,25 @@
 import os
 import re
 import json
+import time
 import urllib
 import difflib
+import hashlib
 import requests
 import urlparse
 import tempfile
 import itertools
 import mechanize
+import profiling
 import anonbrowser
-from bs4 import BeautifulSoup
+from pool import BrowserPool
+from cache import PageCache
+from parsers import get_parser
+from session import JobmineSession
+from locator import RowLocator
+from manifest import DocumentManifest
+from records import Record, Job, Application, Interview, ShortlistEntry, Document, JobDetails
+from utils import locked, user_path
 
 try:
     from collections import OrderedDict
@@ -25,15 +35,31 @@ class JobmineBrowser(anonbrowser.AnonBrowser):
     """
     JobmineBrwoser is an instance of AnonBrowser used for interacting with Jobmine.
 
+    :HOST            Scheme and host of the jobmine site; overridden by JOBMINE_HOST
     :BASE_URL        The base url format for the jobmine site
     :FOLDER_URL      Jobmine loads content into iframes, theis i the format url
     :ENDPOINTS       Dictionary of endpoints
+    :COOKIE_FILE     Default file the session cookies are stored in; overridden by JOBMINE_COOKIES.
+                     Each account's cookies are stored in a file named after it; see cookiefile_for
+    :MAX_WORKERS     Default most concurrent requests made by a single browser, out of politeness
+    :RESULTS_PER_PAGE    Number of job search results on a page, unless all are viewed
+    :RESULTS_ROW     Pattern matching the ids of the rows of job search results
+    :*_ROW           Patterns matching the ids of the rows of the applications, shortlist and documents
+    :RECORDS         Dictionary of endpoints and the record types of their rows; see records
+    :DETAIL_FIELDS   Ids of the fields on a job's page and the names they are given in its details;
+                     other labelled fields are named after their label
+    :DESCRIPTION_FIELD    Id of the field holding the job's description
+    :BREAK, WORD     Patterns breaking the lines of a description and matching the lines with text
+    :DOCUMENT_TYPES  Kinds of document Jobmine serves for each document; the resume and the package
+    :CHUNK_SIZE      Number of bytes of a document written at a time when downloading it
+    :UPLOADS_MANIFEST    Name of the manifest of the documents uploaded from a directory
     """
-    BASE_URL = 'https://jobmine.ccol.uwaterloo.ca/psp/SS/EMPLOYEE/WORK/{0}'
-    FOLDER_URL = 'https://jobmine.ccol.uwaterloo.ca/psc/SS/EMPLOYEE/WORK/c/UW_CO_STUDENTS.{0}.GBL'
-    CMD_URL = 'https://jobmine.ccol.uwaterloo.ca/psc/SS/'
-    DEFAULT_URL = 'https://jobmine.ccol.uwaterloo.ca/psp/SS/EMPLOYEE/WORK/h/?tab=DEFAULT'
-    LOGIN_URL = 'https://jobmine.ccol.uwaterloo.ca/psp/SS/?cmd=login'
+    HOST = os.environ.get('JOBMINE_HOST', 'https://jobmine.ccol.uwaterloo.ca').rstrip('/')
+    BASE_URL = HOST + '/psp/SS/EMPLOYEE/WORK/{0}'
+    FOLDER_URL = HOST + '/psc/SS/EMPLOYEE/WORK/c/UW_CO_STUDENTS.{0}.GBL'
+    CMD_URL = HOST + '/psc/SS/'
+    DEFAULT_URL = HOST + '/psp/SS/EMPLOYEE/WORK/h/?tab=DEFAULT'
+    LOGIN_URL = HOST + '/psp/SS/?cmd=login'
     ENDPOINTS = {
         '*': "",
         'nav': "h/?tab=DEFAULT",
@@ -46,16 +72,138 @@ class JobmineBrowser(anonbrowser.AnonBrowser):
         'jobs': "UW_CO_JOBSRCH",
         'details': "UW_CO_JOBDTLS"
     }
-
-    def __init__(self, *args, **kwargs):
+    COOKIE_FILE = JobmineSession.COOKIE_FILE
+    RESULTS_ROW = re.compile(r'.*trUW_CO_JOBRES_VW\$[0-9]+_row[0-9]+')
+    APPLICATIONS_ROW = r'tr.*UW_CO_APPS.*'
+    SHORTLIST_ROW = r'trUW_CO_STUJOBLST.*'
+    DOCUMENTS_ROW = r'trUW_CO_STU_DOCS.*'
+    RECORDS = {
+        'applications': Application,
+        'interviews': Interview,
+        'shortlist': ShortlistEntry,
+        'documents': Document
+    }
+    DETAIL_FIELDS = OrderedDict([
+        ('UW_CO_JOBDTL_DW_UW_CO_EMPLYR_NAME', 'Employer'),
+        ('UW_CO_JOBDTL_DW_UW_CO_EMPUNITDIV', 'Unit'),
+        ('UW_CO_JOBDTL_VW_UW_CO_JOB_TITLE', 'Job Title'),
+        ('UW_CO_JOBDTL_VW_UW_CO_WORK_LOCATN', 'Work Location'),
+        ('UW_CO_JOBDTL_VW_UW_CO_AVAIL_OPENGS', 'Available Openings'),
+        ('UW_CO_JOBDTL_VW_UW_CO_WORK_TERM', 'Work Term'),
+        ('UW_CO_JOBDTL_VW_UW_CO_CHARDATE_STR', 'Posting Open Date'),
+        ('UW_CO_JOBDTL_VW_UW_CO_CHARDATE_END', 'Last Day to Apply'),
+        ('UW_CO_JOBDTL_DW_UW_CO_DESCR100', 'Levels'),
+        ('UW_CO_JOBDTL_VW_UW_CO_REQ_GRADES', 'Grades'),
+        ('UW_CO_JOBDTL_DW_UW_CO_DESCR', 'Disciplines'),
+        ('UW_CO_JOBDTL_VW_UW_CO_JOB_COMMENTS', 'Comments')
+    ])
+    DESCRIPTION_FIELD = 'UW_CO_JOBDTL_VW_UW_CO_JOB_DESCR'
+    BREAK = re.compile(r'\s\s+')
+    WORD = re.compile(r'[\-_0-9A-Za-z]')
+    DOCUMENT_TYPES = ('doc', 'package')
+    CHUNK_SIZE = 64 * 1024
+    UPLOADS_MANIFEST = '.uploads.json'
+    MAX_WORKERS = BrowserPool.MAX_WORKERS
+    RESULTS_PER_PAGE = 25
+
+    def __init__(self, cookiefile=None, session_ttl=None, parser=None, username=None, max_workers=None,
+                 *args, **kwargs):
         """
         Jobmine's refresh headers aren't handle properply by mechanize, so
         we ignore them.
+
+        :cookiefile     Optional file to persist the session cookies in
+        :session_ttl    Optional number of seconds to trust a saved session for
+        :parser         Optional name of the HTML parser to use; see parsers.get_parser
+        :username       Optional account the browser is for; its cookies are kept apart from
+                        other accounts' unless a cookiefile is given
+        :max_workers    Optional most concurrent requests to make, defaults to MAX_WORKERS
         """
-        anonbrowser.AnonBrowser.__init__(self, cookiefile='/tmp/jobmine.cookies')
+        cookiefile = cookiefile or (self.cookiefile_for(username) if username else self.COOKIE_FILE)
+        anonbrowser.AnonBrowser.__init__(self, cookiefile=cookiefile)
         self.set_handle_redirect(True)
         self.set_handle_refresh(False)
         self.set_handle_redirect(mechanize.HTTPRedirectHandler)
+        self.session = JobmineSession.from_cookiefile(cookiefile, ttl=session_ttl)
+        self.cache = PageCache()
+        self.locator = RowLocator.from_cookiefile(cookiefile)
+        self.parser = get_parser(parser)
+        self.max_workers = max_workers or self.MAX_WORKERS
+        self._authenticating = False
+        self._opening = False
+        self._deferred = False
+
+    @classmethod
+    def cookiefile_for(cls, username):
+        """
+        Get the file the account's session cookies are stored in.  The session state
+        and search locations are stored alongside it.
+
+        :username    String, the user's Quest ID
+        :return      String
+        """
+        return user_path(cls.COOKIE_FILE, username)
+
+    def fork(self):
+        """
+        Create a new browser that shares this browser's cookie jar, session and
+        credentials, so it can make requests in parallel without logging in.
+
+        :return    JobmineBrowser
+        """
+        browser = self.__class__(cookiefile=self.cookie_path, session_ttl=self.session.ttl,
+                                 parser=self.parser.name, max_workers=self.max_workers)
+        browser.cookie_jar = self.cookie_jar
+        browser.set_cookiejar(self.cookie_jar)
+        browser.session = self.session
+        browser.cache = self.cache
+        browser.locator = self.locator
+        browser.addheaders = self.addheaders
+        if hasattr(self, '_credentials'):
+            browser._credentials = self._credentials
+        return browser
+
+    def open(self, url, *args, **kwargs):
+        return self._open(anonbrowser.AnonBrowser.open, url, *args, **kwargs)
+
+    def open_novisit(self, url, *args, **kwargs):
+        return self._open(anonbrowser.AnonBrowser.open_novisit, url, *args, **kwargs)
+
+    def _open(self, opener, url, *args, **kwargs):
+        """
+        Opens the url, re-authenticating and retrying once if Jobmine bounced the
+        request to the login page because the session expired.  Redirects are followed
+        through open, so only the outermost call checks the session; its url, not the
+        url Jobmine redirected to, is the one retried.
+
+        :opener    The unbound open method to call
+        :url       The url (or request) to open
+        :return    Response
+        """
+        if self._opening or self._authenticating or not hasattr(self, '_credentials'):
+            return opener(self, url, *args, **kwargs)
+
+        self._opening = True
+        try:
+            response = opener(self, url, *args, **kwargs)
+            if 'errorCode=999' in response.geturl():
+                raise JobmineException('Jobmine is currently closed.')
+            elif re.search(r'cmd=(login|expire)', response.geturl()) is None:
+                self.session.touch(self._credentials['username'])
+                return response
+
+            self.session.invalidate()
+            if not self.authenticate(force=True, **self._credentials):
+                raise JobmineException('Could not authenticate the user.')
+
+            # Bounced again right after logging in; the page is the login page, not the url's
+            response = opener(self, url, *args, **kwargs)
+            if re.search(r'cmd=(login|expire)', response.geturl()) is not None:
+                self.session.invalidate()
+                raise JobmineException('Could not authenticate the user.')
+            return response
+        finally:
+            self._opening = False
 
     def _get_tokens(self, tokens=None):
         """
@@ -73,74 +221,76 @@ class JobmineBrowser(anonbrowser.AnonBrowser):
 
         return list((token, self.form[token]) for token in tokens)
 
-    def _get_jobs(self, limit=None, filters=None, extract=None):
+    def _get_jobs(self, filters=None, view_all=True, start=0):
         """
-        Private method that performs the job search inquiry.  Returns a generator function to get results,
-        further calls will paginate.
-
-        :limit      Integer, limit the responses to return
-        :filters    Optional dictionary of job search filters
-        :extract    Optional function to get a matched job
-        :return     Generator
+        Private method that performs the job search inquiry.  Returns a generator that yields
+        a (jobs, query) tuple for each page of results; the query carries the pagination state
+        (page number and tokens) needed to act on the page.  Pages are only requested as the
+        generator is advanced.
+
+        When view_all is set and the results grid offers it, every result is requested in a
+        single page, otherwise the results are paginated.  The location of every result is
+        recorded in the browser's RowLocator.
+
+        :filters     Optional dictionary of job search filters
+        :view_all    Boolean, ask for every result in one page
+        :start       Integer, the first page to yield; earlier pages are skipped without parsing
+        :return      Generator
         """
         if not filters:
             filters = {}
 
-        regex = re.compile(r'.*trUW_CO_JOBRES_VW\$[0-9]+_row[0-9]+')
         response = self.open(self.FOLDER_URL.format(self.ENDPOINTS['jobs'])).read()
-        query, rows = JobSearchQuery(), []
+        query, seen = JobSearchQuery(), set()
 
         for token in self._get_tokens():
             query.add(*token)
 
-        while True:
-            form_post_url = query.make_query(self.geturl(), **filters)
-            response = self.open_novisit(form_post_url).read()
-            soup = BeautifulSoup(response)
-
-            # Need the headers in order to construct the dictionary so find the headers
-            # relative to the rows
-            body = list(soup.findAll('tr', id=regex))[0].parent.parent
-            headers = map(lambda tag: tag.text.encode('ascii', 'ignore').strip(),
-                          list(body.findAll('th')))
-
-            # Find the rows matching the regex and and get the text
-            found = list(map(lambda tag: tag.text.encode('ascii', 'ignore').strip(), row.findAll('td')) for \
-                         row in soup.findAll('tr') if isinstance(row.attrs.get('id', None), basestring) and \
-                         regex.match(row.attrs.get('id')))
-
-            if len(found) == 0 or found[0] in rows:
-                # If no results or if it matches the last found row, pagination
-                # has finished.
-                break
-
-            jobs = map(lambda row: OrderedDict(zip(headers, row)), found)
-            if extract:
-                filtered = filter(extract, jobs)
-                if len(filtered) >= 1:
-                    query.row = jobs.index(filtered[0])
-                    yield filtered[0], query
-                    break
-                rows += found
-            elif isinstance(limit, int) and len(found) + len(rows) >= limit:
-                limit -= len(rows)
-                yield (rows + jobs[:limit])
-                break
-            elif jobs[0]['Job Title'] == 'No Matches Found':
-                return
-                yield []
-            else:
-                rows += found
-                yield jobs
-
-            query.paginate()
+        try:
+            while True:
+                form_post_url = query.make_query(self.geturl(), **filters)
+                response = self.open_novisit(form_post_url).read()
+                if view_all and not query.viewing_all and JobSearchQuery.VIEW_ALL in response:
+                    query.view_all()
+                    continue
+                elif query.page < start and not query.is_last_page(response):
+                    query.paginate()
+                    continue
+
+                jobs = self._parse_results(response)
+                fingerprint = hash(tuple(tuple(job.values()) for job in jobs))
+                if len(jobs) == 0 or fingerprint in seen:
+                    # If no results or if the page was already seen, pagination
+                    # has finished.
+                    return
+
+                seen.add(fingerprint)
+                if jobs[0].get('Job Title') == 'No Matches Found':
+                    return
+
+                self.locator.record(jobs, filters, query.page, query.viewing_all)
+                yield jobs, query
+                if query.is_last_page(response):
+                    return
+                query.paginate()
+        finally:
+            self.locator.save()
+
+    def _parse_results(self, html):
+        """
+        Parse the rows of a page of job search results.
 
-        raise StopIteration
+        :html      String, the results page
+        :return    List of Jobs
+        """
+        headers, found = self.parser.table(html, self.RESULTS_ROW)
+        return [Job.create(headers, row) for row in found]
 
-    def _download_document(self, id, document_type):
+    def _document_url(self, id, document_type):
         """
-        Backhand method called for download documents.  Jobmine redirects three times before
-        actually downloading the document; there are two types of files 'doc' (resume) and 'package'.
+        Follow Jobmine's redirects to the url the document is served from.  Jobmine redirects
+        three times before actually serving the document; there are two types of files 'doc'
+        (resume) and 'package'.
 
         :id               String, the document number (1 to number of documents)
         :document_type    One of 'doc' or 'package'
@@ -150,20 +300,50 @@ class JobmineBrowser(anonbrowser.AnonBrowser):
         download_url = self.FOLDER_URL.format(self.ENDPOINTS['documents'])
         if isinstance(id, basestring):
             id = int(id)
+        if id <= 0:
+            raise JobmineException('The specified document does not exist.')
 
-        if id > 0 and id <= len(self.list_documents()):
-            # Generates the page with the JS that generates the download url; server-sided
-            # generation
-            download_url += "?ICAction={0}".format(ic_action.format(document_type.upper(), str(id - 1)))
-            response = self.open_novisit(download_url).read()
+        # Generates the page with the JS that generates the download url; server-sided
+        # generation
+        download_url += "?ICAction={0}".format(ic_action.format(document_type.upper(), str(id - 1)))
+        response = self.open_novisit(download_url).read()
+
+        # Fetch the actual document from the download command url
+        query = re.search(r'(cmd=viewattach[^\'"\?,\(\)]+)', response)
+        if query is None:
+            raise JobmineException('The specified document does not exist.')
+        response = self.open_novisit(self.CMD_URL + '?{0}'.format(query.group(0))).read()
+        # Since this page sets an improper refresh header, need to follow the header
+        return response.split('\n')[3].strip()
 
-            # Fetch the actual document from the download command url
-            query = re.search(r'(cmd=viewattach[^\'"\?,\(\)]+)', response).group(0)
-            response = self.open_novisit(self.CMD_URL + '?{0}'.format(query)).read()
-            # Since this page sets an improper refresh header, need to follow the header
-            pdf = self.open_novisit(response.split('\n')[3]).read()
+    def _download_document(self, id, document_type, output):
+        """
+        Backhand method called for download documents.  The document is streamed to the
+        output in chunks rather than read into memory, and hashed as it is written.
 
-            return pdf
+        :id               String, the document number (1 to number of documents)
+        :document_type    One of 'doc' or 'package'
+        :output           File opened for writing in binary mode
+        :return           Tuple of (hex SHA-256 of the document, number of bytes)
+        """
+        url = self._document_url(id, document_type)
+        digest, size = hashlib.sha256(), 0
+        with profiling.measure('request', url=url) as info:
+            response = requests.get(url, cookies=self.cookie_jar, headers={
+                'User-Agent': 'Mozilla/5.0'
+            }, stream=True)
+            try:
+                if response.status_code != 200:
+                    raise JobmineException('The specified document does not exist.')
+                for chunk in response.iter_content(self.CHUNK_SIZE):
+                    output.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+            finally:
+                response.close()
+            info['bytes'] = size
+
+        return digest.hexdigest(), size
 
     def save(self, url, tokens=None, extra_data=None):
         """
@@ -172,7 +352,21 @@ class JobmineBrowser(anonbrowser.AnonBrowser):
         :url           The url to save to
         :tokens        Optional list of tokens to attach to the request
         :extra_data    Extra dictionary of data to add to the request
-        :return        Boolean
+        :return        Boolean, True if the save failed
+        """
+        response = self._save(url, tokens, extra_data)
+        return ('error' in response or 'not available' in response)
+
+    def _save(self, url, tokens=None, extra_data=None, visit=False):
+        """
+        Save the current transaction and return the page PeopleSoft responds with,
+        which holds the saved grid.
+
+        :url           The url to save to
+        :tokens        Optional list of tokens to attach to the request
+        :extra_data    Extra dictionary of data to add to the request
+        :visit         Boolean, make the response the current page
+        :return        String
         """
         tokens = self._get_tokens() if tokens is None else tokens
         data = dict(tokens + [('ICAction', '#ICSave')])
@@ -180,36 +374,100 @@ class JobmineBrowser(anonbrowser.AnonBrowser):
             data.update(extra_data)
         # Increase state number to trigger a change in state
         data['ICStateNum'] = str(int(data['ICStateNum']) + 1)
-        response = self.open_novisit(url + "?{0}".format(urllib.urlencode(data))).read()
+        opener = self.open if visit else self.open_novisit
+        return opener(url + "?{0}".format(urllib.urlencode(data))).read()
 
-        return ('error' in response or 'not available' in response)
+    def _rows_after(self, html, endpoint, regex, verify=False):
+        """
+        Get the rows of a grid after changing it.  The rows are read from the page
+        PeopleSoft responded to the change with, so confirming the change costs no
+        extra request; the grid is only listed again if asked to verify, or if the
+        page has no rows (it doesn't hold the grid, or the grid was emptied).
+
+        :html        String, the page returned by the change
+        :endpoint    The folder listing the grid
+        :regex       The pattern for getting the rows
+        :verify      Boolean, list the grid again rather than trust the response
+        :return      List of Records
+        """
+        rows = [] if verify else self._parse_table(html, regex, self.RECORDS.get(endpoint, Record))
+        if len(rows) == 0:
+            rows = self.parse(endpoint, regex)
+        return rows
 
-    def authenticate(self, username, password):
+    def authenticate(self, username, password, force=False, lazy=False):
         """
-        Authenticate the user and login.
+        Authenticate the user and login.  If the saved session belongs to the user
+        and is still trusted, the login is skipped.
 
         :username    String, user's Quest ID
         :password    String, user's Quest password
+        :force       Boolean, log in even if the saved session is trusted
+        :lazy        Boolean, defer logging in until a method requires it
         :return      Boolean
         """
-        form_nr, response = 0, self.open(self.LOGIN_URL)
-        # ID/name of form fields are userid/pwd respectively for
-        # username, password combination
-        form_nr = next((index for index, form in enumerate(self.forms()) if \
-                        form.name == 'login'), None)
-        if form_nr is None:
-            return False
+        if not force and (lazy or self.session.is_valid(username)):
+            # Skips opening the login page and submitting the form
+            if self.session.is_valid(username):
+                self.session.record_saved(2)
+            self._deferred = not self.session.is_valid(username)
+            self._credentials = {
+                'username': username,
+                'password': password
+            }
+            return True
+
+        # Logins to the same account are serialized across processes; if another process
+        # logged in while this one waited, its session is reused
+        with locked(self.cookie_path):
+            self.session.load()
+            if self.session.is_valid(username):
+                self.load_cookies()
+                self._deferred = False
+                self._credentials = {
+                    'username': username,
+                    'password': password
+                }
+                return True
+            return self._login(username, password)
 
-        self.select_form(nr=form_nr)
-        self.form['userid'], self.form['pwd'] = username, password
-        self.submit()
+    def _login(self, username, password):
+        """
+        Submit the login form and save the session cookies.
+
+        :username    String, user's Quest ID
+        :password    String, user's Quest password
+        :return      Boolean
+        """
+        self._authenticating = True
+        try:
+            form_nr, response = 0, self.open(self.LOGIN_URL)
+            # ID/name of form fields are userid/pwd respectively for
+            # username, password combination
+            form_nr = next((index for index, form in enumerate(self.forms()) if \
+                            form.name == 'login'), None)
+            if form_nr is None:
+                return False
+
+            self.select_form(nr=form_nr)
+            self.form['userid'], self.form['pwd'] = username, password
+            self.submit()
+        finally:
+            self._authenticating = False
 
         # Check to ensure that Jobmine is open
         if 'errorCode=999' in self.geturl():
             raise JobmineException('Jobmine is currently closed.')
 
+        # A rejected login lands back on the login page; the session must not be trusted
+        if re.search(r'cmd=(login|expire)', self.geturl()) is not None:
+            self.session.invalidate()
+            return False
+
         # Save reference to credentials for auth_required and cookies
         self.save_cookies()
+        self.session.touch(username, save=True)
+        self._deferred = False
         self._credentials = {
             'username': username,
             'password': password
@@ -225,16 +483,19 @@ class JobmineBrowser(anonbrowser.AnonBrowser):
             """
             Function wrapper.
             """
-            instance.open(instance.DEFAULT_URL)
             if not hasattr(instance, '_credentials'):
                 raise JobmineException('Jobmine method requires user to be authenticated.')
 
-            # If we are not currently logged in, attempt to log in and raise an
-            # exception if it fails.
-            instance.open(instance.DEFAULT_URL)
-            if instance.geturl() != instance.DEFAULT_URL and \
-               (not hasattr(instance, '_credentials') or not instance.authenticate(**instance._credentials)):
-                raise JobmineException('Could not authenticate the user.')
+            # A trusted session needs no check, otherwise a single page load tells us if
+            # we are still logged in; open() logs in again if we were bounced.
+            if instance.session.is_valid(instance._credentials['username']):
+                instance.session.record_saved(2)
+            elif instance._deferred:
+                if not instance.authenticate(force=True, **instance._credentials):
+                    raise JobmineException('Could not authenticate the user.')
+            else:
+                instance.session.record_saved(1)
+                instance.open(instance.DEFAULT_URL)
             return function(instance, *args, **kwargs)
         return wrapped
 
@@ -244,26 +505,25 @@ class JobmineBrowser(anonbrowser.AnonBrowser):
 
         :endpoint    The folder to grab
         :regex       The pattern for getting the rows.
-        :return      dict
+        :return      List of Records, of the endpoint's type in RECORDS
         """
-        regex = re.compile(regex)
         url = self.FOLDER_URL.format(self.ENDPOINTS[endpoint])
-        soup = BeautifulSoup(self.open(url).read())
+        return self._parse_table(self.open(url).read(), regex, self.RECORDS.get(endpoint, Record))
 
-        # Find the rows matching the regex and and get the text
-        rows = list(map(lambda tag: tag.text.encode('ascii', 'ignore').strip() if \
-                        len(tag.findAll('input')) == 0 else tag.findAll('input')[0]['value'],
-                        row.findAll('td')) for row in soup.findAll('tr', id=regex))
+    def _parse_table(self, html, regex, record=Record):
+        """
+        Parse the table whose rows match the regex out of the page.  Cells holding an
+        input field are read from the field's value.
 
+        :html      String, the page
+        :regex     The pattern for getting the rows.
+        :record    Record type to create for each row
+        :return    List of Records
+        """
+        headers, rows = self.parser.table(html, re.compile(regex), inputs=True)
         if len(rows) == 0:
             return []
 
-        # Need the headers in order to construct the dictionary so find the headers
-        # relative to the rows
-        body = list(soup.findAll('tr', id=regex))[0].parent.parent
-        headers = map(lambda tag: tag.text.encode('ascii', 'ignore').strip(),
-                      list(body.findAll('th')))
-
         # Find indices that are null; indices that are filled with empty strings as
         # Jobmine creates table rows with empty cells
         old_rows, rows = rows, [[] for _ in range(0, len(rows))]
@@ -279,7 +539,7 @@ class JobmineBrowser(anonbrowser.AnonBrowser):
         if len(rows[0]) == 0:
             return []
 
-        return map(lambda row: OrderedDict(zip(headers, row)), rows)
+        return [record.create(headers, row) for row in rows]
 
     @auth_required
     def list_applications(self, active=False):
@@ -289,49 +549,40 @@ class JobmineBrowser(anonbrowser.AnonBrowser):
         :return    List of dictionaries
         """
         return self.parse('applications',
-                          'tr.*UW_CO_%s.*' % ('STU_APPS' if active else 'APPS'))
+                          r'tr.*UW_CO_STU_APPS.*' if active else self.APPLICATIONS_ROW)
 
     @auth_required
-    def remove_application(self, _id=None, job_id=None):
+    def remove_application(self, _id=None, job_id=None, verify=False):
         """
         Removes the specified application.  One of _id (corresponding to row) or
         the job identifier must be passed.
 
         :_id      Row to delete
         :job_id   Job identifier to delete
+        :verify   Boolean, list the applications again to confirm the removal
         :return   None
         """
-        prev_count = len(self.list_applications(False))
         url = self.FOLDER_URL.format(self.ENDPOINTS['applications'])
-        soup = BeautifulSoup(self.open(url).read())
-        patt = 'tr.*UW_CO_APPS.*'
-
-        apps = list(soup.findAll('tr', id=re.compile(patt)))
+        apps = self._parse_table(self.open(url).read(), self.APPLICATIONS_ROW, Application)
         selected = None
 
         if _id is not None and _id < len(apps):
             selected = _id
         elif job_id is not None:
-            _id = 0
-            for row in apps:
-                row = row.find('span', id=re.compile('UW_CO_APPS_VW2_UW_CO_JOB_ID')).text
-                if int(row) == job_id:
-                    selected = _id
-                    break
-                _id = _id + 1
+            selected = next((index for index, app in enumerate(apps) if \
+                             int(app['Job ID']) == job_id), None)
 
         if selected is None:
             raise JobmineException('Given id does not correspond to a valid job.')
 
         action = 'UW_CO_APPSV$delete${0}$$0'.format(selected)
         tokens = dict(self._get_tokens())
-        url = self.FOLDER_URL.format(self.ENDPOINTS['applications']) + \
-              '?ICAction={0}&ICSID={1}&ICStateNum={2}'.format(action, tokens['ICSID'], tokens['ICStateNum'])
-
-        response = self.open(url).read()
-        self.save(self.geturl())
+        self.open(url + '?ICAction={0}&ICSID={1}&ICStateNum={2}'.format(action, tokens['ICSID'],
+                                                                         tokens['ICStateNum'])).read()
 
-        if len(self.list_applications(False)) == prev_count:
+        # The saved grid no longer holds the application if it was removed
+        rows = self._rows_after(self._save(url), 'applications', self.APPLICATIONS_ROW, verify)
+        if any(app['Job ID'] == apps[selected]['Job ID'] for app in rows):
             raise JobmineException('Failed to remove application.')
 
     @auth_required
@@ -382,7 +633,7 @@ class JobmineBrowser(anonbrowser.AnonBrowser):
 
         :return        List of dictionaries
         """
-        return self.parse('documents', r'trUW_CO_STU_DOCS.*')
+        return self.parse('documents', self.DOCUMENTS_ROW)
 
     @auth_required
     def download_document(self, id, document_type=None):
@@ -396,43 +647,140 @@ class JobmineBrowser(anonbrowser.AnonBrowser):
         """
         if not document_type:
             document_type = 'doc'
-        elif document_type not in ['doc', 'package']:
+        elif document_type not in self.DOCUMENT_TYPES:
             raise JobmineException('Unknown document type passed.')
 
-        pdf = self._download_document(id, document_type)
-        if pdf:
-            os_handle, tmp = tempfile.mkstemp()
-            tmp = '{0}.pdf'.format(tmp)
-            with open(tmp, 'w') as output:
-                output.write(pdf)
+        handle, tmp = tempfile.mkstemp(suffix='.pdf')
+        try:
+            with os.fdopen(handle, 'wb') as output:
+                self._download_document(id, document_type, output)
+        except:
+            os.remove(tmp)
+            raise
+        return tmp
+
+    def _listed_date(self, date):
+        """
+        Convert a date as Jobmine lists it, such as '16-OCT-2026', to an ISO date.
+
+        :date      String
+        :return    String, or a date later than any other if the date can't be read
+        """
+        try:
+            return time.strftime('%Y-%m-%d', time.strptime(date.title(), '%d-%b-%Y'))
+        except ValueError:
+            return '9999-99-99'
+
+    @auth_required
+    def download_documents(self, directory, workers=None):
+        """
+        Download every document, resumes and packages, into the directory concurrently
+        using a pool of browsers that share this browser's session.  Documents are stored
+        under their content hash and recorded in the directory's manifest.  Jobmine only
+        lists the day a document was last updated, so a document is skipped if it is listed
+        as it was and wasn't updated on or after the day it was last downloaded; otherwise
+        it is downloaded again, and only replaced if its contents changed.  A document that
+        is downloaded again but hasn't changed is reported as 'Re-checked'.
+
+        :directory    Path to the directory to download into
+        :workers      Optional number of concurrent downloads, capped at the browser's max_workers
+        :return       List of dictionaries, one per document with the status of its download
+        """
+        directory = os.path.expanduser(os.path.expandvars(directory))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        manifest, listed = DocumentManifest(directory), OrderedDict()
+        for number, document in enumerate(self.list_documents(), 1):
+            for document_type in self.DOCUMENT_TYPES:
+                listed['%d/%s' % (number, document_type)] = (number, document_type, document)
+
+        # Only documents that may have changed since they were last downloaded are downloaded
+        changed, today = [], time.strftime('%Y-%m-%d')
+        for key, (_, _, document) in listed.items():
+            entry = manifest.get(key)
+            if not manifest.stored(key) or entry.get('name') != document['Document Name'] or \
+               entry.get('updated') != document['Last Updated'] or \
+               entry.get('checked', '') <= self._listed_date(document['Last Updated']):
+                changed.append(key)
+
+        def download(browser, key):
+            number, document_type, _ = listed[key]
+            handle, tmp = tempfile.mkstemp(prefix='.', suffix='.pdf', dir=directory)
+            try:
+                with os.fdopen(handle, 'wb') as output:
+                    digest, size = browser._download_document(number, document_type, output)
+            except JobmineException:
+                os.remove(tmp)
+                return None
+            except:
+                os.remove(tmp)
+                raise
+
+            if os.path.exists(manifest.document_path(digest)):
+                os.remove(tmp)
+            else:
+                os.rename(tmp, manifest.document_path(digest))
+            return digest, size
 
-            return tmp
+        workers = min(workers or self.max_workers, self.max_workers, len(changed))
+        if workers <= 1:
+            downloads = dict((key, download(self, key)) for key in changed)
+        else:
+            downloads = dict(BrowserPool([self.fork() for _ in range(workers)]).imap_unordered(download, changed))
+
+        results = []
+        for key, (number, document_type, document) in listed.items():
+            previous, status = manifest.get(key), 'Unchanged'
+            if key in downloads and downloads[key] is None:
+                status = 'Failed'
+            elif key in downloads:
+                digest, size = downloads[key]
+                if previous is None or previous['sha256'] != digest:
+                    status = 'Downloaded' if previous is None else 'Updated'
+                else:
+                    status = 'Re-checked'
+                manifest.set(key, name=document['Document Name'], updated=document['Last Updated'],
+                             checked=today, sha256=digest, bytes=size)
+            entry = manifest.get(key)
+            results.append(OrderedDict([
+                ('Document', number),
+                ('Type', document_type),
+                ('Name', document['Document Name']),
+                ('File', manifest.document_path(entry['sha256']) if entry and status != 'Failed' else ''),
+                ('Status', status)
+            ]))
+
+        manifest.retain(listed)
+        manifest.save()
+        return results
 
     @auth_required
-    def delete_document(self, document_number):
+    def delete_document(self, document_number, verify=False):
         """
         Deletes the specified document.  Document must exist for this to work.
 
         :document_number    The number of the document (1 to max number of documents)
+        :verify             Boolean, list the documents again to confirm the deletion
         :return             None
         """
-        documents = self.list_documents()
+        url = self.FOLDER_URL.format(self.ENDPOINTS['documents'])
+        documents = self._parse_table(self.open(url).read(), self.DOCUMENTS_ROW, Document)
         if document_number <= 0 or document_number > len(documents):
             raise JobmineException('The specified document does not exist.')
         elif len(documents) == 1:
             raise JobmineException('Cannot delete document, atleast one must exist.')
 
-        self.open(self.FOLDER_URL.format(self.ENDPOINTS['documents']))
         params = dict(self._get_tokens())
         params['ICAction'] = 'UW_CO_PDF_WRK_UW_CO_DOC_DELETE${0}'.format(document_number - 1)
-        response = self.open(self.geturl() + "?{0}".format(urllib.urlencode(params))).read()
+        response = self.open(url + "?{0}".format(urllib.urlencode(params))).read()
 
-        if len(documents) == len(self.list_documents()):
+        if len(documents) == len(self._rows_after(response, 'documents', self.DOCUMENTS_ROW, verify)):
             # If the length is the same as before, that mean something went wrong
             raise JobmineException('Document deletion failed.  Manually delete.')
 
     @auth_required
-    def upload_document(self, path, name=None, existing=None):
+    def upload_document(self, path, name=None, existing=None, verify=False):
         """
         Upload the document pointed to by the path as a new document on Jobmine,
         document number should be in range(1, max number of documents)
@@ -440,58 +788,147 @@ class JobmineBrowser(anonbrowser.AnonBrowser):
         :path        Path to the file to upload (relative or absolute)
         :name        Optional name to give the uploaded file
         :existing    Optional existing id to reupload an existing document
+        :verify      Boolean, list the documents again to confirm the upload
         :return      None
         """
-        documents = self.list_documents()
-        upload = (existing if existing else len(documents)) - 1
         base_url = self.FOLDER_URL.format(self.ENDPOINTS['documents'])
-        soup = BeautifulSoup(self.open(base_url).read())
+        html = self.open(base_url).read()
+        upload, _ = self._upload(base_url, html, os.path.expanduser(os.path.expandvars(path)),
+                                 name=name, existing=existing, verify=verify)
+
+        if verify:
+            documents = self.list_documents()
+            if upload > len(documents) or (name is not None and documents[upload - 1]['Document Name'] != name):
+                raise JobmineException('Document upload failed.  Manually upload.')
+
+    def _upload(self, base_url, html, path, name=None, existing=None, verify=False):
+        """
+        Upload a file into a document, starting from the documents page, which must be the
+        current page.  The page Jobmine responds with is the documents page again and becomes
+        the current page, so its tokens carry on to the next upload without opening the page
+        again.
+
+        :base_url    The url of the documents page
+        :html        String, the current documents page
+        :path        Path to the file to upload
+        :name        Optional name to give the document
+        :existing    Optional number of the document to replace; a new document is created otherwise
+        :verify      Boolean, list the documents again to confirm a new document was created
+        :return      Tuple of (number of the document, String page Jobmine responded with)
+        """
+        documents = self._parse_table(html, self.DOCUMENTS_ROW, Document)
+        upload = (existing if existing else len(documents)) - 1
         self.select_form(nr=0)
 
         # Need two tokens for a submission; statenum and icsid
         if existing is not None:
             if not(existing > 0 and existing <= len(documents)):
                 raise JobmineException('The specified document does not exist.')
+            if name is not None:
+                description = 'UW_CO_STU_DOCS_UW_CO_DOC_DESC${0}'.format(upload)
+                self.form[description] = name
+                self.save(base_url, extra_data=dict([(description, name)]))
         else:
             # Create a new resume by posting to the create url; check to ensure
             # not exceeding the number of allowed documents
             create = 'UW_CO_PDF_WRK_UW_CO_DOC_CREATE'
-            if len(soup.findAll('a', id=create)) == 0:
+            if self.parser.text(html, create) is None:
                 raise JobmineException('Maximum document count reached.')
-            url, tokens = self.geturl(), self._get_tokens()
+            tokens = self._get_tokens()
             data = dict(tokens + [('ICAction', create)])
 
-            # Create new document, save it and check for success
-            response = self.open(self.geturl() + "0?{0}".format(urllib.urlencode(data))).read()
-            save_status = self.save(url, tokens)
-            if save_status and upload == len(self.list_documents()) - 1:
+            # Create new document and save it, named, in one go and check for success; the
+            # saved page holds the new document's row and fields, so it becomes the current page
+            self.open(base_url + "?{0}".format(urllib.urlencode(data))).read()
+            upload += 1
+            names = None if name is None else {'UW_CO_STU_DOCS_UW_CO_DOC_DESC${0}'.format(upload): name}
+            response = self._save(base_url, tokens, names, visit=True)
+            if len(self._rows_after(response, 'documents', self.DOCUMENTS_ROW, verify)) <= len(documents):
                 raise JobmineException('Document create failed.  Manually upload.')
-            else:
-                upload += 1
-                self.open(base_url)
-                self.select_form(nr=0)
-
-        # If a name exists, add it to the form
-        if name is not None:
-            description = 'UW_CO_STU_DOCS_UW_CO_DOC_DESC${0}'.format(upload)
-            self.form[description] = name
-            self.save(self.geturl(), extra_data=dict([(description, name)]))
+            self.select_form(nr=0)
 
         # Navigate to the form edit page
         params = dict(self._get_tokens())
         params['ICAction'] = 'UW_CO_PDF_WRK_UW_CO_DOC_ADD${0}'.format(upload)
-        response = self.open(base_url + "?{0}".format(urllib.urlencode(params))).read()
+        self.open(base_url + "?{0}".format(urllib.urlencode(params))).read()
 
         # File is uploaded as application/octet-stream
         self.select_form(nr=0)
-        self.form.add_file(open(
-            os.path.expanduser(
-                os.path.expandvars(path)), 'rb'), 'application/pdf', os.path.split(path)[-1])
-        response = self.submit().read()
+        with open(path, 'rb') as handle:
+            self.form.add_file(handle, 'application/pdf', os.path.split(path)[-1])
+            response = self.submit().read()
 
         # Uploading failed if either of these exist in our response
         if 'error' in response or 'not available' in response:
             raise JobmineException('Document upload failed.  Manually upload.')
+        return upload + 1, response
+
+    @auth_required
+    def sync_documents(self, directory, verify=False):
+        """
+        Upload the PDFs in the directory whose contents changed since they were last
+        uploaded.  A file is uploaded into the document named after it (the file name
+        without '.pdf'), or into a new document of that name if there is none.  The content
+        hashes of the uploads are kept in the directory's upload manifest; a file is
+        skipped if its hash is unchanged and its document is listed as it was left.  The
+        documents page is opened once and each upload continues from the page the previous
+        one responded with.
+
+        :directory    Path to the directory of PDFs
+        :verify       Boolean, list the documents again to confirm each upload
+        :return       List of dictionaries, one per file with the status of its upload
+        """
+        directory = os.path.expanduser(os.path.expandvars(directory))
+        if not os.path.isdir(directory):
+            raise JobmineException('%s is not a directory.' % directory)
+
+        manifest = DocumentManifest(directory, self.UPLOADS_MANIFEST)
+        files = sorted(filename for filename in os.listdir(directory) if filename.lower().endswith('.pdf') and \
+                       not DocumentManifest.STORED_NAME.match(filename))
+
+        base_url = self.FOLDER_URL.format(self.ENDPOINTS['documents'])
+        html = self.open(base_url).read()
+        documents = self._parse_table(html, self.DOCUMENTS_ROW, Document)
+
+        results = []
+        for filename in files:
+            name, path = os.path.splitext(filename)[0], os.path.join(directory, filename)
+            digest, size = DocumentManifest.digest(path)
+            numbers = dict((document['Document Name'], number) for number, document in enumerate(documents, 1))
+            number, entry = numbers.get(name), manifest.get(filename)
+
+            if number is not None and entry is not None and entry['sha256'] == digest and \
+               entry.get('number') == number and entry.get('updated') == documents[number - 1]['Last Updated']:
+                status = 'Unchanged'
+            else:
+                try:
+                    number, html = self._upload(base_url, html, path, name=None if number else name,
+                                                existing=number, verify=verify)
+                    documents = [] if verify else self._parse_table(html, self.DOCUMENTS_ROW, Document)
+                    if len(documents) == 0:
+                        # Listed again, so the next upload posts the tokens of the new page
+                        html = self.open(base_url).read()
+                        documents = self._parse_table(html, self.DOCUMENTS_ROW, Document)
+                    if number > len(documents):
+                        raise JobmineException('Document %d is not listed after uploading it.' % number)
+                    status = 'Created' if name not in numbers else 'Uploaded'
+                    manifest.set(filename, sha256=digest, bytes=size, number=number,
+                                 updated=documents[number - 1]['Last Updated'])
+                except JobmineException:
+                    # Start over from the documents page for the remaining files
+                    status = 'Failed'
+                    html = self.open(base_url).read()
+                    documents = self._parse_table(html, self.DOCUMENTS_ROW, Document)
+
+            results.append(OrderedDict([
+                ('File', filename),
+                ('Document', number or ''),
+                ('Status', status)
+            ]))
+
+        manifest.retain(files)
+        manifest.save()
+        return results
 
     @auth_required
     def list_rankings(self):
@@ -502,58 +939,132 @@ class JobmineBrowser(anonbrowser.AnonBrowser):
         """
         return self.parse('rankings', r'trUW_CO_STU_RNK.*')
 
+    @auth_required
+    def iter_jobs(self, filters=None, limit=None, view_all=None):
+        """
+        Search for jobs, yielding each job as its page of results arrives.  The search only
+        paginates as far as the caller iterates, so stopping early saves the remaining pages.
+
+        :filters     Optional dictionary of job search filters
+        :limit       Optional integer, the most jobs to yield
+        :view_all    Optional boolean, ask for every result in one page; defaults to
+                     doing so only when there is no limit
+        :return      Generator
+        """
+        view_all = limit is None if view_all is None else view_all
+        pages = self._get_jobs(filters=filters, view_all=view_all)
+        jobs = itertools.chain.from_iterable(page for page, _ in pages)
+        return itertools.islice(jobs, limit)
+
     @auth_required
     def list_jobs(self, limit=None, filters=None):
         """
         Search and list jobs.  By passing in key word arguments, the user can specify how
         to filter the job search to narrow the results passed.
 
-        :return    Dictionary
+        :return    List of dictionaries
         """
-        generators = [rows for rows in self._get_jobs(limit, filters=filters)]
-        jobs = list(itertools.chain(*generators))
+        return list(self.iter_jobs(filters=filters, limit=limit))
 
-        if len(jobs) > 0:
-            return jobs
+    def view_job(self, job_id, cache=True, refresh=False):
+        """
+        View the specified job.  Requires a valid job identifier that can be retrieved from
+        a list of jobs.  Returns the job's details; postings are cached on disk so repeat
+        views don't touch Jobmine.
 
-        return []
+        :job_id     String representing the job id
+        :cache      Boolean, whether to use the page cache
+        :refresh    Boolean, fetch the posting even if it is cached
+        :return     JobDetails
+        """
+        if cache and not refresh:
+            entry = self.cache.get(job_id)
+            if entry is not None:
+                return JobDetails.create(entry['parsed'].keys(), entry['parsed'].values())
+
+        html = self._fetch_job(job_id)
+        job_information = self._parse_job(html)
+        if cache:
+            self.cache.set(job_id, html, job_information.as_dict())
+        return job_information
 
     @auth_required
-    def view_job(self, job_id):
+    def _fetch_job(self, job_id):
         """
-        View the specified job.  Requires a valid job identifier that can be retrieved from
-        a list of jobs.  Returns a dictionary of the job's data.
+        Fetch the page for the specified job.
 
         :job_id    String representing the job id
         :return    String
         """
         url = self.FOLDER_URL.format(self.ENDPOINTS['details']) + "?UW_CO_JOB_ID={0}".format(job_id)
-        soup = BeautifulSoup(self.open_novisit(url).read())
-        content = soup.findAll('div', id='PAGECONTAINER')
-
-        # Do some analyzation here to figure out what peices of content belong to what
-        # from the raw string.
-        raw = re.sub(r'\s\s+', '\n', content[0].text)
-        information, description = raw.split('Job Description', 1)
-
-        # Strip out empty whitespace lines and replace return carriages
-        description = description.encode('ascii', 'ignore').replace('\r', '\n')
-        description = '\n'.join(filter(lambda s: re.search(r'[\-_0-9A-Za-z]+', s),
-                                       description.split('\n')))
-
-        # Parse the information on the page by finding key-value pairs denoted by headers that
-        # contain a colon
-        regex = re.compile(r"""
-            ([\s\w\-,\.\#\(\)\&\/]+   # matches a value for the field
-            :                         # if colon, this is a key
-            (?:\n+)                   # non-capturing newline
-            [\w\s\-,\#\.\(\)\&\/]+    # matches a value for the field
-            (?:\n+))                  # non-matching newline
-        """, re.VERBOSE)
-        job_information = OrderedDict((key.strip(), val.strip()) for (key, val) in \
-                                      map(lambda d: d.split(':'), re.findall(regex, information)))
-        job_information['Description'] = description
-        return job_information
+        return self.open_novisit(url).read()
+
+    def _parse_job(self, html):
+        """
+        Parse the details of a job from its page.  The fields are read by their ids in a
+        single pass over the page, so values may hold any text, colons included.
+
+        :html      String, the job's page
+        :return    JobDetails
+        """
+        fields = set(self.DETAIL_FIELDS)
+        fields.add(self.DESCRIPTION_FIELD)
+        labels, values = self.parser.fields(html, fields)
+        if len(values) == 0:
+            raise JobmineException('No job details found on the page.')
+
+        # Known fields come first, in a fixed order, then the other labelled fields
+        known = [field for field in self.DETAIL_FIELDS if field in values]
+        others = [field for field in values if field not in self.DETAIL_FIELDS and field != self.DESCRIPTION_FIELD]
+        headers, row = [], []
+        for field in known + others:
+            headers.append(self.DETAIL_FIELDS.get(field) or labels[field])
+            row.append(' '.join(values[field].encode('ascii', 'ignore').split()))
+
+        # Keep the description's lines, dropping the blank ones; runs of whitespace
+        # within a line break it too.  Lines are split with string methods first, as
+        # scanning a long description with a pattern is slow
+        description = values.get(self.DESCRIPTION_FIELD, '').encode('ascii', 'ignore')
+        lines = (part.strip() for line in description.splitlines()
+                 for part in (self.BREAK.split(line) if '  ' in line or '\t' in line else (line, )))
+        headers.append('Description')
+        row.append('\n'.join(line for line in lines if self.WORD.search(line)))
+        return JobDetails.create(headers, row)
+
+    def parse_jobs(self, pages):
+        """
+        Parse the details of many saved job pages, such as pages from the page cache,
+        without touching Jobmine.  Pages without details are skipped.
+
+        :pages     Iterable of strings, the job pages
+        :return    Generator of JobDetails
+        """
+        for html in pages:
+            try:
+                yield self._parse_job(html)
+            except JobmineException:
+                continue
+
+    @auth_required
+    def view_jobs(self, job_ids, workers=None, cache=True, refresh=False):
+        """
+        View several jobs concurrently using a pool of browsers that share this browser's
+        session.  Yields (job_id, details) tuples as each job is fetched.
+
+        :job_ids    List of job identifiers
+        :workers    Optional number of concurrent requests, capped at the browser's max_workers
+        :cache      Boolean, whether to use the page cache
+        :refresh    Boolean, fetch postings even if they are cached
+        :return     Generator
+        """
+        job_ids = list(job_ids)
+        workers = min(workers or self.max_workers, self.max_workers, len(job_ids))
+        view = lambda browser, job_id: browser.view_job(job_id, cache=cache, refresh=refresh)
+        if workers <= 1:
+            return ((job_id, view(self, job_id)) for job_id in job_ids)
+
+        pool = BrowserPool([self.fork() for _ in range(workers)])
+        return pool.imap_unordered(view, job_ids)
 
     @auth_required
     def list_shortlist(self):
@@ -562,66 +1073,157 @@ class JobmineBrowser(anonbrowser.AnonBrowser):
 
         :return    List of dictionaries
         """
-        return self.parse('shortlist', r'trUW_CO_STUJOBLST.*')
+        return self.parse('shortlist', self.SHORTLIST_ROW)
 
     @auth_required
-    def add_to_shortlist(self, job_id, filters=None):
+    def add_to_shortlist(self, job_id, filters=None, verify=False):
         """
         Shortlists a job specified by the ID, can optionally pass in filters to make the search go
         faster.
 
         :job_id     String, the job identifier
         :filters    Optional dictionary of job query filters
+        :verify     Boolean, list the shortlist again to confirm the job was added
         :return     Boolean indicating success or failure of add
         """
         if not filters:
             filters = {}
 
-        job, shortlist_size = None, len(self.list_shortlist())
-        info, cond = self.view_job(job_id), lambda job: job['Job Identifier'] == job_id
+        # Replay the search the job was last seen in; only look the job up to narrow a
+        # new search if it isn't there
+        outcome = self._shortlist([job_id], verify=verify, fallback=False)[job_id]
+        if outcome == 'Not found':
+            info = self.view_job(job_id)
+            filters.update({
+                'title': info['Job Title'],
+                'employer': info['Employer']
+            })
+            outcome = self._shortlist([job_id], filters, verify, locate=False)[job_id]
+
+        if outcome == 'Failed':
+            raise JobmineException('Something went wrong, manually add.')
+        return outcome == 'Added'
 
-        filters.update({
-            'title': info['Job Title'],
-            'employer': info['Employer']
-        })
+    @auth_required
+    def add_to_shortlist_many(self, job_ids, filters=None, verify=False):
+        """
+        Shortlists several jobs in a single walk over the search results, shortlisting
+        each job as its row is found.  The search can be narrowed with filters, but
+        must still include every job.
 
-        try:
-            job, query = next(self._get_jobs(filters=filters, extract=cond))
-        except StopIteration:
-            job = None
-
-        # Check that job has not been added to the shortlist
-        if job is not None and job['Short List'] != 'On Short List':
-            url = self.FOLDER_URL.format(self.ENDPOINTS['jobs']) + \
-                  '?ICAction=UW_CO_SLIST_HL${0}&ICSID={1}&ICStateNum={2}'.format(query.row,
-                                                                                 query.get('ICSID'),
-                                                                                 str(int(query.get('ICStateNum')) + 1))
-            response = self.open_novisit(url).read()
-            if shortlist_size >= len(self.list_shortlist()):
-                raise JobmineException('Something went wrong, manually add.')
-            return True
-        return False
+        :job_ids    List of job identifiers
+        :filters    Optional dictionary of job query filters
+        :verify     Boolean, list the shortlist again to confirm the jobs were added
+        :return     List of dictionaries with the outcome for each job; one of 'Added',
+                    'Already shortlisted', 'Not found' or 'Failed'
+        """
+        outcomes = self._shortlist(job_ids, filters, verify)
+        return [OrderedDict([
+            ('Job Identifier', job_id),
+            ('Outcome', outcome)
+        ]) for job_id, outcome in outcomes.items()]
+
+    def _shortlist(self, job_ids, filters=None, verify=False, locate=True, fallback=True):
+        """
+        Walk the search results until every job is found, firing the shortlist action on
+        each job's row as it goes.  Jobs whose location is known are reached by replaying
+        the searches they were seen in, starting at their page; the rest, and any job no
+        longer where it was seen, are searched for with the filters.
+
+        Each action's response holds the results grid with the job marked, which confirms
+        it; the shortlist is listed once at the end to confirm the jobs whose response
+        didn't, or all of them when verifying.
+
+        :job_ids     List of job identifiers
+        :filters     Optional dictionary of job query filters
+        :verify      Boolean, list the shortlist again to confirm the jobs were added
+        :locate      Boolean, replay the searches the jobs were last seen in
+        :fallback    Boolean, search with the filters for the jobs that weren't located
+        :return      OrderedDict of job identifiers to outcomes
+        """
+        outcomes, unconfirmed = OrderedDict((job_id, 'Not found') for job_id in job_ids), []
+        searches = self.locator.group(job_ids) if locate else []
+        for search_filters, view_all, start, located in searches:
+            if view_all and max(self.locator.get(job_id)['row'] for job_id in located) < self.RESULTS_PER_PAGE:
+                # The first page of results holds every job, so skip asking for all of them
+                view_all = False
+            self._sweep(located, search_filters, view_all, start, verify, outcomes, unconfirmed)
+
+        missing = [job_id for job_id in job_ids if outcomes[job_id] == 'Not found']
+        for job_id in missing if len(searches) > 0 else []:
+            self.locator.forget(job_id)
+        if fallback and len(missing) > 0:
+            self._sweep(missing, filters, True, 0, verify, outcomes, unconfirmed)
+
+        if len(unconfirmed) > 0:
+            shortlisted = set(job['Job Identifier'] for job in self.list_shortlist())
+            for job_id in unconfirmed:
+                outcomes[job_id] = 'Added' if job_id in shortlisted else 'Failed'
+        self.locator.save()
+        return outcomes
+
+    def _sweep(self, job_ids, filters, view_all, start, verify, outcomes, unconfirmed):
+        """
+        Walk a search's results from the start page until every job is found, firing the
+        shortlist action on each job's row.  Outcomes are filled in as the jobs are found;
+        jobs whose action response didn't confirm them are added to unconfirmed.
+
+        :job_ids        List of job identifiers
+        :filters        Dictionary of job query filters
+        :view_all       Boolean, ask for every result in one page
+        :start          Integer, the first page to look at
+        :verify         Boolean, leave every job unconfirmed so the shortlist is listed
+        :outcomes       OrderedDict of job identifiers to outcomes
+        :unconfirmed    List of job identifiers
+        :return         None
+        """
+        pending = set(job_ids)
+        url = self.FOLDER_URL.format(self.ENDPOINTS['jobs'])
+
+        for jobs, query in self._get_jobs(filters=filters, view_all=view_all, start=start):
+            for row, job in enumerate(jobs):
+                job_id = job['Job Identifier']
+                if job_id not in pending:
+                    continue
+                pending.discard(job_id)
+                if job['Short List'] == 'On Short List':
+                    outcomes[job_id] = 'Already shortlisted'
+                    continue
+
+                # Every action moves the page to its next state
+                query.row, state = row, str(int(query.get('ICStateNum')) + 1)
+                query.add('ICStateNum', state)
+                response = self.open_novisit(url + '?ICAction=UW_CO_SLIST_HL${0}&ICSID={1}&ICStateNum={2}'.format(
+                    row, query.get('ICSID'), state)).read()
+
+                # The results are returned with the job marked as on the shortlist
+                results = dict((result['Job Identifier'], result) for result in self._parse_results(response))
+                if verify or job_id not in results:
+                    unconfirmed.append(job_id)
+                else:
+                    outcomes[job_id] = 'Added' if results[job_id]['Short List'] == 'On Short List' else 'Failed'
+            if len(pending) == 0:
+                break
 
     @auth_required
-    def remove_from_shortlist(self, job_id):
+    def remove_from_shortlist(self, job_id, verify=False):
         """
         Removes the job with the specified job id from the user's shortlist.
 
         :job_id    String, the job identifier
+        :verify    Boolean, list the shortlist again to confirm the removal
         :return    Boolean
         """
-        remove = 'UW_CO_STUJOBLST$delete${0}$$0'
-        shortlisted_jobs = self.list_shortlist()
-        for index, job in enumerate(shortlisted_jobs):
+        base_url = self.FOLDER_URL.format(self.ENDPOINTS['shortlist'])
+        for index, job in enumerate(self.list_shortlist()):
             if job['Job Identifier'] == job_id:
-                tokens = dict(self._get_tokens())
-                url = self.FOLDER_URL.format(self.ENDPOINTS['shortlist']) + \
-                      '?ICAction=UW_CO_STUJOBLST$delete${0}$$0&ICSID={1}&ICStateNum={2}'.format(index,
-                                                                                                tokens['ICSID'],
-                                                                                                tokens['ICStateNum'])
+                tokens = self._get_tokens()
+                url = base_url + '?ICAction=UW_CO_STUJOBLST$delete${0}$$0&ICSID={1}&ICStateNum={2}'.format(
+                    index, dict(tokens)['ICSID'], dict(tokens)['ICStateNum'])
                 response = self.open_novisit(url).read()
-                self.save(self.geturl())
-                if len(self.list_shortlist()) == len(shortlisted_jobs):
+
+                rows = self._rows_after(self._save(base_url, tokens), 'shortlist', self.SHORTLIST_ROW, verify)
+                if any(job['Job Identifier'] == job_id for job in rows):
                     raise JobmineException('Something went wrong, manually remove.')
                 return True
 
@@ -637,9 +1239,11 @@ class JobmineBrowser(anonbrowser.AnonBrowser):
         :files     Files (if any) to post
         :return    String
         """
-        response = requests.post(url, data=data, cookies=self.cookie_jar, headers={
-            'User-Agent': 'Mozilla/5.0'
-        }, files=files)
+        with profiling.measure('request', url=url) as info:
+            response = requests.post(url, data=data, cookies=self.cookie_jar, headers={
+                'User-Agent': 'Mozilla/5.0'
+            }, files=files)
+            info['bytes'] = len(response.content)
 
         return response.content
 
@@ -655,6 +1259,8 @@ class JobSearchQuery():
     """
     Creates a query for job searches by assigning values to the relevant hidden and visibile fields.
     """
+    VIEW_ALL = 'UW_CO_JOBRES_VW$hviewall$0'
+    GRID_COUNTER = re.compile(r'PSGRIDCOUNTER[^>]*>\s*([0-9]+)\s*-\s*([0-9]+)\s+of\s+([0-9]+)')
     filters = [
         'employer',
         'title',
@@ -680,6 +1286,8 @@ class JobSearchQuery():
     }
 
     def __init__(self, *args, **kwargs):
+        self.page, self.row = 0, None
+        self.viewing_all = False
         self.clear()
 
     def clear(self):
@@ -785,11 +1393,36 @@ class JobSearchQuery():
         if not down:
             self.data['ICStateNum'] = str(state + 1)
             self._data['ICAction'] = 'UW_CO_JOBRES_VW$hdown$0'
+            self.page += 1
         else:
             self.data['ICStateNum'] = str(state - 1)
             self._data['ICAction'] = 'UW_CO_JOBRES_VW$hup$0'
+            self.page -= 1
+        return self
+
+    def view_all(self):
+        """
+        Ask the results grid for every row on a single page.
+        """
+        self.viewing_all = True
+        if not 'ICStateNum' in self.data:
+            return self
+
+        self.data['ICStateNum'] = str(int(self.data.get('ICStateNum')) + 1)
+        self._data['ICAction'] = self.VIEW_ALL
         return self
 
+    def is_last_page(self, response):
+        """
+        Determines from the grid's row counter ("1-25 of 100") whether the response holds
+        the last page of results.  If the counter is missing, assumes there may be more.
+
+        :response    String, the results page
+        :return      Boolean
+        """
+        counter = self.GRID_COUNTER.search(response)
+        return counter is not None and int(counter.group(2)) >= int(counter.group(3))
+
     def make_query(self, url, *args, **kwargs):
         """
         Creates a url for fetching the query results (generated HTML page) by adding to the
@@ -811,31 +1444,159 @@ class JobSearchQuery():
 
 class CoopPrograms():
     """
-    List of programs you can search on Jobmine.
+    List of programs you can search on Jobmine.  Lookups go through an index built once
+    per faculty: names are normalized (case, underscores and punctuation are ignored) so
+    exact names and common abbreviations resolve with a dictionary lookup, and misspelt
+    names are matched against the programs sharing a trigram with them rather than
+    every program.  Results are memoized.
+
+    :PROGRAMS      Dictionary of faculties to program names to values; loaded on first use
+    :ALIASES       Dictionary of abbreviations to the program names they stand for
+    :CUTOFF        Minimum similarity, between 0 and 1, of a fuzzy match
+    :MATCHES       Maximum number of matches returned
+    :CANDIDATES    Number of programs sharing the most trigrams that are compared in full
     """
-    PROGRAMS = json.load(
-        open(
-            os.path.join(
-                os.path.dirname(__file__),
-                'resources', 'majors.json'), 'r'))
+    PROGRAMS = None
+    ALIASES = {
+        'cs': 'computer_science',
+        'se': 'software',
+        'ce': 'computer',
+        'ee': 'electrical',
+        'me': 'mechanical',
+        'mte': 'mechatronics',
+        'syde': 'systems_design',
+        'nano': 'nanotechnology',
+        'cfm': 'computing__financial_mgm',
+        'co': 'combinatorics__optimizat',
+        'amath': 'applied_mathematics',
+        'pmath': 'pure_mathematics',
+        'stats': 'statistics',
+        'actsci': 'actuarial_science',
+        'afm': 'financial_management',
+        'econ': 'economics',
+        'psych': 'psychology',
+        'kin': 'kinesiology',
+        'it': 'info_tech_unspecified'
+    }
+    CUTOFF = 0.6
+    MATCHES = 3
+    CANDIDATES = 10
+    _indices = {}
+    _matches = {}
+
+    @classmethod
+    def programs(cls):
+        """
+        Get the programs of each faculty; they are loaded on first use.
+
+        :return    Dictionary
+        """
+        if cls.PROGRAMS is None:
+            with open(os.path.join(os.path.dirname(__file__), 'resources', 'majors.json'), 'r') as handle:
+                cls.PROGRAMS = json.load(handle)
+        return cls.PROGRAMS
+
+    @staticmethod
+    def normalize(name):
+        """
+        Normalize a program name for comparison; 'Computer Science' and 'computer_science'
+        are the same program.
+
+        :name      String
+        :return    String
+        """
+        return ' '.join(re.findall(r'[a-z0-9]+', name.lower()))
+
+    @staticmethod
+    def trigrams(name):
+        """
+        Split a normalized name into the overlapping three letter sequences it is
+        matched on, padded so that short names have some.
+
+        :name      String
+        :return    Set of strings
+        """
+        padded = '  %s ' % name
+        return set(padded[index:index + 3] for index in range(len(padded) - 2))
+
+    @classmethod
+    def index(cls, major=None):
+        """
+        Get the lookup index of a faculty's programs, or of every program; built on
+        first use.  A name in several faculties has the value of the last one, as
+        in the faculties' merged dictionary.
+
+        :major     Optional faculty, such as 'math'
+        :return    Dictionary with 'programs', 'names', 'trigrams' and 'all' keys
+        """
+        if major not in cls._indices:
+            if major is not None:
+                programs = dict(cls.programs().get(major) or {})
+            else:
+                programs = {}
+                for faculty in cls.programs().values():
+                    programs.update(faculty)
+
+            names, trigrams = {}, {}
+            for name in programs:
+                normalized = cls.normalize(name)
+                names[normalized] = name
+                for trigram in cls.trigrams(normalized):
+                    trigrams.setdefault(trigram, []).append(normalized)
+            for alias, name in cls.ALIASES.items():
+                if name in programs:
+                    names.setdefault(alias, name)
+
+            cls._indices[major] = {
+                'programs': programs,
+                'names': names,
+                'trigrams': trigrams,
+                'all': tuple(sorted(programs))
+            }
+        return cls._indices[major]
+
+    @classmethod
+    def match(cls, program, major=None):
+        """
+        Get the names of the programs closest to the one passed, best first.
+
+        :program    String, the name or abbreviation of the program
+        :major      Optional faculty to restrict the programs to
+        :return     Tuple of program names, empty if none are close
+        """
+        key = (program, major)
+        if key not in cls._matches:
+            index, normalized = cls.index(major), cls.normalize(program)
+            if normalized in index['names']:
+                matches = (index['names'][normalized], )
+            else:
+                # Only the programs sharing the most trigrams are compared in full
+                shared = {}
+                for trigram in cls.trigrams(normalized):
+                    for name in index['trigrams'].get(trigram, ()):
+                        shared[name] = shared.get(name, 0) + 1
+                candidates = sorted(shared, key=lambda name: (-shared[name], name))[:cls.CANDIDATES]
+
+                matcher, scored = difflib.SequenceMatcher(), []
+                matcher.set_seq2(normalized)
+                for name in candidates:
+                    matcher.set_seq1(name)
+                    if matcher.real_quick_ratio() >= cls.CUTOFF and matcher.quick_ratio() >= cls.CUTOFF:
+                        ratio = matcher.ratio()
+                        if ratio >= cls.CUTOFF:
+                            scored.append((-ratio, index['names'][name]))
+                matches = tuple(name for _, name in sorted(scored)[:cls.MATCHES])
+            cls._matches[key] = matches
+        return cls._matches[key]
 
     @classmethod
     def get(cls, program, major = None, value=False):
-        if major is not None:
-            programs = cls.PROGRAMS.get(major)
-        else:
-            programs = []
-            for faculty in cls.PROGRAMS.values():
-                programs += faculty.items()
-            programs = dict(programs)
-
-        # Get the closest matching program to the on passed
-        closest_match = difflib.get_close_matches(program.lower(), programs.keys(), cutoff=0.6)
-        if len(closest_match) > 0:
+        matches = cls.match(program, major)
+        if len(matches) > 0:
             if value:
-                return programs.get(closest_match[0])
+                return cls.index(major)['programs'].get(matches[0])
 
-            return closest_match
+            return list(matches)
 
         return None
 
@@ -845,6 +1606,4 @@ class CoopPrograms():
 
     @classmethod
     def all(cls, major = None):
-        if major is not None:
-            return cls.PROGRAMS.get(major).keys()
-        return itertools.chain(faculty.keys() for faculty in cls.PROGRAMS.values())
+        return cls.index(major)['all']
@@ -1,5 +1,9 @@
-import keyring
+import os
 import getpass
+from utils import lazy_import
+
+# The keyring and its backends are slow to import and only needed to read or store users
+keyring = lazy_import('keyring')
 
 
 PROG = "jobmine-cli"
@@ -56,11 +60,16 @@ def store_user_info(username, password):
 def get_user_info(username=None):
     """
     Gets the username/password for the specified user, otherwise the currently
-    logged in user.
+    logged in user.  The JOBMINE_USER and JOBMINE_PASSWORD environment variables
+    take precedence over the keyring, for scripts and test servers.
 
     @param username: optional username
     @return: tuple
     """
+    if os.environ.get('JOBMINE_USER') and os.environ.get('JOBMINE_PASSWORD'):
+        if not username or username == os.environ['JOBMINE_USER']:
+            return (os.environ['JOBMINE_USER'], os.environ['JOBMINE_PASSWORD'])
+
     users = keyring.get_password(PROG, getpass.getuser())
     if not users:
         keyring.set_password(PROG, getpass.getuser(), "")
@@ -74,6 +83,20 @@ def get_user_info(username=None):
     return (username, None)
 
 
+def list_users():
+    """
+    Lists the users stored in the keyring, the default user first.  The user in
+    the JOBMINE_USER and JOBMINE_PASSWORD environment variables is included.
+
+    @return: list of usernames
+    """
+    users = [user for user in (keyring.get_password(PROG, getpass.getuser()) or "").split(",") if user]
+    if os.environ.get('JOBMINE_USER') and os.environ.get('JOBMINE_PASSWORD'):
+        if os.environ['JOBMINE_USER'] not in users:
+            users.insert(0, os.environ['JOBMINE_USER'])
+    return users
+
+
 def change_default_user(username):
     """
     Changes the default user for the app keyring.
@@ -0,0 +1,157 @@
+import json
+import time
+from utils import atomic_write
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ordereddict import OrderedDict
+
+
+class RowLocator(object):
+    """
+    Remembers where each job was last seen in the search results: the filters and
+    'View All' state of the search, and the page and row the job was on.  Actions on
+    a job's row replay that search instead of searching for the job again.  Results
+    shift as postings open and close, so a location is only a hint; the row must
+    still be matched by its job identifier.
+
+    The state is persisted next to the browser's cookie file.
+
+    :DEFAULT_TTL    Number of seconds a location is kept for
+    """
+    DEFAULT_TTL = 6 * 60 * 60
+
+    def __init__(self, path, ttl=None):
+        """
+        Initialize the locator and load the locations persisted by a previous run.
+
+        :path    Path to the file the locations are stored in
+        :ttl     Optional number of seconds to keep locations for
+        :return  RowLocator
+        """
+        self.path = path
+        self.ttl = self.DEFAULT_TTL if ttl is None else int(ttl)
+        self.queries, self.jobs = [], {}
+        self._indices = {}
+        self._changed = False
+        self.load()
+
+    @classmethod
+    def from_cookiefile(cls, cookiefile, ttl=None):
+        """
+        Get the locator stored alongside the specified cookie file.
+
+        :cookiefile    Path to the browser's cookie file
+        :ttl           Optional number of seconds to keep locations for
+        :return        RowLocator
+        """
+        return cls(cookiefile + '.locator', ttl=ttl)
+
+    def __contains__(self, job_id):
+        return self.get(job_id) is not None
+
+    def load(self):
+        """
+        Load the persisted locations, if any.
+
+        :return    None
+        """
+        try:
+            with open(self.path, 'r') as handle:
+                state = json.load(handle)
+        except (IOError, ValueError):
+            return
+
+        self.queries = state.get('queries', [])
+        self.jobs = state.get('jobs', {})
+        self._indices = dict((json.dumps(query, sort_keys=True), index) for index, query in enumerate(self.queries))
+
+    def save(self):
+        """
+        Persist the locations if they changed, dropping expired ones and the searches
+        no location refers to.  The file is replaced atomically.
+
+        :return    None
+        """
+        if not self._changed:
+            return
+
+        now, queries, indices, jobs = time.time(), [], {}, {}
+        for job_id, (index, page, row, seen) in self.jobs.items():
+            if seen + self.ttl < now:
+                continue
+            if index not in indices:
+                indices[index] = len(queries)
+                queries.append(self.queries[index])
+            jobs[job_id] = [indices[index], page, row, seen]
+        self.queries, self.jobs = queries, jobs
+        self._indices = dict((json.dumps(query, sort_keys=True), index) for index, query in enumerate(queries))
+
+        atomic_write(self.path, json.dumps({'queries': self.queries, 'jobs': self.jobs}))
+        self._changed = False
+
+    def record(self, jobs, filters, page, view_all):
+        """
+        Record the location of every job on a page of search results.
+
+        :jobs        List of dictionaries, the results on the page
+        :filters     Dictionary of the job search filters
+        :page        Integer, the number of the page
+        :view_all    Boolean, whether the page holds every result
+        :return      None
+        """
+        query = {'filters': dict(filters or {}), 'view_all': bool(view_all)}
+        key = json.dumps(query, sort_keys=True)
+        if key not in self._indices:
+            self._indices[key] = len(self.queries)
+            self.queries.append(query)
+
+        index, now = self._indices[key], time.time()
+        for row, job in enumerate(jobs):
+            if job.get('Job Identifier'):
+                self.jobs[job['Job Identifier']] = [index, page, row, now]
+        self._changed = True
+
+    def get(self, job_id):
+        """
+        Get where the job was last seen.
+
+        :job_id    String, the job identifier
+        :return    Dictionary with 'filters', 'view_all', 'page' and 'row' keys, or None
+        """
+        location = self.jobs.get(job_id)
+        if location is None or location[3] + self.ttl < time.time():
+            return None
+        index, page, row, _ = location
+        return dict(self.queries[index], page=page, row=row)
+
+    def forget(self, job_id):
+        """
+        Forget where the job was seen, such as when it wasn't found there again.
+
+        :job_id    String, the job identifier
+        :return    None
+        """
+        if self.jobs.pop(job_id, None) is not None:
+            self._changed = True
+
+    def group(self, job_ids):
+        """
+        Group the located jobs by the search they were seen in, so a single replay of
+        each search reaches all of its jobs.
+
+        :job_ids    List of job identifiers
+        :return     List of (filters, view_all, first page, list of job identifiers) tuples
+        """
+        groups = OrderedDict()
+        for job_id in job_ids:
+            location = self.get(job_id)
+            if location is None:
+                continue
+            index = self.jobs[job_id][0]
+            if index not in groups:
+                groups[index] = [location['filters'], location['view_all'], location['page'], []]
+            groups[index][2] = min(groups[index][2], location['page'])
+            groups[index][3].append(job_id)
+        return [tuple(group) for group in groups.values()]
@@ -0,0 +1,132 @@
+import os
+import re
+import json
+import hashlib
+from utils import atomic_write
+
+
+class DocumentManifest(object):
+    """
+    A manifest of the documents kept in a directory, stored in the directory itself.
+    Each entry records the content hash and size of a document, along with what Jobmine
+    listed for it, so documents that haven't changed are recognized without being
+    transferred again.  Documents are stored under their content hash (see
+    document_path), so a document is only stored once however many entries refer to it.
+
+    :FILENAME       Default name of the manifest file in the directory
+    :CHUNK_SIZE     Number of bytes read at a time when hashing a file
+    :STORED_NAME    Pattern matching the names documents are stored under
+    """
+    FILENAME = '.manifest.json'
+    CHUNK_SIZE = 64 * 1024
+    STORED_NAME = re.compile(r'^[0-9a-f]{64}\.pdf$')
+
+    def __init__(self, directory, filename=None):
+        """
+        Initialize the manifest and load the entries of a previous run.
+
+        :directory    Path to the directory the documents are kept in
+        :filename     Optional name of the manifest file, so a directory can hold several
+        :return       DocumentManifest
+        """
+        self.directory = directory
+        self.filename = filename or self.FILENAME
+        self.entries = {}
+        self._changed = False
+        self.load()
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, self.filename)
+
+    def document_path(self, digest):
+        """
+        Get the path a document is stored at.
+
+        :digest    String, the hex SHA-256 of the document
+        :return    String
+        """
+        return os.path.join(self.directory, '%s.pdf' % digest)
+
+    def load(self):
+        """
+        Load the persisted entries, if any.
+
+        :return    None
+        """
+        try:
+            with open(self.manifest_path, 'r') as handle:
+                self.entries = json.load(handle).get('documents', {})
+        except (IOError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        """
+        Persist the entries if they changed.  The file is replaced atomically.
+
+        :return    None
+        """
+        if not self._changed:
+            return
+
+        atomic_write(self.manifest_path, json.dumps({'documents': self.entries}, indent=2, sort_keys=True))
+        self._changed = False
+
+    def get(self, key):
+        """
+        Get the entry of a document.
+
+        :key       String identifying the document
+        :return    Dictionary or None
+        """
+        return self.entries.get(key)
+
+    def set(self, key, **entry):
+        """
+        Record the entry of a document, replacing any previous one.
+
+        :key       String identifying the document
+        :entry     Keyword arguments; 'sha256' and 'bytes' at least
+        :return    None
+        """
+        if self.entries.get(key) != entry:
+            self.entries[key] = entry
+            self._changed = True
+
+    def retain(self, keys):
+        """
+        Drop the entries of the documents that aren't in keys.  The stored files are kept,
+        as other entries may share them.
+
+        :keys      Collection of the keys to keep
+        :return    None
+        """
+        for key in list(self.entries):
+            if key not in keys:
+                del self.entries[key]
+                self._changed = True
+
+    def stored(self, key):
+        """
+        Check whether the document of an entry is still stored in the directory.
+
+        :key       String identifying the document
+        :return    Boolean
+        """
+        entry = self.entries.get(key)
+        return entry is not None and os.path.exists(self.document_path(entry['sha256']))
+
+    @classmethod
+    def digest(cls, path):
+        """
+        Hash a file in chunks.
+
+        :path      Path to the file
+        :return    Tuple of (hex SHA-256, number of bytes)
+        """
+        digest, size = hashlib.sha256(), 0
+        with open(path, 'rb') as handle:
+            for chunk in iter(lambda: handle.read(cls.CHUNK_SIZE), ''):
+                digest.update(chunk)
+                size += len(chunk)
+        return digest.hexdigest(), size
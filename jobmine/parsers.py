@@ -0,0 +1,202 @@
+import pkgutil
+from profiling import profiled
+from utils import lazy_import
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ordereddict import OrderedDict
+
+# Imported when a page is first parsed
+bs4 = lazy_import('bs4')
+lxml_html = lazy_import('lxml.html') if pkgutil.find_loader('lxml') is not None else None
+
+
+class ParserException(Exception):
+    pass
+
+
+def _clean(text):
+    return text.encode('ascii', 'ignore').strip()
+
+
+def _label(text):
+    return _clean(text).rstrip(':').strip()
+
+
+class SoupParser(object):
+    """
+    Parses pages by building a full BeautifulSoup tree.  This is the most lenient
+    parser, but also the slowest on large pages.
+
+    :FEATURES    Tree builder BeautifulSoup is asked for; named so results don't depend
+                 on which optional builders are installed
+    """
+    name = 'soup'
+    FEATURES = 'html.parser'
+
+    @profiled('parse')
+    def soup(self, html):
+        """
+        Parse the entire page.
+
+        :html      String, the page
+        :return    BeautifulSoup
+        """
+        return bs4.BeautifulSoup(html, self.FEATURES)
+
+    def _tables(self, html):
+        return self.soup(html)
+
+    def _container(self, html, element_id):
+        return self.soup(html)
+
+    @profiled('parse')
+    def table(self, html, regex, inputs=False):
+        """
+        Extract the rows whose id matches the regex, and the headers of the table they
+        belong to, in a single pass over the rows.
+
+        :html      String, the page
+        :regex     Compiled pattern matching the ids of the rows
+        :inputs    Boolean, use the value of a cell's input field in place of its text
+        :return    Tuple of (list of headers, list of rows)
+        """
+        rows, headers = [], []
+        for index, row in enumerate(self._tables(html).findAll('tr', id=regex)):
+            if index == 0:
+                # Headers are found relative to the first row
+                headers = [_clean(tag.text) for tag in row.parent.parent.findAll('th')]
+            rows.append([self._cell(tag, inputs) for tag in row.findAll('td')])
+        return headers, rows
+
+    def _cell(self, tag, inputs):
+        if inputs:
+            field = tag.find('input')
+            if field is not None:
+                return field['value']
+        return _clean(tag.text)
+
+    @profiled('parse')
+    def text(self, html, element_id):
+        """
+        Get the text of the element with the specified id.
+
+        :html          String, the page
+        :element_id    The id of the element
+        :return        String or None if no element has the id
+        """
+        element = self._container(html, element_id).find(id=element_id)
+        return element.text if element is not None else None
+
+    def _fields(self, html):
+        return self.soup(html)
+
+    @profiled('parse')
+    def fields(self, html, ids):
+        """
+        Get the text of the display fields (spans) with the specified ids, and of any
+        other field a label on the page is for, in a single pass over the page.
+
+        :html      String, the page
+        :ids       Collection of the ids of the fields
+        :return    Tuple of (dictionary of ids to labels, OrderedDict of ids to text)
+        """
+        labels, values = {}, OrderedDict()
+        # Walking the tree is much faster than findAll with several tag names
+        for tag in self._fields(html).descendants:
+            if tag.name == 'label':
+                if tag.get('for'):
+                    labels[tag['for']] = _label(tag.text)
+            elif tag.name == 'span' and (tag.get('id') in ids or tag.get('id') in labels):
+                values[tag['id']] = tag.text
+        return labels, values
+
+
+class StrainedParser(SoupParser):
+    """
+    Parses pages with BeautifulSoup, but only builds the parts of the tree that are
+    needed; tables for grids, and the requested element for text.
+    """
+    name = 'strained'
+
+    def _tables(self, html):
+        return bs4.BeautifulSoup(html, self.FEATURES, parse_only=bs4.SoupStrainer('table'))
+
+    def _container(self, html, element_id):
+        return bs4.BeautifulSoup(html, self.FEATURES, parse_only=bs4.SoupStrainer(id=element_id))
+
+    def _fields(self, html):
+        return bs4.BeautifulSoup(html, self.FEATURES, parse_only=bs4.SoupStrainer(['label', 'span']))
+
+
+class LxmlParser(SoupParser):
+    """
+    Parses grids and text with lxml, which is much faster than BeautifulSoup on
+    large pages.  Requires lxml to be installed.
+    """
+    name = 'lxml'
+
+    def __init__(self):
+        if lxml_html is None:
+            raise ParserException('The lxml parser requires lxml to be installed.')
+
+    @profiled('parse')
+    def table(self, html, regex, inputs=False):
+        rows, headers = [], []
+        for row in lxml_html.fromstring(html).iter('tr'):
+            if not regex.search(row.get('id', '')):
+                continue
+            if len(rows) == 0:
+                headers = [_clean(tag.text_content()) for tag in row.getparent().getparent().iter('th')]
+            rows.append([self._cell(tag, inputs) for tag in row.iter('td')])
+        return headers, rows
+
+    def _cell(self, tag, inputs):
+        if inputs:
+            fields = tag.xpath('.//input')
+            if len(fields) > 0:
+                return fields[0].get('value')
+        return _clean(tag.text_content())
+
+    @profiled('parse')
+    def text(self, html, element_id):
+        elements = lxml_html.fromstring(html).xpath('//*[@id=$id]', id=element_id)
+        return elements[0].text_content() if len(elements) > 0 else None
+
+    @profiled('parse')
+    def fields(self, html, ids):
+        labels, values = {}, OrderedDict()
+        for tag in lxml_html.fromstring(html).iter('label', 'span'):
+            if tag.tag == 'label':
+                if tag.get('for'):
+                    labels[tag.get('for')] = _label(tag.text_content())
+            elif tag.get('id') in ids or tag.get('id') in labels:
+                values[tag.get('id')] = tag.text_content()
+        return labels, values
+
+
+PARSERS = dict((parser.name, parser) for parser in (SoupParser, StrainedParser, LxmlParser))
+
+
+def get_parser(name=None):
+    """
+    Get an instance of the named parser, defaulting to BeautifulSoup.
+
+    :name      Optional name of the parser; one of 'soup', 'strained' or 'lxml'
+    :return    SoupParser
+    """
+    if name is None:
+        name = SoupParser.name
+    if name not in PARSERS:
+        raise ParserException('Unknown parser %s.' % name)
+    return PARSERS[name]()
+
+
+def available():
+    """
+    List the names of the parsers that can be used.
+
+    :return    List of strings
+    """
+    return sorted(name for name in PARSERS if name != LxmlParser.name or lxml_html is not None)
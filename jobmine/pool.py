@@ -0,0 +1,67 @@
+import sys
+import Queue
+import threading
+
+
+class BrowserPool(object):
+    """
+    A pool of browsers that work through a list of items in parallel, one thread
+    per browser.  Browsers are not thread-safe, so each thread owns exactly one.
+
+    :MAX_WORKERS    Default most browsers working against Jobmine at once, out of politeness
+    """
+    MAX_WORKERS = 4
+
+    def __init__(self, browsers):
+        """
+        Initialize the pool.
+
+        :browsers    List of browsers, one per worker thread
+        :return      BrowserPool
+        """
+        self.browsers = browsers
+
+    def imap_unordered(self, function, items):
+        """
+        Calls function(browser, item) for every item and yields (item, result) tuples
+        in the order they complete.  An exception raised by a worker is re-raised
+        in the consumer; if the consumer stops iterating, the workers stop once
+        their current item is done, and are joined before the generator finishes.
+
+        :function    Callable taking a browser and an item
+        :items       List of items to process
+        :return      Generator
+        """
+        pending, results = Queue.Queue(), Queue.Queue()
+        stopped = threading.Event()
+        for item in items:
+            pending.put(item)
+
+        def work(browser):
+            while not stopped.is_set():
+                try:
+                    item = pending.get_nowait()
+                except Queue.Empty:
+                    return
+                try:
+                    results.put((item, function(browser, item), None))
+                except Exception:
+                    results.put((item, None, sys.exc_info()))
+
+        threads = [threading.Thread(target=work, args=(browser, )) for browser in self.browsers]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        try:
+            for _ in range(len(items)):
+                item, result, error = results.get()
+                if error is not None:
+                    raise error[0], error[1], error[2]
+                yield item, result
+        finally:
+            # Workers exit once the queue is empty or they finish their current item;
+            # joining them keeps them from outliving the interpreter
+            stopped.set()
+            for thread in threads:
+                thread.join()
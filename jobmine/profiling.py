@@ -0,0 +1,211 @@
+import re
+import time
+import urlparse
+import threading
+from contextlib import contextmanager
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ordereddict import OrderedDict
+
+
+_active = None
+_local = threading.local()
+
+
+def endpoint(url):
+    """
+    Name the Jobmine endpoint of a url; the PeopleSoft component if it has one,
+    otherwise the command or the path.
+
+    :url       String
+    :return    String
+    """
+    match = re.search(r'UW_CO_STUDENTS\.(\w+)\.GBL', url or '')
+    if match is not None:
+        return match.group(1)
+    parsed = urlparse.urlparse(url or '')
+    command = urlparse.parse_qs(parsed.query).get('cmd')
+    return 'cmd=%s' % command[0] if command else parsed.path or 'unknown'
+
+
+def percentile(values, fraction):
+    """
+    Get the value below which the fraction of the values fall, by the nearest rank.
+
+    :values      List of numbers
+    :fraction    Float between 0 and 1
+    :return      Number or None if there are no values
+    """
+    if len(values) == 0:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def current():
+    """
+    Get the profiler that is collecting, if any.
+
+    :return    Profiler or None
+    """
+    return _active
+
+
+@contextmanager
+def measure(kind, **info):
+    """
+    Time the block as an event of the kind ('request', 'parse' or 'format') in the
+    active profiler.  Time spent in nested blocks of other kinds is only counted
+    towards those, and nested blocks of the same kind are part of the outer event;
+    a submit that opens a url is one request and a table parse that builds a soup
+    is one parse.  Yields the event's info, which the block may add to.
+
+    :kind      Name of the kind of event
+    :info      Keyword arguments describing the event, such as its url
+    :return    Context manager yielding a dictionary
+    """
+    profiler, stack = _active, _local.__dict__.setdefault('stack', [])
+    if profiler is None:
+        yield info
+        return
+    elif len(stack) > 0 and stack[-1]['kind'] == kind:
+        yield stack[-1]['info']
+        return
+
+    frame = {'kind': kind, 'info': info, 'wall': 0.0, 'cpu': 0.0}
+    stack.append(frame)
+    wall, cpu = time.time(), time.clock()
+    try:
+        yield info
+    finally:
+        wall, cpu = time.time() - wall, time.clock() - cpu
+        stack.pop()
+        if len(stack) > 0:
+            stack[-1]['wall'] += wall
+            stack[-1]['cpu'] += cpu
+        profiler.add(kind, wall - frame['wall'], cpu - frame['cpu'], info)
+
+
+def profiled(kind):
+    """
+    Decorate a function so every call is measured as an event of the kind.
+
+    :kind      Name of the kind of event
+    :return    Decorator
+    """
+    def wrap(function):
+        def wrapped(*args, **kwargs):
+            with measure(kind):
+                return function(*args, **kwargs)
+        wrapped.__name__, wrapped.__doc__ = function.__name__, function.__doc__
+        return wrapped
+    return wrap
+
+
+class Profiler(object):
+    """
+    Collects the requests made, the pages parsed and the results rendered while it is
+    active, with the wall and CPU time spent on each.  Only one profiler is active at
+    a time; use it as a context manager, or call start and stop.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.started = self.stopped = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        """
+        Make this the active profiler.
+
+        :return    Profiler
+        """
+        global _active
+        _active, self.started = self, time.time()
+        return self
+
+    def stop(self):
+        """
+        Stop collecting.
+
+        :return    None
+        """
+        global _active
+        if _active is self:
+            _active = None
+        self.stopped = time.time()
+
+    def add(self, kind, wall, cpu, info):
+        """
+        Record an event.
+
+        :kind      Name of the kind of event
+        :wall      Seconds spent in the event
+        :cpu       Seconds of CPU time spent in the event
+        :info      Dictionary describing the event
+        :return    None
+        """
+        with self._lock:
+            self.events.append(dict(info, kind=kind, wall=wall, cpu=cpu))
+
+    def select(self, kind):
+        """
+        List the recorded events of the kind.
+
+        :kind      Name of the kind of event
+        :return    List of dictionaries
+        """
+        return [event for event in self.events if event['kind'] == kind]
+
+    def summary(self):
+        """
+        Summarize the run; times are in milliseconds.
+
+        :return    OrderedDict
+        """
+        requests, parses, formats = self.select('request'), self.select('parse'), self.select('format')
+        latencies = [event['wall'] * 1000 for event in requests]
+        total = ((self.stopped or time.time()) - self.started) if self.started else 0
+        return OrderedDict([
+            ('Requests', len(requests)),
+            ('Bytes', sum(event.get('bytes', 0) for event in requests)),
+            ('Network ms', round(sum(latencies), 1)),
+            ('Latency p50 ms', round(percentile(latencies, 0.5) or 0, 1)),
+            ('Latency p90 ms', round(percentile(latencies, 0.9) or 0, 1)),
+            ('Latency p99 ms', round(percentile(latencies, 0.99) or 0, 1)),
+            ('Parses', len(parses)),
+            ('Parse CPU ms', round(sum(event['cpu'] for event in parses) * 1000, 1)),
+            ('Render ms', round(sum(event['wall'] for event in formats) * 1000, 1)),
+            ('Total ms', round(total * 1000, 1))
+        ])
+
+    def endpoints(self):
+        """
+        Break the requests down by endpoint; times are in milliseconds.
+
+        :return    List of OrderedDicts
+        """
+        grouped = OrderedDict()
+        for event in self.select('request'):
+            grouped.setdefault(endpoint(event.get('url')), []).append(event)
+
+        rows = []
+        for name, events in grouped.items():
+            latencies = [event['wall'] * 1000 for event in events]
+            rows.append(OrderedDict([
+                ('Endpoint', name),
+                ('Requests', str(len(events))),
+                ('Bytes', str(sum(event.get('bytes', 0) for event in events))),
+                ('p50 ms', '%.1f' % percentile(latencies, 0.5)),
+                ('p90 ms', '%.1f' % percentile(latencies, 0.9)),
+                ('Max ms', '%.1f' % max(latencies))
+            ]))
+        return rows
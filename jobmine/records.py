@@ -0,0 +1,186 @@
+"""
+Compact records for the rows of Jobmine's tables.  The headers of a table are kept once,
+in a schema shared by every row parsed from it, and each row only holds a tuple of its
+values; short repeated values, such as employers and locations, are interned so that
+rows share them.  Records read like the dictionaries rows used to be (row['Employer'],
+row.get, keys, items, ...) and by attribute (row.employer); as_dict gives a copy.
+"""
+import re
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ordereddict import OrderedDict
+
+
+# Values longer than this are unlikely to repeat, so they are not interned
+INTERN_LENGTH = 64
+
+
+def attribute_name(header):
+    """
+    Get the attribute a column is read by; 'App. Status' is read as app_status.
+
+    :header    String, the column header
+    :return    String
+    """
+    return '_'.join(re.findall(r'[a-z0-9]+', header.lower()))
+
+
+class Schema(object):
+    """
+    The columns of a table.  There is one schema per set of headers, shared by every
+    record with those headers; see Schema.get.
+    """
+    __slots__ = ('headers', 'positions', 'attributes')
+    _schemas = {}
+
+    def __init__(self, headers):
+        self.headers = tuple(headers)
+        self.positions = dict((header, index) for index, header in enumerate(self.headers))
+        self.attributes = dict((attribute_name(header), index) for index, header in enumerate(self.headers))
+
+    @classmethod
+    def get(cls, headers):
+        """
+        Get the shared schema of the headers.
+
+        :headers    List of strings
+        :return     Schema
+        """
+        key = tuple(headers)
+        schema = cls._schemas.get(key)
+        if schema is None:
+            schema = cls._schemas[key] = cls(key)
+        return schema
+
+
+class Record(object):
+    """
+    A row of a table.  Records are read-only; use as_dict for a copy to change.
+    """
+    __slots__ = ('_schema', '_values')
+
+    def __init__(self, schema, values):
+        self._schema = schema
+        self._values = tuple(values)
+
+    @classmethod
+    def create(cls, headers, values):
+        """
+        Create a record from a row, interning its short text values.
+
+        :headers    List of strings, the column headers
+        :values     List of the row's values, one per column
+        :return     Record
+        """
+        return cls(Schema.get(headers), (intern(value) if type(value) is str and len(value) <= INTERN_LENGTH
+                                         else value for value in values))
+
+    def __getitem__(self, key):
+        return self._values[self._schema.positions[key]]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self._values[self._schema.attributes[name]]
+        except KeyError:
+            raise AttributeError("'%s' has no column '%s'" % (type(self).__name__, name))
+
+    def __contains__(self, key):
+        return key in self._schema.positions
+
+    def __iter__(self):
+        return iter(self._schema.headers)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __eq__(self, other):
+        if not hasattr(other, 'items'):
+            return NotImplemented
+        return dict(self.items()) == dict(other.items())
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.as_dict())
+
+    def __reduce__(self):
+        return (type(self).create, (self._schema.headers, self._values))
+
+    def get(self, key, default=None):
+        index = self._schema.positions.get(key)
+        return default if index is None else self._values[index]
+
+    def keys(self):
+        return list(self._schema.headers)
+
+    def values(self):
+        return list(self._values)
+
+    def items(self):
+        return zip(self._schema.headers, self._values)
+
+    def iterkeys(self):
+        return iter(self._schema.headers)
+
+    def itervalues(self):
+        return iter(self._values)
+
+    def iteritems(self):
+        return iter(self.items())
+
+    def as_dict(self):
+        """
+        Get the record as a dictionary, in column order.
+
+        :return    OrderedDict
+        """
+        return OrderedDict(self.items())
+
+
+class Job(Record):
+    """A job search result."""
+    __slots__ = ()
+
+
+class Application(Record):
+    """An application, active or inactive."""
+    __slots__ = ()
+
+
+class Interview(Record):
+    """A scheduled interview."""
+    __slots__ = ()
+
+
+class ShortlistEntry(Record):
+    """A job on the shortlist."""
+    __slots__ = ()
+
+
+class Document(Record):
+    """A resume or other document."""
+    __slots__ = ()
+
+
+class JobDetails(Record):
+    """The details of a job posting; see JobmineBrowser.DETAIL_FIELDS for its fields."""
+    __slots__ = ()
+
+
+def to_json(value):
+    """
+    Default for json.dump(s); encodes records as objects and anything else json can't
+    encode as text.
+
+    :value     object
+    :return    object
+    """
+    return value.as_dict() if isinstance(value, Record) else str(value)
@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import atexit
+from utils import atomic_write, locked, user_path
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ordereddict import OrderedDict
+
+
+class JobmineSession(object):
+    """
+    Tracks when the cookies of a Jobmine session were last known to be valid.  The
+    state is persisted next to the browser's cookie file so that later invocations
+    can trust the session instead of logging in again.
+
+    :DEFAULT_TTL    Number of seconds a validated session is trusted for
+    :COOKIE_FILE    Default file the session cookies are stored in; overridden by JOBMINE_COOKIES
+    :SAVE_AFTER     Fraction of the TTL after which a newer validation is persisted; until
+                    then it is only kept in memory, so requests don't each rewrite the file
+    """
+    DEFAULT_TTL = 15 * 60
+    SAVE_AFTER = 0.25
+    COOKIE_FILE = os.environ.get('JOBMINE_COOKIES', '/tmp/jobmine.cookies')
+
+    def __init__(self, path, ttl=None):
+        """
+        Initialize the session and load any state persisted by a previous run.
+
+        :path    Path to the file the session state is stored in
+        :ttl     Optional number of seconds to trust a validated session for
+        :return  JobmineSession
+        """
+        self.path = path
+        self.ttl = self.DEFAULT_TTL if ttl is None else int(ttl)
+        self.username = None
+        self.validated = 0
+        self.saved = 0
+        self.total_saved = 0
+        self._flushed = 0
+        self._registered = False
+        self._stored = (None, 0)
+        self.load()
+
+    @classmethod
+    def from_cookiefile(cls, cookiefile, ttl=None):
+        """
+        Get the session stored alongside the specified cookie file.
+
+        :cookiefile    Path to the browser's cookie file
+        :ttl           Optional number of seconds to trust a validated session for
+        :return        JobmineSession
+        """
+        return cls(cookiefile + '.session', ttl=ttl)
+
+    @classmethod
+    def for_user(cls, username, ttl=None):
+        """
+        Get the session of the specified user, or the shared session if there is no user.
+
+        :username    String, the user's Quest ID, or None
+        :ttl         Optional number of seconds to trust a validated session for
+        :return      JobmineSession
+        """
+        cookiefile = user_path(cls.COOKIE_FILE, username) if username else cls.COOKIE_FILE
+        return cls.from_cookiefile(cookiefile, ttl=ttl)
+
+    def _read(self):
+        """
+        Read the persisted session state.
+
+        :return    Dictionary, empty if there is none
+        """
+        try:
+            with open(self.path, 'r') as handle:
+                return json.load(handle)
+        except (IOError, ValueError):
+            return {}
+
+    def _write(self, state):
+        """
+        Persist the session state.  The file is replaced atomically as several
+        browsers may share the same session.
+
+        :state     Dictionary
+        :return    None
+        """
+        atomic_write(self.path, json.dumps(state))
+
+    def load(self):
+        """
+        Load the persisted session state, if any.
+
+        :return    None
+        """
+        state = self._read()
+        if not state:
+            return
+
+        self.username = state.get('username')
+        self.validated = state.get('validated', 0)
+        self.total_saved = state.get('saved', 0) + self.saved - self._flushed
+        self._stored = (self.username, self.validated)
+
+    def save(self):
+        """
+        Persist the session state, adding the round-trips saved since the last save
+        to the persisted count.
+
+        :return    None
+        """
+        with locked(self.path):
+            saved = self.saved
+            state = {
+                'username': self.username,
+                'validated': self.validated,
+                'saved': self._read().get('saved', 0) + saved - self._flushed
+            }
+            self._write(state)
+            self._flushed = saved
+            self.total_saved = state['saved'] + self.saved - saved
+        self._stored = (self.username, self.validated)
+
+    def flush(self):
+        """
+        Add the round-trips saved since the last save to the persisted count, leaving
+        the rest of the persisted state as it is.  Called when the process exits.
+
+        :return    None
+        """
+        if self.saved == self._flushed:
+            return
+
+        with locked(self.path):
+            saved, state = self.saved, self._read()
+            state['saved'] = state.get('saved', 0) + saved - self._flushed
+            self._write(state)
+            self._flushed = saved
+            self.total_saved = state['saved'] + self.saved - saved
+
+    def is_valid(self, username=None):
+        """
+        Determines if the session can be trusted without asking Jobmine.
+
+        :username    Optional username the session must belong to
+        :return      Boolean
+        """
+        if not self.validated or (username is not None and username != self.username):
+            return False
+        return time.time() - self.validated < self.ttl
+
+    def touch(self, username, save=False):
+        """
+        Mark the session as valid as of now for the specified user.  The state is only
+        persisted if asked to, if the user changed or if the persisted validation is older
+        than SAVE_AFTER of the TTL.
+
+        :username    String, the user's Quest ID
+        :save        Boolean, persist the state regardless
+        :return      None
+        """
+        self.username = username
+        self.validated = time.time()
+        stored_username, stored_validated = self._stored
+        if save or stored_username != username or self.validated - stored_validated > self.ttl * self.SAVE_AFTER:
+            self.save()
+
+    def invalidate(self):
+        """
+        Stop trusting the session; the next authenticated call will log in.
+
+        :return    None
+        """
+        self.validated = 0
+        self.save()
+
+    def record_saved(self, count=1):
+        """
+        Record a number of round-trips that were skipped by trusting the session.
+
+        :count     Integer, number of round-trips saved
+        :return    None
+        """
+        if not self._registered:
+            # The count is persisted when the process exits
+            atexit.register(self.flush)
+            self._registered = True
+        self.saved += count
+        self.total_saved += count
+
+    def stats(self):
+        """
+        Summarize the state of the session.
+
+        :return    Dictionary
+        """
+        remaining = max(0, int(self.ttl - (time.time() - self.validated))) if self.validated else 0
+        return OrderedDict([
+            ('User', self.username or ''),
+            ('Valid', 'Yes' if self.is_valid() else 'No'),
+            ('Expires In', '%ds' % remaining),
+            ('Round-trips Saved', '%d' % self.total_saved)
+        ])
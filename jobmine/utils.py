@@ -1,6 +1,20 @@
 import os
+import re
 import sys
+import tempfile
+import threading
 import subprocess
+from types import ModuleType
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None # Locking is advisory; without fcntl (Windows) files are not locked
+
+# Paths locked by the current thread; flock locks taken through separate handles
+# conflict even within a process, so nested locks on a path are no-ops
+_held = threading.local()
 
 
 def open_os(filepath):
@@ -16,3 +30,95 @@ def open_os(filepath):
         subprocess.call(['open', filepath])
     else:
         os.startfile(filepath)
+
+
+class LazyModule(ModuleType):
+    """
+    Stands in for a module until one of its attributes is used, then imports it;
+    see lazy_import.
+    """
+
+    def __init__(self, name, scope=None):
+        ModuleType.__init__(self, name)
+        self.__dict__['_scope'] = scope
+        self.__dict__['_module'] = None
+
+    def __getattr__(self, attribute):
+        if self._module is None:
+            # A non-empty fromlist makes __import__ return the named module rather than its package
+            self.__dict__['_module'] = __import__(self.__name__, self._scope, None, ['__name__'])
+        return getattr(self._module, attribute)
+
+
+def lazy_import(name, scope=None):
+    """
+    Import a module the first time one of its attributes is used, rather than now;
+    for modules that are slow to import and only needed by some commands.
+
+    :name      String, the name of the module
+    :scope     Optional globals of the importing module, for relative imports
+    :return    LazyModule
+    """
+    return LazyModule(name, scope)
+
+
+def user_path(path, username):
+    """
+    Derive the path of a file kept for the specified user from a shared one, such
+    as '/tmp/jobmine.alice.cookies' from '/tmp/jobmine.cookies'.
+
+    :path        String representing the path to the shared file
+    :username    String, the user's Quest ID
+    :return      String
+    """
+    root, extension = os.path.splitext(path)
+    return '%s.%s%s' % (root, re.sub(r'[^\w.-]', '_', username), extension)
+
+
+def atomic_write(path, data):
+    """
+    Replace the file with the data atomically, so readers see either the old or the new
+    contents, never part of them.  The data is written to a temporary file next to the
+    file, readable only by the current user, and flushed to disk before it is renamed.
+
+    :path      String representing the path to the file
+    :data      String, the new contents of the file
+    :return    None
+    """
+    # Temporary files are hidden, so listings of the directory can skip them
+    handle, tmp = tempfile.mkstemp(prefix='.', dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(handle, 'wb') as output:
+            output.write(data)
+            output.flush()
+            os.fsync(output.fileno())
+        os.rename(tmp, path)
+    except:
+        os.remove(tmp)
+        raise
+
+
+@contextmanager
+def locked(path, exclusive=True):
+    """
+    Hold an advisory lock on the file while the block runs; the lock is taken on a
+    separate '.lock' file, so the file itself can be replaced.  Locks are released
+    when the process exits, even if it crashes, and may be nested.
+
+    :path         String representing the path to the file to lock
+    :exclusive    Boolean, take an exclusive (write) lock rather than a shared (read) lock
+    :return       Context manager
+    """
+    held = _held.__dict__.setdefault('paths', set())
+    if fcntl is None or path is None or path in held:
+        yield
+        return
+
+    with open(path + '.lock', 'a') as handle:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        held.add(path)
+        try:
+            yield
+        finally:
+            held.discard(path)
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
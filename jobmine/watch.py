@@ -0,0 +1,289 @@
+import os
+import sys
+import json
+import time
+import socket
+import httplib
+import urllib2
+import hashlib
+import datetime
+import tempfile
+import subprocess
+from collections import namedtuple, Counter
+from utils import atomic_write, lazy_import
+from records import to_json
+
+jobminebrowser = lazy_import('jobminebrowser', globals())
+mechanize = lazy_import('mechanize')
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ordereddict import OrderedDict
+
+
+ChangeEvent = namedtuple('ChangeEvent', ['endpoint', 'kind', 'key', 'summary', 'row'])
+
+
+def _digest(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True)).hexdigest()
+
+
+class PrintSink(object):
+    """
+    Prints change events as lines of text, optionally tagged, such as with the user
+    they are for.
+    """
+
+    def __init__(self, stream=None, tag=None):
+        self.stream = stream or sys.stdout
+        self.tag = tag
+
+    def __call__(self, event):
+        self.stream.write('[%s] %s%s %s: %s\n' % (time.strftime('%Y-%m-%d %H:%M:%S'),
+                                                  '%s: ' % self.tag if self.tag else '',
+                                                  event.endpoint, event.kind, event.summary))
+        self.stream.flush()
+
+
+class JsonLinesSink(object):
+    """
+    Appends change events to a file as JSON objects, one per line.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, event):
+        with open(self.path, 'a') as output:
+            output.write(json.dumps(dict(event._asdict(), time=time.time()), default=to_json) + '\n')
+
+
+class CommandSink(object):
+    """
+    Runs a shell command for every change event; the event is passed to the command
+    through the JOBMINE_ENDPOINT, JOBMINE_CHANGE, JOBMINE_SUMMARY and JOBMINE_ROW
+    environment variables.
+    """
+
+    def __init__(self, command):
+        self.command = command
+
+    def __call__(self, event):
+        env = dict(os.environ)
+        env.update({
+            'JOBMINE_ENDPOINT': event.endpoint,
+            'JOBMINE_CHANGE': event.kind,
+            'JOBMINE_SUMMARY': event.summary,
+            'JOBMINE_ROW': json.dumps(event.row, default=to_json)
+        })
+        subprocess.call(self.command, shell=True, env=env)
+
+
+class Watcher(object):
+    """
+    Watches Jobmine endpoints through a single authenticated browser and emits an event
+    to every sink when a row is added, removed or changed.  Rows are identified by a hash
+    of their job identifier (or of the whole row if it has none, or if several rows share
+    it, such as a job's interview slots) and compared by a hash of their content; only the
+    hashes are kept, and they are persisted so that a restart doesn't announce every row
+    again.
+
+    Each endpoint is polled on its own schedule: the interval backs off while nothing
+    changes, resets when something does and tightens when a date in the rows is near.
+
+    :ENDPOINTS       Dictionary of watchable endpoints and the browser methods listing them
+    :KEYS            Columns identifying a row, in order of preference
+    :INTERVAL        Default number of seconds between polls
+    :MIN_INTERVAL    Shortest interval, used when a date in the rows is less than a day away
+    :MAX_INTERVAL    Longest interval to back off to
+    :BACKOFF         Factor to increase the interval by when nothing changed
+    :STATE_FILE      Default file the watcher's state is persisted to; the CLI keeps a file per
+                     user, named after it with utils.user_path
+    """
+    ENDPOINTS = OrderedDict([
+        ('interviews', 'list_interviews'),
+        ('applications', 'list_applications'),
+        ('shortlist', 'list_shortlist'),
+        ('rankings', 'list_rankings')
+    ])
+    KEYS = ['Job ID', 'Job Identifier']
+    SUMMARY = ['Job Title', 'Employer', 'Employer Name', 'Date', 'App. Status', 'Interview Date']
+    INTERVAL = 10 * 60
+    MIN_INTERVAL = 60
+    MAX_INTERVAL = 60 * 60
+    BACKOFF = 1.5
+    STATE_FILE = os.path.join(tempfile.gettempdir(), 'jobmine.watch.json')
+
+    def __init__(self, browser, endpoints=None, sinks=None, state_file=None, interval=None):
+        """
+        Initialize the watcher and load its persisted state.
+
+        :browser       An authenticated JobmineBrowser
+        :endpoints     Optional list of endpoints to watch, defaults to all of them
+        :sinks         Optional list of callables taking a ChangeEvent
+        :state_file    Optional file to persist the state in
+        :interval      Optional default number of seconds between polls
+        :return        Watcher
+        """
+        self.browser = browser
+        self.endpoints = endpoints or self.ENDPOINTS.keys()
+        self.sinks = sinks if sinks is not None else [PrintSink()]
+        self.state_file = state_file or self.STATE_FILE
+        self.interval = interval or self.INTERVAL
+        self.state = self.load()
+
+        for endpoint in self.endpoints:
+            if endpoint not in self.ENDPOINTS:
+                raise jobminebrowser.JobmineException('Cannot watch unknown endpoint %s.' % endpoint)
+            self.state.setdefault(endpoint, {'rows': {}, 'interval': self.interval, 'due': 0})
+
+    def load(self):
+        """
+        Load the persisted state.
+
+        :return    Dictionary
+        """
+        try:
+            with open(self.state_file, 'r') as handle:
+                return json.load(handle)
+        except (IOError, ValueError):
+            return {}
+
+    def save(self):
+        """
+        Persist the state, replacing the file atomically.
+
+        :return    None
+        """
+        atomic_write(self.state_file, json.dumps(self.state))
+
+    def key(self, row):
+        """
+        Get the hashed key identifying the row.
+
+        :row       Dictionary
+        :return    String
+        """
+        column = next((column for column in self.KEYS if row.get(column)), None)
+        return _digest(row[column] if column else row.items())
+
+    def summary(self, row):
+        """
+        Describe the row in a line of text.
+
+        :row       Dictionary
+        :return    String
+        """
+        values = [row[column] for column in self.SUMMARY if row.get(column)] or \
+                 [value for value in row.values() if value][:3]
+        return ', '.join(values)
+
+    def poll(self, endpoint):
+        """
+        Poll the endpoint once, emitting an event for every change since the last poll.
+
+        :endpoint    Name of the endpoint
+        :return      List of ChangeEvents
+        """
+        rows = getattr(self.browser, self.ENDPOINTS[endpoint])() or []
+        state = self.state[endpoint]
+        previous, current, events = state['rows'], {}, []
+        keys = [self.key(row) for row in rows]
+        counts = Counter(keys)
+
+        for key, row in zip(keys, rows):
+            digest, summary = _digest(row.items()), self.summary(row)
+            if counts[key] > 1:
+                # The rows of a job with several rows are told apart by their content
+                key = digest
+            current[key] = [digest, summary]
+            if key not in previous:
+                events.append(ChangeEvent(endpoint, 'added', key, summary, row))
+            elif previous[key][0] != digest:
+                events.append(ChangeEvent(endpoint, 'changed', key, summary, row))
+
+        for key, (digest, summary) in previous.items():
+            if key not in current:
+                events.append(ChangeEvent(endpoint, 'removed', key, summary, None))
+
+        state['rows'] = current
+        state['interval'] = self.next_interval(state['interval'], len(events) > 0, rows)
+        state['due'] = time.time() + state['interval']
+
+        for event in events:
+            for sink in self.sinks:
+                sink(event)
+        return events
+
+    def next_interval(self, interval, changed, rows):
+        """
+        Get the number of seconds until the next poll of an endpoint.
+
+        :interval    The current interval
+        :changed     Boolean, whether the last poll found changes
+        :rows        The rows found by the last poll
+        :return      Integer
+        """
+        interval = self.interval if changed else min(self.MAX_INTERVAL, int(interval * self.BACKOFF))
+        soonest = self.soonest(rows)
+        if soonest is not None:
+            remaining = (soonest - datetime.datetime.now()).total_seconds()
+            if remaining < 24 * 60 * 60:
+                interval = self.MIN_INTERVAL
+            elif remaining < 3 * 24 * 60 * 60:
+                interval = min(interval, self.interval)
+        return max(self.MIN_INTERVAL, interval)
+
+    def soonest(self, rows):
+        """
+        Get the soonest date (such as a deadline or an interview) in the rows that hasn't
+        passed yet.
+
+        :rows      List of dictionaries
+        :return    datetime or None
+        """
+        now, soonest = datetime.datetime.now(), None
+        for row in rows:
+            for value in row.values():
+                try:
+                    # Dates are inclusive, so they only pass at the end of the day
+                    date = datetime.datetime.strptime(value.strip(), '%d-%b-%Y') + datetime.timedelta(days=1)
+                except (AttributeError, ValueError):
+                    continue
+                if date > now and (soonest is None or date < soonest):
+                    soonest = date
+        return soonest
+
+    def poll_due(self, force=False):
+        """
+        Poll every endpoint that is due and persist the state.
+
+        :force     Boolean, poll every endpoint whether it is due or not
+        :return    List of ChangeEvents
+        """
+        events = []
+        for endpoint in self.endpoints:
+            if force or self.state[endpoint]['due'] <= time.time():
+                try:
+                    events += self.poll(endpoint)
+                except (jobminebrowser.JobmineException, urllib2.URLError, mechanize.URLError,
+                        socket.error, httplib.HTTPException) as e:
+                    # Jobmine is likely closed or failing; try again after backing off
+                    state = self.state[endpoint]
+                    state['interval'] = min(self.MAX_INTERVAL, int(state['interval'] * self.BACKOFF))
+                    state['due'] = time.time() + state['interval']
+                    sys.stderr.write('Error: could not poll %s: %s\n' % (endpoint, e))
+        self.save()
+        return events
+
+    def run(self):
+        """
+        Poll the endpoints on their schedules until interrupted.
+
+        :return    None
+        """
+        while True:
+            self.poll_due()
+            due = min(self.state[endpoint]['due'] for endpoint in self.endpoints)
+            time.sleep(max(0, due - time.time()))
@@ -1,23 +1,19 @@
-import time
 from jobmine import JobmineBrowser
 from jobmine.key import get_user_info
+from jobmine.watch import Watcher
+
+
+def announce(event):
+    if event.kind == 'added':
+        print "New interview for %s at %s" % (event.row['Job Title'], event.row['Employer Name'])
 
 
 if __name__ == "__main__":
-    interviews = []
     browser = JobmineBrowser()
 
     # Note: get_user_info only works if we've saved a Jobmine user
     browser.authenticate(*get_user_info())
-    while True:
-        # Poll every ten minutes for new interviews
-        new_interviews = browser.list_interviews()
-        if len(new_interviews) == 0:
-            print "No interviews."
-        else:
-            for interview in new_interviews:
-                if interview not in interviews:
-                    print "New interview for %s at %s" % (interview['Job Title'], interview['Employer Name'])
-                    interviews.append(interview)
 
-        time.sleep(600)
+    # Polls every ten minutes for new interviews, more often when one is close and less
+    # often when nothing changes; interviews already seen are remembered across restarts
+    Watcher(browser, endpoints=['interviews'], sinks=[announce]).run()